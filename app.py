@@ -1,8 +1,22 @@
+import os
 import streamlit as st
 import pandas as pd
-from data import get_financials
-from metrics import calculate_key_metrics
-from dcf import run_dcf_model, calculate_dcf
+import numpy as np
+import altair as alt
+from data import snapshot_key
+from metrics import calculate_key_metrics, format_ratio
+from dcf import run_dcf_model, run_dcf_grid, calculate_dcf, ValuationContext
+from equity_core.dcf import DEFAULT_ASSUMPTIONS
+from montecarlo import run_monte_carlo
+from reverse_dcf import solve_implied, LABELS as IMPLIED_LABELS
+from peers import load_peer_aggregates, cached_universe_size, relative_valuation
+from scheduler import PrefetchScheduler, DEFAULT_INFO_INTERVAL
+from scenarios import (
+    ScenarioEngine, DEFAULT_SET, list_scenario_sets, load_scenario_set, save_scenario_set,
+    parse_growth, format_growth,
+)
+import async_data
+import instrumentation
 
 # Page setup
 st.set_page_config(
@@ -10,6 +24,98 @@ st.set_page_config(
     layout="wide"
 )
 
+
+# Cached stages. Everything derived from the financials is keyed on
+# (ticker, snapshot) so it is recomputed only when the data itself changes;
+# the financials object is passed with a leading underscore so Streamlit
+# doesn't hash it on every rerun.
+
+@st.cache_resource
+def load_scheduler():
+    """
+    One background prefetcher per server, keeping the watchlist
+    (EQUITY_WATCHLIST plus every ticker opened) warm in the cache.
+    """
+    return PrefetchScheduler().start()
+
+
+@st.cache_data(ttl=DEFAULT_INFO_INTERVAL, show_spinner="Loading financials...")
+def load_financials(ticker):
+    """
+    Financials plus their snapshot hash. The TTL matches the prefetcher's
+    price refresh interval, and sessions opening the same cold ticker at
+    once share a single download. With EQUITY_DATA_URL or
+    EQUITY_ASYNC_DATA=1 they load through the async data layer instead;
+    the ticker is still watched unless a snapshot service is the source,
+    which the prefetcher can't read.
+    """
+    if async_data.is_configured():
+        financials = async_data.get_financials_sync(ticker)
+        if not async_data.is_remote():
+            load_scheduler().touch(ticker)
+    else:
+        financials = load_scheduler().fetch(ticker)
+    return financials, snapshot_key(financials)
+
+
+@st.cache_data(max_entries=64)
+def load_metrics(ticker, snapshot, _financials):
+    return calculate_key_metrics(_financials)
+
+
+@st.cache_data(max_entries=64)
+def format_statements(ticker, snapshot, _financials):
+    """
+    Statements in millions, pre-formatted as strings for display.
+    """
+    formatted = {}
+    for name, df in _financials.items():
+        if name == "Info":
+            continue
+        # Divide all numbers by 1 million for readability
+        df_m = df / 1_000_000
+        formatted[name] = df_m.map(lambda x: "" if pd.isna(x) else f"${x:,.0f}M")
+    return formatted
+
+
+@st.cache_resource(ttl=24 * 3600, max_entries=1, show_spinner="Loading peer groups...")
+def load_peers(universe_size):
+    """
+    Peer group aggregates, built from locally cached data and shared by
+    every session. Keyed on the cached universe size so they are reloaded
+    (and rebuilt once it has grown enough) as the cache fills, otherwise
+    at most once a day. Opening a ticker never fetches its peers.
+    """
+    return load_peer_aggregates()
+
+
+@st.cache_resource
+def load_scenario_engine():
+    """
+    Scenario results shared by every session, keyed on (snapshot, scenario),
+    so a rerun only computes scenarios that were added or edited.
+    """
+    return ScenarioEngine()
+
+
+@st.cache_resource(max_entries=32)
+def load_valuation_context(ticker, snapshot, _financials):
+    """
+    One ValuationContext per financials snapshot, shared across reruns so
+    slider changes and scenarios only pay for the projection arithmetic.
+    """
+    return ValuationContext(_financials)
+
+
+# Optional performance panel, shown per session. Recording is process-wide:
+# the checkbox only ever turns it on, so one session can't switch it off for
+# the others; EQUITY_PERF=1 turns it on from startup.
+with st.sidebar:
+    show_performance = st.checkbox("Performance", value=os.environ.get("EQUITY_PERF", "") == "1",
+                                   help="Record per-stage timings, cache hit rates and bytes fetched")
+if show_performance:
+    instrumentation.enable()
+
 st.title("📊 Retail Equity Research Platform")
 st.caption("Transparent financial analysis and valuation")
 
@@ -17,42 +123,66 @@ ticker = st.text_input("Enter a stock ticker (e.g. AAPL)", value="AAPL")
 
 st.divider()
 
-if ticker:
-    # ✅ Always fetch financials first
-    financials = get_financials(ticker)
+if not ticker:
+    st.info("Enter a ticker symbol to see financial statements, metrics and DCF valuation.")
+    st.stop()
+
+# ✅ Always fetch financials first
+financials, snapshot = load_financials(ticker)
+valuation_ctx = load_valuation_context(ticker, snapshot, financials)
+
+overview_tab, statements_tab, metrics_tab, valuation_tab = st.tabs(
+    ["Company Overview", "Financial Statements", "Key Metrics", "Valuation"]
+)
+
 # Company Overview
-st.header("Company Overview")
+with overview_tab:
+    info = financials["Info"]
 
-info = financials["Info"]
+    st.subheader(info.get("shortName", ticker))
+    st.caption(info.get("industry", "N/A"))
 
-st.subheader(info.get("shortName", ticker))
-st.caption(info.get("industry", "N/A"))
+    col1, col2, col3 = st.columns(3)
 
-col1, col2, col3 = st.columns(3)
+    col1.metric("Market Cap", f"${info.get('marketCap', 0)/1e9:.1f}B")
+    col2.metric("Revenue", f"${info.get('totalRevenue', 0)/1e9:.1f}B")
+    col3.metric("Net Income", f"${info.get('netIncomeToCommon', 0)/1e9:.1f}B")
 
-col1.metric("Market Cap", f"${info.get('marketCap', 0)/1e9:.1f}B")
-col2.metric("Revenue", f"${info.get('totalRevenue', 0)/1e9:.1f}B")
-col3.metric("Net Income", f"${info.get('netIncomeToCommon', 0)/1e9:.1f}B")
+    st.write(info.get("longBusinessSummary", ""))
 
-st.write(info.get("longBusinessSummary", ""))
+    # Peer comparison against precomputed industry (or sector) aggregates
+    st.subheader("Peer Comparison")
+    comps = relative_valuation(financials, load_peers(cached_universe_size()))
+    if "Error" not in comps:
+        st.caption(f"{comps['Peers']} companies in {comps['Group']} ({comps['Group By']}), from the locally cached universe")
+
+        dcf_base = run_dcf_model(valuation_ctx, {})
+        implied = comps["Implied Price"]
+        col1, col2, col3, col4 = st.columns(4)
+        col1.metric("Current Price", f"${comps['Current Price']:.2f}")
+        col2.metric("DCF Value (default assumptions)", f"${dcf_base['Value per Share']:.2f}" if "Error" not in dcf_base else "—")
+        col3.metric("At Peer Median P/E", f"${implied.loc['P/E Ratio', 0.5]:.2f}" if pd.notna(implied.loc['P/E Ratio', 0.5]) else "—")
+        col4.metric("At Peer Median P/B", f"${implied.loc['P/B Ratio', 0.5]:.2f}" if pd.notna(implied.loc['P/B Ratio', 0.5]) else "—")
+
+        comparison = comps["Comparison"].rename(columns={0.25: "Peer 25th", 0.5: "Peer Median", 0.75: "Peer 75th"})
+        st.dataframe(pd.DataFrame(
+            [["" if pd.isna(v) else format_ratio(ratio, v) for v in row] for ratio, row in comparison.iterrows()],
+            index=comparison.index, columns=comparison.columns
+        ))
+    else:
+        st.info(f"{comps['Error']}. Run `python peers.py tickers.txt` to build a larger peer universe.")
 
 
 # Financial Statements
-st.header("Financial Statements")
-if ticker:
-    financials = get_financials(ticker)
-    for name, df in financials.items():
-        if name == "Info":
-            continue
-        st.subheader(name)
-        # Divide all numbers by 1 million for readability
-        df_m = df / 1_000_000
-        st.dataframe(df_m.style.format("${:,.0f}M"))
+with statements_tab:
+    statements = format_statements(ticker, snapshot, financials)
+    for statement_tab, (name, df_m) in zip(st.tabs(list(statements)), statements.items()):
+        with statement_tab:
+            st.dataframe(df_m)
 
 # Key Metrics
-st.header("Key Metrics")
-if ticker:
-    metrics = calculate_key_metrics(financials)
+with metrics_tab:
+    metrics = load_metrics(ticker, snapshot, financials)
     if metrics and "Error" not in metrics:
         # Descriptions for each metric
         descriptions = {
@@ -72,7 +202,7 @@ if ticker:
             'YoY Equity Growth': 'Year-over-year change in shareholders\' equity',
             'YoY EPS Growth': 'Year-over-year change in earnings per share'
         }
-        
+
         # Group metrics by category
         profitability_ratios = ['Gross Margin', 'Operating Margin', 'Net Margin']
         liquidity_ratios = ['Current Ratio', 'Quick Ratio']
@@ -80,7 +210,7 @@ if ticker:
         efficiency_ratios = ['Return on Assets (ROA)']
         valuation_ratios = ['P/E Ratio', 'P/B Ratio']
         growth_ratios = ['YoY Revenue Growth', 'YoY Net Income Growth', 'YoY EPS Growth', 'YoY Assets Growth', 'YoY Equity Growth']
-        
+
         # Display each group
         groups = [
             ("Profitability Ratios", profitability_ratios),
@@ -90,7 +220,7 @@ if ticker:
             ("Valuation Ratios", valuation_ratios),
             ("Growth Metrics", growth_ratios)
         ]
-        
+
         for group_name, ratio_list in groups:
             st.subheader(group_name)
             cols = st.columns(len(ratio_list))
@@ -100,28 +230,30 @@ if ticker:
                     cols[i].caption(descriptions.get(ratio, ""))
     else:
         st.info("Unable to calculate metrics.")
-else:
-    st.info("Financial ratios and performance metrics will appear here.")
 
-# Valuation (DCF)
-st.header("Valuation (DCF)")
 
-if ticker:
+@st.fragment
+@instrumentation.instrument("app.valuation_panel")
+def valuation_panel(valuation_ctx, snapshot):
+    """
+    Sliders and everything that depends on them. Running as a fragment
+    means a slider change reruns only this panel, not the whole page.
+    """
     # DCF Assumptions
     st.subheader("DCF Assumptions")
     col1, col2, col3 = st.columns(3)
-    
+
     with col1:
         discount_rate = st.slider("Discount Rate (WACC)", 0.05, 0.20, 0.10, 0.01, help="Required rate of return")
         terminal_growth = st.slider("Terminal Growth Rate", 0.00, 0.05, 0.025, 0.005, help="Long-term growth rate")
-    
+
     with col2:
         revenue_growth = st.slider("Revenue Growth Rate", -0.10, 0.20, 0.05, 0.01, help="Annual revenue growth")
         margin_improvement = st.slider("Margin Improvement", -0.02, 0.02, 0.005, 0.001, help="Annual operating margin improvement")
-    
+
     with col3:
         projection_years = st.slider("Projection Years", 3, 10, 5, 1, help="Number of years to project cash flows")
-    
+
     assumptions = {
         'discount_rate': discount_rate,
         'terminal_growth': terminal_growth,
@@ -129,13 +261,13 @@ if ticker:
         'revenue_growth': revenue_growth,
         'margin_improvement': margin_improvement
     }
-    
+
     # Run DCF
-    dcf_result = run_dcf_model(financials, assumptions)
-    
+    dcf_result = run_dcf_model(valuation_ctx, assumptions)
+
     if "Error" not in dcf_result:
         st.subheader("DCF Valuation Results")
-        
+
         # Key metrics
         col1, col2, col3, col4 = st.columns(4)
         with col1:
@@ -144,24 +276,24 @@ if ticker:
             st.metric("Current Price", f"${dcf_result['Current Price']:.2f}")
         with col3:
             upside = dcf_result['Upside/Downside']
-            st.metric("Upside/Downside", f"{upside:.1%}", 
+            st.metric("Upside/Downside", f"{upside:.1%}",
                      delta=f"{upside:.1%}" if upside > 0 else f"{upside:.1%}",
                      delta_color="normal" if upside > 0 else "inverse")
         with col4:
             st.metric("Enterprise Value", f"${dcf_result['Enterprise Value']/1e9:.1f}B")
-        
+
         # Assumptions summary
         st.subheader("Assumptions Used")
-        assumptions = dcf_result['Assumptions']
+        used = dcf_result['Assumptions']
         col1, col2, col3 = st.columns(3)
-        for i, (key, value) in enumerate(assumptions.items()):
+        for i, (key, value) in enumerate(used.items()):
             if i % 3 == 0:
                 col1.metric(key, value)
             elif i % 3 == 1:
                 col2.metric(key, value)
             else:
                 col3.metric(key, value)
-        
+
         # Projected Cash Flows
         st.subheader("Projected Free Cash Flows")
         years = [f"Year {i+1}" for i in range(projection_years)]
@@ -171,67 +303,232 @@ if ticker:
         })
         projected_df['Projected FCF'] = projected_df['Projected FCF'].apply(lambda x: f"${x/1e6:.0f}M")
         st.dataframe(projected_df)
-        
+
         st.caption(f"Terminal Value: ${dcf_result['Terminal Value']/1e9:.1f}B")
+
+        # Sensitivity heatmap: WACC x terminal growth at the current growth/margin sliders
+        with st.expander("Sensitivity: WACC vs Terminal Growth"):
+            grid = run_dcf_grid(
+                valuation_ctx,
+                discount_rates=np.round(np.arange(0.05, 0.2001, 0.01), 3),
+                terminal_growths=np.round(np.arange(0.0, 0.0501, 0.005), 3),
+                projection_years=projection_years,
+                assumptions=assumptions
+            )
+            if "Error" not in grid:
+                rates = grid['Axes']['Discount Rate']
+                growths = grid['Axes']['Terminal Growth']
+                heatmap_df = pd.DataFrame({
+                    'WACC': np.repeat(rates, len(growths)),
+                    'Terminal Growth': np.tile(growths, len(rates)),
+                    'Value per Share': grid['Value per Share'].ravel()
+                }).dropna()
+                heatmap = alt.Chart(heatmap_df).mark_rect().encode(
+                    x=alt.X('Terminal Growth:O', axis=alt.Axis(format='.1%')),
+                    y=alt.Y('WACC:O', axis=alt.Axis(format='.0%'), sort='descending'),
+                    color=alt.Color('Value per Share:Q', scale=alt.Scale(scheme='redyellowgreen')),
+                    tooltip=[
+                        alt.Tooltip('WACC:Q', format='.1%'),
+                        alt.Tooltip('Terminal Growth:Q', format='.1%'),
+                        alt.Tooltip('Value per Share:Q', format='$,.2f')
+                    ]
+                )
+                st.altair_chart(heatmap, use_container_width=True)
+                st.caption(f"Current price: ${grid['Current Price']:.2f}")
+
+        # Reverse DCF: solved on the vectorized kernel, so it is cheap enough to run on every slider change
+        with st.expander("Reverse DCF: Market-Implied Assumptions"):
+            st.caption("Each value reproduces the current price with the other sliders held where they are.")
+            cols = st.columns(3)
+            slider_values = {
+                "revenue_growth": revenue_growth,
+                "margin_improvement": margin_improvement,
+                "discount_rate": discount_rate
+            }
+            for col, (variable, slider_value) in zip(cols, slider_values.items()):
+                implied = solve_implied(valuation_ctx, variable, assumptions)
+                if "Error" not in implied:
+                    col.metric(
+                        IMPLIED_LABELS[variable],
+                        f"{implied['Implied Value']:.2%}",
+                        delta=f"{implied['Implied Value'] - slider_value:+.2%} vs slider",
+                        delta_color="off"
+                    )
+                else:
+                    col.metric(IMPLIED_LABELS[variable], "—")
+                    col.caption(implied["Error"])
     else:
         st.error(f"DCF calculation failed: {dcf_result['Error']}")
-else:
-    st.info("Enter a ticker symbol to see DCF valuation.")
-
-# Scenario Analysis
-st.header("Scenario Analysis")
-
-scenarios = {
-    "Bear": {
-        "discount_rate": 0.10,
-        "terminal_growth": 0.02,
-        "revenue_growth": 0.03,
-        "margin_improvement": 0.002
-    },
-    "Base": {
-        "discount_rate": 0.075,
-        "terminal_growth": 0.03,
-        "revenue_growth": 0.05,
-        "margin_improvement": 0.005
-    },
-    "Bull": {
-        "discount_rate": 0.065,
-        "terminal_growth": 0.035,
-        "revenue_growth": 0.07,
-        "margin_improvement": 0.008
-    }
-}
-
-cols = st.columns(3)
-
-for col, (name, params) in zip(cols, scenarios.items()):
-    with col:
-        scenario_assumptions = {
-            "discount_rate": params["discount_rate"],
-            "terminal_growth": params["terminal_growth"],
-            "revenue_growth": params["revenue_growth"],
-            "margin_improvement": params["margin_improvement"],
-            "projection_years": projection_years
-        }
 
-        dcf = run_dcf_model(financials, scenario_assumptions)
-
-        st.subheader(name)
+    # Monte Carlo
+    with st.expander("Monte Carlo Valuation"):
+        st.caption("Assumptions are drawn around the slider values above; revenue growth also varies year to year.")
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            wacc_std = st.number_input("WACC Std Dev", 0.0, 0.05, 0.01, 0.0025, format="%.4f")
+            growth_low, growth_high = st.slider("Revenue Growth Range", -0.10, 0.30, (revenue_growth - 0.03, revenue_growth + 0.03), 0.005)
+        with col2:
+            terminal_spread = st.number_input("Terminal Growth +/-", 0.0, 0.02, 0.005, 0.001, format="%.3f")
+            margin_std = st.number_input("Margin Improvement Std Dev", 0.0, 0.01, 0.002, 0.0005, format="%.4f")
+        with col3:
+            wacc_terminal_corr = st.slider("WACC / Terminal Growth Correlation", -0.9, 0.9, 0.3, 0.1)
+            n_paths = st.select_slider("Paths", options=[10_000, 100_000, 250_000, 1_000_000], value=100_000)
 
-        if "Error" not in dcf:
-            st.metric(
-                "Intrinsic Value per Share",
-                f"${dcf['Value per Share']:.2f}"
+        if st.button("Run Simulation"):
+            distributions = {
+                "discount_rate": {"dist": "normal", "mean": discount_rate, "std": wacc_std},
+                "terminal_growth": {
+                    "dist": "triangular",
+                    "low": terminal_growth - terminal_spread,
+                    "mode": terminal_growth,
+                    "high": terminal_growth + terminal_spread
+                } if terminal_spread else terminal_growth,
+                "revenue_growth": {"dist": "uniform", "low": growth_low, "high": growth_high},
+                "margin_improvement": {"dist": "normal", "mean": margin_improvement, "std": margin_std}
+            }
+            mc_result = run_monte_carlo(
+                valuation_ctx,
+                distributions,
+                correlation={("discount_rate", "terminal_growth"): wacc_terminal_corr},
+                n_paths=n_paths,
+                projection_years=projection_years,
+                seed=42
             )
-        else:
-            st.error("DCF failed")
+
+            if "Error" not in mc_result:
+                col1, col2, col3, col4 = st.columns(4)
+                col1.metric("Median Value", f"${mc_result['Percentiles'][50]:.2f}")
+                col2.metric("5th - 95th Percentile", f"${mc_result['Percentiles'][5]:.2f} - ${mc_result['Percentiles'][95]:.2f}")
+                col3.metric("Probability of Upside", f"{mc_result['Probability of Upside']:.1%}")
+                col4.metric("Current Price", f"${mc_result['Current Price']:.2f}")
+
+                edges = mc_result['Histogram']['Edges']
+                histogram_df = pd.DataFrame({
+                    'Value per Share': (edges[:-1] + edges[1:]) / 2,
+                    'Paths': mc_result['Histogram']['Counts']
+                })
+                st.bar_chart(histogram_df, x='Value per Share', y='Paths')
+                if mc_result['Invalid Paths']:
+                    st.caption(f"{mc_result['Invalid Paths']:,} paths discarded (WACC at or below terminal growth)")
+            else:
+                st.error(f"Simulation failed: {mc_result['Error']}")
+
+    # Scenario Analysis: saved sets, evaluated in one batch and memoized per (snapshot, scenario)
+    with st.expander("Scenario Analysis", expanded=True):
+        set_name = st.selectbox("Scenario Set", list_scenario_sets(), key="scenario_set")
+        try:
+            scenario_set = load_scenario_set(set_name)
+        except (KeyError, ValueError) as e:
+            st.error(str(e))
+            scenario_set = load_scenario_set(DEFAULT_SET)
+
+        def assumption(params, name):
+            return params.get(name, DEFAULT_ASSUMPTIONS[name])
+
+        editor_df = pd.DataFrame([
+            {
+                "Scenario": name,
+                "Discount Rate": assumption(params, "discount_rate"),
+                "Terminal Growth": assumption(params, "terminal_growth"),
+                "Revenue Growth": format_growth(assumption(params, "revenue_growth")),
+                "Margin Improvement": assumption(params, "margin_improvement"),
+            }
+            for name, params in scenario_set.items()
+        ])
+        edited = st.data_editor(
+            editor_df,
+            num_rows="dynamic",
+            hide_index=True,
+            key=f"scenario_editor_{set_name}",
+            column_config={
+                "Discount Rate": st.column_config.NumberColumn(format="%.3f", step=0.005),
+                "Terminal Growth": st.column_config.NumberColumn(format="%.3f", step=0.005),
+                "Revenue Growth": st.column_config.TextColumn(help="A flat rate, or one rate per year: 12%, 10%, 8%"),
+                "Margin Improvement": st.column_config.NumberColumn(format="%.4f", step=0.001),
+            }
+        )
+
+        # Blank cells fall back to run_dcf_model's defaults
+        def cell(row, column, name):
+            value = row.get(column)
+            return DEFAULT_ASSUMPTIONS[name] if value is None or pd.isna(value) or value == "" else value
+
+        scenarios = {}
+        for row in edited.to_dict("records"):
+            name = "" if pd.isna(row.get("Scenario")) else str(row["Scenario"]).strip()
+            if not name:
+                continue
+            try:
+                scenarios[name] = {
+                    "discount_rate": float(cell(row, "Discount Rate", "discount_rate")),
+                    "terminal_growth": float(cell(row, "Terminal Growth", "terminal_growth")),
+                    "revenue_growth": parse_growth(cell(row, "Revenue Growth", "revenue_growth")),
+                    "margin_improvement": float(cell(row, "Margin Improvement", "margin_improvement")),
+                }
+            except (TypeError, ValueError) as e:
+                st.warning(f"{name}: {e}")
+
+        if scenarios:
+            try:
+                results = load_scenario_engine().evaluate(valuation_ctx, scenarios, projection_years, snapshot=snapshot)
+                results_df = pd.DataFrame.from_dict(results, orient="index")[["Value per Share", "Upside/Downside"]]
+                results_df.index.name = "Scenario"
+                st.dataframe(results_df.style.format(
+                    {"Value per Share": "${:,.2f}", "Upside/Downside": "{:.1%}"}, na_rep="—"
+                ))
+            except ValueError as e:
+                st.error(f"Scenario analysis failed: {e}")
+
+        # Runs before the next rerun, so the saved set is already listed and selected above
+        def save_set(name, scenarios):
+            try:
+                save_scenario_set(name, scenarios)
+                st.session_state["scenario_set"] = name
+                st.session_state["scenario_save_result"] = (True, f"Saved {name}")
+            except ValueError as e:
+                st.session_state["scenario_save_result"] = (False, str(e))
+
+        col1, col2 = st.columns([3, 1], vertical_alignment="bottom")
+        save_as = col1.text_input("Save Set As", value="" if set_name == DEFAULT_SET else set_name).strip()
+        col2.button("Save Set", disabled=not (save_as and scenarios), on_click=save_set, args=(save_as, scenarios))
+        saved = st.session_state.pop("scenario_save_result", None)
+        if saved and saved[0]:
+            st.success(saved[1])
+        elif saved:
+            st.error(saved[1])
+
+
+# Valuation (DCF)
+with valuation_tab:
+    valuation_panel(valuation_ctx, snapshot)
 
 st.divider()
 
+# Performance sidebar (rendered last so it includes this run's stages)
+if show_performance:
+    with st.sidebar:
+        st.header("Performance")
+        perf = instrumentation.snapshot()
+        counters = perf["counters"]
+        col1, col2 = st.columns(2)
+        col1.metric("Cache Hit Rate", f"{counters['cache_hit_rate']:.0%}" if "cache_hit_rate" in counters else "—")
+        col2.metric("Fetched", f"{counters.get('bytes_fetched', 0) / 1024:.0f} KB")
+        prefetch = load_scheduler().status()
+        st.caption(f"Prefetch: {prefetch['watched']} watched, {prefetch['in_flight']} in flight, "
+                   f"{prefetch['queued']} queued")
+        if perf["stages"]:
+            stages_df = pd.DataFrame(perf["stages"]).T.sort_values("total_ms", ascending=False)
+            st.dataframe(stages_df.style.format({"calls": "{:.0f}", "total_ms": "{:.1f}", "mean_ms": "{:.2f}", "max_ms": "{:.1f}"}))
+        st.caption("Cached Streamlit stages don't call the instrumented functions, so warm reruns record little.")
+        with st.expander("Prometheus"):
+            st.code(instrumentation.to_prometheus(), language="text")
+        if st.button("Reset Stats"):
+            instrumentation.reset()
+
 # Methodology
 st.header("Methodology")
 st.write("""
 This platform provides transparent, assumption-driven equity analysis.
 Data is sourced from public financial statements and valuation logic
 is intentionally simple and explainable.
-""")
\ No newline at end of file
+""")
@@ -0,0 +1,414 @@
+"""
+Asyncio data layer for serving many Streamlit sessions from one process.
+
+    python async_data.py --sessions 1 8 32 128 --latency 0.2   # load test against a local stub server
+
+AsyncDataLayer.get_financials behaves like data.get_financials (same
+cache, same TTLs, stale data on failure) but awaits its downloads, and
+concurrent requests for the same ticker share one download. Sync code
+such as app.py calls get_financials_sync, which runs everything on one
+background event loop, so requests coalesce across sessions.
+
+Providers are async: HTTPProvider reads a JSON snapshot service through
+a pooled httpx client (or a pooled requests session when httpx is not
+installed), and ThreadedProvider runs any sync provider (e.g. Yahoo) on
+a bounded thread pool. EQUITY_DATA_URL selects HTTPProvider.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+import pandas as pd
+from cache import FIELDS, STATEMENT_FIELDS, _file_stem
+from data import get_default_cache, get_default_provider, _stale_fields, _merge_fetched, _copy_frame, _approx_bytes
+from instrumentation import timed, count, is_enabled
+
+_FIELD_BY_STEM = {_file_stem(field): field for field in FIELDS}
+
+
+def _has_httpx():
+    try:
+        import httpx  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def frame_to_json(df):
+    """
+    A statement frame as a JSON-ready dict (pandas "split" layout).
+    """
+    return df.to_dict(orient="split")
+
+
+def frame_from_json(payload):
+    df = pd.DataFrame(payload["data"], index=payload["index"], columns=payload["columns"], dtype=float)
+    df.index = df.index.astype(str)
+    return df
+
+
+class AsyncProvider:
+    """
+    Async counterpart of providers.DataProvider.
+    """
+
+    cacheable = False
+
+    async def fetch(self, ticker, field):
+        raise NotImplementedError
+
+    async def aclose(self):
+        pass
+
+
+class ThreadedProvider(AsyncProvider):
+    """
+    Runs a sync provider's fetch on a bounded thread pool, so blocking
+    calls (yfinance) never stall the event loop.
+    """
+
+    def __init__(self, provider, max_workers=16):
+        self.provider = provider
+        self.cacheable = provider.cacheable
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="async-fetch")
+
+    async def fetch(self, ticker, field):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self.provider.fetch, ticker, field)
+
+    async def aclose(self):
+        self._executor.shutdown(wait=False)
+
+
+class HTTPProvider(AsyncProvider):
+    """
+    Fields from a JSON snapshot service: GET <base_url>/<TICKER>/<field>,
+    with the field named as in the cache layout (income_statement, ...,
+    info). Statements are in pandas "split" layout.
+
+    Connections are pooled, up to `max_connections`. The client is bound
+    to the event loop that first uses it.
+    """
+
+    cacheable = True
+
+    def __init__(self, base_url, max_connections=32, timeout=10.0):
+        self.base_url = base_url.rstrip("/")
+        self.max_connections = max_connections
+        self.timeout = timeout
+        self._client = None
+        self._executor = None
+
+    def _url(self, ticker, field):
+        return f"{self.base_url}/{ticker.strip().upper()}/{_file_stem(field)}"
+
+    async def _get_json(self, url):
+        if _has_httpx():
+            import httpx
+
+            if self._client is None:
+                limits = httpx.Limits(max_connections=self.max_connections,
+                                      max_keepalive_connections=self.max_connections)
+                self._client = httpx.AsyncClient(limits=limits, timeout=self.timeout)
+            response = await self._client.get(url)
+            response.raise_for_status()
+            return response.json()
+
+        # Fallback: a pooled requests session on a thread pool of the same size
+        if self._client is None:
+            import requests
+            from requests.adapters import HTTPAdapter
+
+            self._client = requests.Session()
+            self._client.mount("http://", HTTPAdapter(pool_maxsize=self.max_connections))
+            self._client.mount("https://", HTTPAdapter(pool_maxsize=self.max_connections))
+            self._executor = ThreadPoolExecutor(max_workers=self.max_connections, thread_name_prefix="async-http")
+
+        def get():
+            response = self._client.get(url, timeout=self.timeout)
+            response.raise_for_status()
+            return response.json()
+
+        return await asyncio.get_running_loop().run_in_executor(self._executor, get)
+
+    async def fetch(self, ticker, field):
+        payload = await self._get_json(self._url(ticker, field))
+        return payload if field == "Info" else frame_from_json(payload)
+
+    async def aclose(self):
+        if self._client is not None:
+            if _has_httpx():
+                await self._client.aclose()
+            else:
+                self._client.close()
+                self._executor.shutdown(wait=False)
+            self._client = None
+
+
+class AsyncDataLayer:
+    """
+    get_financials on an event loop, with request coalescing.
+
+    The coalescing table lives on the layer, so one layer must be used
+    from one event loop (get_financials_sync takes care of that).
+    """
+
+    def __init__(self, provider=None, cache=None, retries=0, backoff=0.5):
+        self.provider = provider or ThreadedProvider(get_default_provider())
+        if cache is None:
+            cache = get_default_cache() if self.provider.cacheable else False
+        self.cache = cache
+        self.retries = retries
+        self.backoff = backoff
+        self._inflight = {}
+
+    async def get_financials(self, ticker):
+        """
+        Same result as data.get_financials. Callers asking for a ticker
+        that is already loading wait for that load instead of starting
+        another.
+        """
+        key = ticker.strip().upper()
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._load(key))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+            # Shielded so one caller giving up doesn't cancel the load for the others
+            return await asyncio.shield(task)
+
+        count("coalesced_requests")
+        financials = await asyncio.shield(task)
+        # The first caller owns the loaded objects; everyone else gets copies
+        return {
+            field: dict(value) if field == "Info" else _copy_frame(value)
+            for field, value in financials.items()
+        }
+
+    async def aclose(self):
+        await self.provider.aclose()
+
+    async def _load(self, ticker):
+        cache = self.cache
+        # Cache reads and writes touch the disk, so keep them off the loop
+        entry = await asyncio.to_thread(cache.get, ticker) if cache else {}
+        stale = _stale_fields(cache, entry)
+
+        fetched = {}
+        error = None
+        if stale:
+            try:
+                fetched = await self._fetch_fields(ticker, stale)
+            except Exception as e:
+                error = e
+
+        return await asyncio.to_thread(_merge_fetched, ticker, cache, entry, fetched, error)
+
+    async def _fetch(self, ticker, field):
+        attempt = 0
+        while True:
+            try:
+                with timed("provider.fetch"):
+                    value = await self.provider.fetch(ticker, field)
+                break
+            except Exception:
+                if attempt >= self.retries:
+                    raise
+                await asyncio.sleep(self.backoff * (2 ** attempt) * (0.5 + random.random()))
+                attempt += 1
+        if is_enabled():
+            count("fields_fetched")
+            count("bytes_fetched", _approx_bytes(value))
+        return value
+
+    async def _fetch_fields(self, ticker, fields):
+        """
+        data._fetch_fields with the statements downloaded concurrently.
+        """
+        fetched = {}
+        # Info first: if it fails there is no point downloading the statements
+        if "Info" in fields:
+            fetched["Info"] = await self._fetch(ticker, "Info")
+
+        statements = [field for field in fields if field in STATEMENT_FIELDS]
+        results = await asyncio.gather(*(self._fetch(ticker, field) for field in statements),
+                                       return_exceptions=True)
+        for field, result in zip(statements, results):
+            fetched[field] = pd.DataFrame() if isinstance(result, Exception) else result
+        return fetched
+
+
+class SyncBridge:
+    """
+    An event loop on a daemon thread that sync code submits coroutines to.
+    """
+
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self.loop.run_forever, name="async-data", daemon=True)
+        self._thread.start()
+
+    def run(self, coro, timeout=None):
+        """
+        Run `coro` on the bridge's loop and block until it finishes.
+        """
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result(timeout)
+
+    def close(self):
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join()
+        self.loop.close()
+
+
+_bridge = None
+_layer = None
+_bridge_lock = threading.Lock()
+
+
+def is_configured():
+    """
+    Whether the app should load through this layer (EQUITY_DATA_URL or EQUITY_ASYNC_DATA=1).
+    """
+    return is_remote() or os.environ.get("EQUITY_ASYNC_DATA", "") == "1"
+
+
+def is_remote():
+    """
+    Whether data comes from a snapshot service (EQUITY_DATA_URL) rather than the default provider.
+    """
+    return bool(os.environ.get("EQUITY_DATA_URL"))
+
+
+def get_default_layer():
+    """
+    Process-wide bridge and layer: HTTPProvider for EQUITY_DATA_URL,
+    otherwise the default provider on a thread pool.
+    """
+    global _bridge, _layer
+    with _bridge_lock:
+        if _layer is None:
+            url = os.environ.get("EQUITY_DATA_URL")
+            _bridge = SyncBridge()
+            _layer = AsyncDataLayer(HTTPProvider(url) if url else None, retries=2)
+        return _bridge, _layer
+
+
+def get_financials_sync(ticker, timeout=60):
+    """
+    Blocking get_financials through the shared async layer. Safe to call
+    from any thread; concurrent calls for one ticker share a download.
+    """
+    bridge, layer = get_default_layer()
+    return bridge.run(layer.get_financials(ticker), timeout)
+
+
+class _StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # The default backlog of 5 drops connections under load, adding 1s SYN retries to the tail
+    request_queue_size = 256
+
+
+def serve_provider(provider, host="127.0.0.1", port=0, latency=0.0):
+    """
+    Serve a sync provider over HTTP in the layout HTTPProvider reads, on a
+    daemon thread, sleeping `latency` seconds per request to stand in for
+    a remote service. Returns the server; `server.url` is its base URL and
+    `server.requests` counts requests served. Call server.shutdown() to stop.
+    """
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        # Otherwise Nagle holds back the body behind the unacknowledged
+        # headers on keep-alive connections, adding ~40ms to every request
+        disable_nagle_algorithm = True
+
+        def do_GET(self):
+            server.requests += 1
+            parts = self.path.strip("/").split("/")
+            field = _FIELD_BY_STEM.get(parts[-1]) if len(parts) == 2 else None
+            try:
+                if field is None:
+                    raise KeyError(self.path)
+                value = provider.fetch(parts[0], field)
+                body = json.dumps(value if field == "Info" else frame_to_json(value), default=str).encode()
+                status = 200
+            except Exception as e:
+                body, status = json.dumps({"error": str(e)}).encode(), 404
+            if latency:
+                time.sleep(latency)
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = _StubServer((host, port), Handler)
+    server.requests = 0
+    server.url = f"http://{host}:{server.server_address[1]}"
+    threading.Thread(target=server.serve_forever, name="stub-server", daemon=True).start()
+    return server
+
+
+async def load_test(url, sessions, tickers, requests_per_session=5, seed=0):
+    """
+    `sessions` concurrent clients each loading `requests_per_session`
+    random tickers from `tickers` through one uncached layer. Returns
+    per-request latencies in seconds.
+    """
+    layer = AsyncDataLayer(HTTPProvider(url, max_connections=64), cache=False)
+    rng = random.Random(seed)
+    plans = [[rng.choice(tickers) for _ in range(requests_per_session)] for _ in range(sessions)]
+    latencies = []
+
+    async def session(plan):
+        for ticker in plan:
+            start = time.perf_counter()
+            await layer.get_financials(ticker)
+            latencies.append(time.perf_counter() - start)
+
+    try:
+        await asyncio.gather(*(session(plan) for plan in plans))
+    finally:
+        await layer.aclose()
+    return latencies
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, nargs="+", default=[1, 8, 32, 128])
+    parser.add_argument("--tickers", type=int, default=20, help="Distinct tickers the sessions draw from")
+    parser.add_argument("--requests", type=int, default=5, help="Requests per session")
+    parser.add_argument("--latency", type=float, default=0.2, help="Stub server latency per request (s)")
+    args = parser.parse_args(argv)
+
+    from providers import SyntheticProvider
+
+    provider = SyntheticProvider(n_tickers=args.tickers)
+    server = serve_provider(provider, latency=args.latency)
+    print(f"{'sessions':>8} {'requests':>8} {'served':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'req/s':>8}")
+    try:
+        for sessions in args.sessions:
+            served = server.requests
+            start = time.perf_counter()
+            latencies = asyncio.run(load_test(server.url, sessions, provider.tickers(), args.requests))
+            elapsed = time.perf_counter() - start
+            p50, p95, p99 = np.percentile(latencies, [50, 95, 99]) * 1000
+            print(f"{sessions:>8} {len(latencies):>8} {server.requests - served:>7} "
+                  f"{p50:>8.0f} {p95:>8.0f} {p99:>8.0f} {len(latencies) / elapsed:>8.0f}")
+    finally:
+        server.shutdown()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
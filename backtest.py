@@ -0,0 +1,287 @@
+"""
+Historical DCF backtest.
+
+    python backtest.py --provider local:<dir>             # every ticker in a snapshot directory
+    python backtest.py tickers.txt --scenario Bear -o observations.csv
+    python backtest.py --provider synthetic:2000 --workers 8
+
+Replays run_dcf_model at every historical statement date using only the
+periods reported by then, compares value per share with the price once
+the statements were public (`lag_days` after the period end) and measures
+forward returns from that date. Statements and prices are read through a
+provider with price history (local snapshots, synthetic or Yahoo); by
+default the local cache directory, so nothing is downloaded.
+
+Share counts come from info (current), and statements are as last
+reported, so restatements and buybacks leak a little hindsight.
+"""
+import argparse
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+import numpy as np
+import pandas as pd
+from dcf import dcf_value_per_share, DEFAULT_SCENARIOS
+from statements import (
+    Statements, INCOME, BALANCE, CASH_FLOW, TOTAL_REVENUE, OPERATING_INCOME, CASH,
+    SHORT_TERM_DEBT, LONG_TERM_DEBT, OPERATING_CASH_FLOW, CAPEX,
+)
+from instrumentation import instrument
+
+# Forward return horizons, in calendar days
+DEFAULT_HORIZONS = {"6M": 182, "1Y": 365}
+
+# Statements are usually filed within a quarter of the period end
+DEFAULT_LAG_DAYS = 90
+
+# Days a price may be carried forward over holidays and gaps
+_MAX_STALE_DAYS = 5
+
+_worker = {}
+
+
+def _prices_at(closes, index, when):
+    """
+    Last close on or before each date in `when` (ticker, period) for the
+    ticker in that row. `closes` is dates x tickers, forward-filled; NaN
+    before the series starts or past its end.
+    """
+    position = np.searchsorted(index, when.ravel(), side="right").reshape(when.shape) - 1
+    valid = (position >= 0) & ~np.isnat(when)
+    if len(index):
+        valid &= when <= index[-1]
+    columns = np.broadcast_to(np.arange(closes.shape[1])[:, None], when.shape)
+    return np.where(valid, closes[np.clip(position, 0, None), columns], np.nan)
+
+
+@instrument("backtest.backtest_statements")
+def backtest_statements(statements, prices, assumptions=None, projection_years=5,
+                        lag_days=DEFAULT_LAG_DAYS, horizons=DEFAULT_HORIZONS):
+    """
+    Value every (ticker, period) of a Statements as of that period.
+
+    `prices` is a DataFrame of daily closes, dates x tickers. For period p
+    the DCF sees the period-p statements as the latest, with the same
+    fallbacks as run_dcf_model, and the price `lag_days` after the period
+    end; all tickers and periods go through one vectorized DCF call.
+
+    Returns one row per valued period: Ticker, Period, Valuation Date,
+    Price, Value per Share, Upside and a "Return <horizon>" column per
+    horizon (NaN when the price series ends too soon).
+    """
+    params = dict(DEFAULT_SCENARIOS["Base"])
+    params.update(assumptions or {})
+    years = int(params.pop("projection_years", projection_years))
+
+    values = statements.values
+    n_tickers, n_periods = values.shape[:2]
+    if n_periods == 0:
+        return pd.DataFrame(columns=_columns(horizons))
+
+    prices = prices.sort_index()
+    index = prices.index.to_numpy(dtype="datetime64[ns]")
+    closes = prices.reindex(columns=statements.tickers).ffill(limit=_MAX_STALE_DAYS).to_numpy(dtype=float)
+
+    period_end = pd.to_datetime(pd.Series(statements.dates.ravel()), errors="coerce").to_numpy()
+    valued_at = (period_end + np.timedelta64(lag_days, "D")).reshape(n_tickers, n_periods)
+    price = _prices_at(closes, index, valued_at)
+
+    # As of period p the cash flow history is periods p..oldest, so FCF is the oldest period's, as in run_dcf_model
+    n_cash_flow = statements.rows[CASH_FLOW].sum(axis=1)
+    usable = statements.rows[INCOME] & statements.rows[BALANCE] & (np.arange(n_periods) < n_cash_flow[:, None])
+    oldest = np.maximum(n_cash_flow - 1, 0)
+    rows = np.arange(n_tickers)
+    last_fcf = values[rows, oldest, OPERATING_CASH_FLOW] - np.abs(values[rows, oldest, CAPEX])
+
+    shares = np.nan_to_num(statements.info_array("sharesOutstanding"), nan=0.0)[:, None]
+    revenue = values[:, :, TOTAL_REVENUE]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        operating_margin = np.where(revenue != 0, values[:, :, OPERATING_INCOME] / revenue, 0.0)
+
+    inputs = {
+        "market_cap": price * shares,
+        "last_fcf": last_fcf[:, None],
+        "revenue": revenue,
+        "operating_margin": operating_margin,
+        "cash": values[:, :, CASH],
+        "debt": values[:, :, SHORT_TERM_DEBT] + values[:, :, LONG_TERM_DEBT],
+        "shares_outstanding": shares,
+    }
+    value_per_share, _ = dcf_value_per_share(inputs, years=years, **params)
+
+    valued = usable & (price > 0) & (shares > 0) & np.isfinite(value_per_share)
+    t, p = np.nonzero(valued)
+    result = pd.DataFrame({
+        "Ticker": np.asarray(statements.tickers, dtype=object)[t],
+        "Period": statements.dates[t, p],
+        "Valuation Date": valued_at[t, p],
+        "Price": price[t, p],
+        "Value per Share": value_per_share[t, p],
+    })
+    result["Upside"] = result["Value per Share"] / result["Price"] - 1
+    for name, days in horizons.items():
+        later = _prices_at(closes, index, valued_at + np.timedelta64(days, "D"))
+        result[f"Return {name}"] = later[t, p] / price[t, p] - 1
+    return result
+
+
+def _columns(horizons):
+    return (["Ticker", "Period", "Valuation Date", "Price", "Value per Share", "Upside"]
+            + [f"Return {name}" for name in horizons])
+
+
+def _rank_correlation(frame, x, y):
+    ranked = frame[[x, y]].rank()
+    return ranked[x].corr(ranked[y])
+
+
+def summarize(observations, horizons=DEFAULT_HORIZONS, by=None):
+    """
+    Signal quality per horizon: the hit rate (upside and forward return
+    have the same sign), mean forward return of names the DCF called
+    undervalued and overvalued, their spread, and the mean yearly rank
+    correlation between upside and return (IC).
+
+    `by` optionally groups further by a column of `observations`, e.g.
+    "Year" (added here from the valuation date).
+    """
+    observations = observations.assign(Year=pd.to_datetime(observations["Valuation Date"]).dt.year)
+    groups = observations.groupby(by) if by else [(None, observations)]
+
+    rows = {}
+    for key, group in groups:
+        for name in horizons:
+            column = f"Return {name}"
+            scored = group.dropna(subset=[column])
+            scored = scored[(scored["Upside"] != 0) & (scored[column] != 0)]
+            undervalued = scored["Upside"] > 0
+            hits = undervalued == (scored[column] > 0)
+            yearly_ic = [
+                _rank_correlation(year, "Upside", column)
+                for _, year in scored.groupby("Year") if len(year) > 2
+            ]
+            rows[name if key is None else (key, name)] = {
+                "Observations": len(scored),
+                "Hit Rate": hits.mean() if len(scored) else np.nan,
+                "Undervalued Return": scored.loc[undervalued, column].mean(),
+                "Overvalued Return": scored.loc[~undervalued, column].mean(),
+                "Spread": scored.loc[undervalued, column].mean() - scored.loc[~undervalued, column].mean(),
+                "IC": np.nanmean(yearly_ic) if yearly_ic else np.nan,
+            }
+
+    summary = pd.DataFrame.from_dict(rows, orient="index")
+    summary.index.names = ["Horizon"] if by is None else [by, "Horizon"]
+    return summary
+
+
+def _provider(provider_spec):
+    from cache import DEFAULT_CACHE_DIR
+    from providers import LocalFileProvider, provider_from_spec
+
+    return provider_from_spec(provider_spec) if provider_spec else LocalFileProvider(DEFAULT_CACHE_DIR)
+
+
+def _init_worker(provider_spec):
+    _worker["provider"] = _provider(provider_spec)
+
+
+def backtest_chunk(tickers, assumptions=None, projection_years=5, lag_days=DEFAULT_LAG_DAYS,
+                   horizons=DEFAULT_HORIZONS, provider=None):
+    """
+    Load statements and prices for some tickers and backtest them.
+    Tickers whose data can't be read are skipped.
+    """
+    provider = provider or _worker.get("provider") or _provider(None)
+    universe, closes = [], {}
+    for ticker in tickers:
+        try:
+            financials = provider.fetch_all(ticker)
+            if "error" in financials["Info"]:
+                continue
+            closes[ticker] = provider.prices(ticker)
+        except Exception:
+            continue
+        universe.append((ticker, financials))
+
+    if not universe:
+        return pd.DataFrame(columns=_columns(horizons))
+    prices = pd.concat(closes, axis=1)
+    return backtest_statements(Statements.from_universe(universe), prices, assumptions,
+                               projection_years, lag_days, horizons)
+
+
+@instrument("backtest.run_backtest")
+def run_backtest(tickers=None, assumptions=None, projection_years=5, lag_days=DEFAULT_LAG_DAYS,
+                 horizons=DEFAULT_HORIZONS, provider_spec=None, workers=None, chunk_size=250):
+    """
+    Backtest a universe in chunks of `chunk_size` tickers across `workers`
+    processes (1 runs inline). `tickers` defaults to every ticker the
+    provider lists. Returns the concatenated observations; pass them to
+    summarize for hit rates.
+    """
+    workers = workers or os.cpu_count() or 4
+    if tickers is None:
+        tickers = _provider(provider_spec).tickers()
+    tickers = list(tickers)
+    chunks = [tickers[i:i + chunk_size] for i in range(0, len(tickers), chunk_size)]
+    args = (assumptions, projection_years, lag_days, horizons)
+
+    if workers == 1 or len(chunks) <= 1:
+        provider = _provider(provider_spec)
+        parts = [backtest_chunk(chunk, *args, provider=provider) for chunk in chunks]
+    else:
+        parts = []
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(provider_spec,)) as pool:
+            chunk_iter = iter(chunks)
+            pending = set()
+            while True:
+                # At most 2 * workers chunks in flight, so memory stays flat for large universes
+                for chunk in chunk_iter:
+                    pending.add(pool.submit(backtest_chunk, chunk, *args))
+                    if len(pending) >= 2 * workers:
+                        break
+                if not pending:
+                    break
+                finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                parts += [future.result() for future in finished]
+
+    parts = [part for part in parts if len(part)]
+    if not parts:
+        return pd.DataFrame(columns=_columns(horizons))
+    return pd.concat(parts, ignore_index=True).sort_values(["Ticker", "Valuation Date"], ignore_index=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("tickers", nargs="?", help="File with tickers (default: every ticker the provider has)")
+    parser.add_argument("--provider", help='Data provider spec (default: local:<cache dir>)')
+    parser.add_argument("--scenario", default="Base", choices=list(DEFAULT_SCENARIOS))
+    parser.add_argument("--projection-years", type=int, default=5)
+    parser.add_argument("--lag-days", type=int, default=DEFAULT_LAG_DAYS, help="Days from period end to valuation")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 4)
+    parser.add_argument("--chunk-size", type=int, default=250)
+    parser.add_argument("--by-year", action="store_true", help="Break the summary down by valuation year")
+    parser.add_argument("-o", "--output", help="Write every observation to this CSV")
+    args = parser.parse_args(argv)
+
+    tickers = None
+    if args.tickers:
+        from cli import read_tickers
+        tickers = list(read_tickers(args.tickers))
+
+    observations = run_backtest(
+        tickers, DEFAULT_SCENARIOS[args.scenario], args.projection_years, args.lag_days,
+        provider_spec=args.provider, workers=args.workers, chunk_size=args.chunk_size,
+    )
+    if args.output:
+        observations.to_csv(args.output, index=False)
+    print(f"{observations['Ticker'].nunique()} tickers, {len(observations)} valuations", file=sys.stderr)
+    with pd.option_context("display.float_format", "{:.3f}".format, "display.width", 120):
+        print(summarize(observations, by="Year" if args.by_year else None))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,337 @@
+"""
+Offline benchmarks for the ingestion, metrics and valuation hot paths.
+
+    python benchmarks.py                          # run everything, print a table
+    python benchmarks.py --size large --output bench.json
+    python benchmarks.py --baseline bench.json --threshold 0.25
+
+All fixtures come from providers.SyntheticProvider, so no network is used.
+With --baseline, any benchmark whose median is more than `threshold`
+slower than the baseline's median is reported and the exit code is 1.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from async_data import load_test, serve_provider
+from backtest import backtest_statements
+from cache import FinancialsCache
+from data import get_financials
+from dcf import run_dcf_model, run_dcf_grid, calculate_historical_fcf, ValuationContext
+from metrics import calculate_key_metrics
+from montecarlo import run_monte_carlo
+from panel import build_panel, compute_panel_metrics
+from providers import SyntheticProvider
+from reverse_dcf import solve_implied, solve_implied_batch
+from statements import Statements
+
+# Fixture sizes: number of tickers for multi-ticker benchmarks and years of statements
+SIZES = {
+    "small": {"tickers": 200, "years": 4},
+    "medium": {"tickers": 1000, "years": 4},
+    "large": {"tickers": 5000, "years": 4},
+}
+
+SCENARIOS = [
+    {"discount_rate": 0.10, "terminal_growth": 0.02, "revenue_growth": 0.03, "margin_improvement": 0.002},
+    {"discount_rate": 0.075, "terminal_growth": 0.03, "revenue_growth": 0.05, "margin_improvement": 0.005},
+    {"discount_rate": 0.065, "terminal_growth": 0.035, "revenue_growth": 0.07, "margin_improvement": 0.008},
+]
+
+BENCHMARKS = {}
+
+
+def benchmark(name, repeat=20):
+    """
+    Register a benchmark. The decorated function receives the fixtures and
+    returns a zero-argument callable to time (setup stays untimed).
+    """
+    def register(fn):
+        BENCHMARKS[name] = (fn, repeat)
+        return fn
+    return register
+
+
+class Fixtures:
+    def __init__(self, size):
+        config = SIZES[size]
+        self.provider = SyntheticProvider(n_tickers=config["tickers"], years=config["years"])
+        self.tickers = self.provider.tickers()
+        self.financials = self.provider.fetch_all(self.tickers[0])
+        self._universe = None
+        self.tmpdirs = []
+        self.servers = []
+
+    @property
+    def universe(self):
+        if self._universe is None:
+            self._universe = {t: self.provider.fetch_all(t) for t in self.tickers}
+        return self._universe
+
+    def tmpdir(self):
+        path = tempfile.mkdtemp(prefix="equity_bench_")
+        self.tmpdirs.append(path)
+        return path
+
+    def cleanup(self):
+        for path in self.tmpdirs:
+            shutil.rmtree(path, ignore_errors=True)
+        for server in self.servers:
+            server.shutdown()
+
+
+@benchmark("historical_fcf", repeat=200)
+def bench_historical_fcf(fx):
+    cash_flow = fx.financials["Cash Flow"]
+    return lambda: calculate_historical_fcf(cash_flow)
+
+
+@benchmark("dcf_single", repeat=200)
+def bench_dcf_single(fx):
+    return lambda: run_dcf_model(fx.financials, SCENARIOS[1])
+
+
+@benchmark("dcf_context_value", repeat=200)
+def bench_dcf_context_value(fx):
+    ctx = ValuationContext(fx.financials, max_memo=0)
+    return lambda: ctx.value(SCENARIOS[1])
+
+
+@benchmark("scenario_batch", repeat=100)
+def bench_scenario_batch(fx):
+    def run():
+        ctx = ValuationContext(fx.financials)
+        return [ctx.value(dict(s, projection_years=5)) for s in SCENARIOS]
+    return run
+
+
+@benchmark("sensitivity_grid_50x50x10x10", repeat=10)
+def bench_sensitivity_grid(fx):
+    ctx = ValuationContext(fx.financials)
+    axes = (
+        np.linspace(0.05, 0.20, 50), np.linspace(0.0, 0.04, 50),
+        np.linspace(-0.10, 0.20, 10), np.linspace(-0.02, 0.02, 10),
+    )
+    return lambda: run_dcf_grid(ctx, *axes, projection_years=10)
+
+
+@benchmark("monte_carlo_100k", repeat=5)
+def bench_monte_carlo(fx):
+    ctx = ValuationContext(fx.financials)
+    distributions = {
+        "discount_rate": {"dist": "normal", "mean": 0.09, "std": 0.01},
+        "terminal_growth": {"dist": "triangular", "low": 0.015, "mode": 0.025, "high": 0.03},
+        "revenue_growth": {"dist": "uniform", "low": 0.0, "high": 0.1},
+    }
+    return lambda: run_monte_carlo(ctx, distributions, n_paths=100_000, seed=0)
+
+
+@benchmark("reverse_dcf_single", repeat=100)
+def bench_reverse_dcf(fx):
+    ctx = ValuationContext(fx.financials)
+    return lambda: solve_implied(ctx, "revenue_growth", SCENARIOS[1])
+
+
+@benchmark("reverse_dcf_universe", repeat=10)
+def bench_reverse_dcf_universe(fx):
+    statements = Statements.from_universe(fx.universe)
+    return lambda: solve_implied_batch(statements, "revenue_growth", SCENARIOS[1])
+
+
+@benchmark("backtest_universe", repeat=10)
+def bench_backtest_universe(fx):
+    statements = Statements.from_universe(fx.universe)
+    prices = pd.concat({t: fx.provider.prices(t) for t in fx.tickers}, axis=1)
+    return lambda: backtest_statements(statements, prices, SCENARIOS[1])
+
+
+@benchmark("async_coalesced_fetch_32_sessions", repeat=10)
+def bench_async_coalesced_fetch(fx):
+    # Local stub server with no added latency: measures the layer's own overhead
+    server = serve_provider(fx.provider)
+    fx.servers.append(server)
+    tickers = fx.tickers[:8]
+    return lambda: asyncio.run(load_test(server.url, 32, tickers, requests_per_session=2))
+
+
+# Import-time cases run in a fresh interpreter; compare against "startup_bare"
+_IMPORT_CASES = {
+    "startup_bare": "pass",
+    "startup_scalar_dcf": (
+        "from equity_core import value_dcf; value_dcf({'market_cap': 3e9, 'last_fcf': 1.2e8, 'revenue': 2e9, "
+        "'operating_margin': 0.12, 'cash': 3e8, 'debt': 5e8, 'shares_outstanding': 1e8, 'current_price': 30.0})"
+    ),
+    "startup_import_dcf_metrics": "import dcf, metrics",
+    "startup_import_data": "import data",
+}
+
+
+def _register_import_case(name, code):
+    root = os.path.dirname(os.path.abspath(__file__))
+
+    @benchmark(name, repeat=5)
+    def bench(fx):
+        return lambda: subprocess.run([sys.executable, "-c", code], cwd=root, check=True)
+
+
+for _name, _code in _IMPORT_CASES.items():
+    _register_import_case(_name, _code)
+
+
+@benchmark("key_metrics_single", repeat=200)
+def bench_key_metrics(fx):
+    return lambda: calculate_key_metrics(fx.financials)
+
+
+@benchmark("panel_metrics_universe", repeat=3)
+def bench_panel_metrics(fx):
+    universe = fx.universe
+    return lambda: compute_panel_metrics(build_panel(universe))
+
+
+@benchmark("statements_universe", repeat=3)
+def bench_statements_universe(fx):
+    universe = fx.universe
+    return lambda: Statements.from_universe(universe)
+
+
+@benchmark("panel_metrics_statements", repeat=20)
+def bench_panel_metrics_statements(fx):
+    statements = Statements.from_universe(fx.universe)
+    return lambda: compute_panel_metrics(statements)
+
+
+@benchmark("key_metrics_loop_universe", repeat=3)
+def bench_key_metrics_loop(fx):
+    universe = fx.universe
+    return lambda: [calculate_key_metrics(f) for f in universe.values()]
+
+
+@benchmark("ingest_cache_miss", repeat=50)
+def bench_ingest_miss(fx):
+    cache = FinancialsCache(fx.tmpdir())
+    ticker = fx.tickers[0]
+
+    def run():
+        cache.invalidate(ticker)
+        return get_financials(ticker, cache=cache, provider=fx.provider)
+    return run
+
+
+@benchmark("ingest_cache_hit_disk", repeat=50)
+def bench_ingest_disk_hit(fx):
+    cache = FinancialsCache(fx.tmpdir())
+    ticker = fx.tickers[0]
+    get_financials(ticker, cache=cache, provider=fx.provider)
+
+    def run():
+        cache.clear_memory()
+        return get_financials(ticker, cache=cache, provider=fx.provider)
+    return run
+
+
+@benchmark("ingest_cache_hit_memory", repeat=200)
+def bench_ingest_memory_hit(fx):
+    cache = FinancialsCache(fx.tmpdir())
+    ticker = fx.tickers[0]
+    get_financials(ticker, cache=cache, provider=fx.provider)
+    return lambda: get_financials(ticker, cache=cache, provider=fx.provider)
+
+
+def time_callable(fn, repeat):
+    fn()  # warm-up
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    return {
+        "repeat": repeat,
+        "min_ms": min(timings),
+        "median_ms": statistics.median(timings),
+        "mean_ms": statistics.fmean(timings),
+    }
+
+
+def run_benchmarks(size="small", only=None):
+    fx = Fixtures(size)
+    results = {}
+    try:
+        for name, (fn, repeat) in BENCHMARKS.items():
+            if only and not any(pattern in name for pattern in only):
+                continue
+            results[name] = time_callable(fn(fx), repeat)
+            print(f"{name:<32} {results[name]['median_ms']:>10.3f} ms", file=sys.stderr)
+    finally:
+        fx.cleanup()
+    return {
+        "meta": {
+            "size": size,
+            "timestamp": time.time(),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "pandas": pd.__version__,
+            "machine": platform.machine(),
+        },
+        "results": results,
+    }
+
+
+def compare(current, baseline, threshold):
+    """
+    Return (name, baseline_ms, current_ms, ratio) for every benchmark
+    slower than baseline by more than `threshold` (0.2 = 20%).
+    """
+    regressions = []
+    for name, result in current["results"].items():
+        base = baseline["results"].get(name)
+        if base is None:
+            continue
+        ratio = result["median_ms"] / base["median_ms"] if base["median_ms"] else float("inf")
+        if ratio > 1 + threshold:
+            regressions.append((name, base["median_ms"], result["median_ms"], ratio))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", choices=sorted(SIZES), default="small")
+    parser.add_argument("--only", nargs="*", help="Run only benchmarks whose name contains one of these")
+    parser.add_argument("--output", help="Write results JSON here")
+    parser.add_argument("--baseline", help="Compare against a previous results JSON")
+    parser.add_argument("--threshold", type=float, default=0.2, help="Allowed slowdown vs baseline (default 0.2)")
+    args = parser.parse_args(argv)
+
+    current = run_benchmarks(args.size, args.only)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(current, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline["meta"].get("size") != args.size:
+            print(f"warning: baseline size {baseline['meta'].get('size')} != {args.size}", file=sys.stderr)
+        regressions = compare(current, baseline, args.threshold)
+        for name, base_ms, current_ms, ratio in regressions:
+            print(f"REGRESSION {name}: {base_ms:.3f} ms -> {current_ms:.3f} ms ({ratio:.2f}x)")
+        if regressions:
+            return 1
+        print(f"No regressions beyond {args.threshold:.0%}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
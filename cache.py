@@ -0,0 +1,313 @@
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+from collections import OrderedDict
+
+from instrumentation import count
+
+# Fields returned by data.get_financials, in display order
+STATEMENT_FIELDS = ["Income Statement", "Balance Sheet", "Cash Flow"]
+FIELDS = STATEMENT_FIELDS + ["Info"]
+
+# Statements only change when a company reports; prices in Info move by the minute
+DEFAULT_TTLS = {
+    "Income Statement": 7 * 24 * 3600,
+    "Balance Sheet": 7 * 24 * 3600,
+    "Cash Flow": 7 * 24 * 3600,
+    "Info": 15 * 60,
+}
+
+DEFAULT_CACHE_DIR = os.environ.get(
+    "EQUITY_CACHE_DIR",
+    os.path.join(os.path.expanduser("~"), ".cache", "equity_research")
+)
+
+_META_FILE = "meta.json"
+
+# Other processes may share the cache directory, so the running size total
+# is re-read from disk at least this often
+_RESCAN_INTERVAL = 300
+
+logger = logging.getLogger("equity.cache")
+
+
+def _file_stem(field):
+    return field.lower().replace(" ", "_")
+
+
+def _has_parquet():
+    try:
+        import pyarrow  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def read_field(path, field):
+    """
+    Read one field from a ticker directory laid out like the cache:
+    <stem>.parquet or <stem>.csv per statement and info.json.
+    """
+    stem = os.path.join(path, _file_stem(field))
+    if field == "Info":
+        with open(stem + ".json") as f:
+            return json.load(f)
+    # Imported here so modules that only need the field names don't load pandas
+    import pandas as pd
+
+    if os.path.exists(stem + ".parquet"):
+        df = pd.read_parquet(stem + ".parquet")
+    else:
+        df = pd.read_csv(stem + ".csv", index_col=0)
+    df.index = df.index.astype(str)
+    return df
+
+
+def _dir_size(path):
+    """
+    Bytes in a ticker directory, skipping files renamed or removed meanwhile.
+    """
+    size = 0
+    try:
+        names = os.listdir(path)
+    except OSError:
+        return 0
+    for name in names:
+        try:
+            size += os.path.getsize(os.path.join(path, name))
+        except OSError:
+            continue
+    return size
+
+
+class FinancialsCache:
+    """
+    Two-tier (memory + disk) cache for the output of data.get_financials.
+
+    Each ticker is stored in its own directory: one Parquet (or CSV when
+    pyarrow is unavailable) file per statement, the info dict as JSON, and
+    a meta.json holding the fetch time of every field. Freshness is judged
+    per field so a stale price does not force statements to be re-downloaded.
+    Disk usage is bounded by evicting the least recently used tickers; a
+    running total of bytes per ticker means a write only scans the whole
+    directory when the total goes over max_bytes.
+    """
+
+    def __init__(self, directory=DEFAULT_CACHE_DIR, ttls=None, max_bytes=500 * 1024 * 1024,
+                 max_memory_entries=64, offline=False):
+        self.directory = directory
+        self.ttls = dict(DEFAULT_TTLS)
+        if ttls:
+            self.ttls.update(ttls)
+        self.max_bytes = max_bytes
+        self.max_memory_entries = max_memory_entries
+        # Offline mode serves whatever is on disk regardless of age (seeded test caches)
+        self.offline = offline
+        self.use_parquet = _has_parquet()
+        self._memory = OrderedDict()
+        self._lock = threading.RLock()
+        self._sizes = None  # ticker -> bytes on disk, read on first write
+        self._scanned_at = 0.0
+        self.hits = 0
+        self.misses = 0
+
+    def _ticker_dir(self, ticker):
+        return os.path.join(self.directory, ticker.strip().upper())
+
+    @staticmethod
+    def _key(ticker):
+        return ticker.strip().upper()
+
+    def get(self, ticker):
+        """
+        Return {field: (value, fetched_at)} for every cached field of a ticker.
+        Fields that were never cached are absent. Does not check freshness.
+        """
+        key = self._key(ticker)
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                self._memory.move_to_end(key)
+                return dict(entry)
+
+        entry = self._read_disk(key)
+        if entry:
+            self._remember(key, entry)
+        return dict(entry)
+
+    def is_fresh(self, field, fetched_at, now=None):
+        """
+        Whether a field fetched at `fetched_at` is still within its TTL.
+        """
+        if self.offline:
+            return True
+        now = time.time() if now is None else now
+        return now - fetched_at < self.ttls.get(field, 0)
+
+    def fresh_fields(self, entry, now=None):
+        now = time.time() if now is None else now
+        return {
+            field for field, (_, fetched_at) in entry.items()
+            if self.is_fresh(field, fetched_at, now)
+        }
+
+    def record(self, hit):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+        count("cache_hits" if hit else "cache_misses")
+
+    def put(self, ticker, fields, fetched_at=None):
+        """
+        Store some or all fields of a ticker, stamping them with `fetched_at`
+        (defaults to now). Fields not passed keep their existing cache entry.
+        """
+        if not fields:
+            return
+        key = self._key(ticker)
+        fetched_at = time.time() if fetched_at is None else fetched_at
+
+        with self._lock:
+            entry = dict(self._memory.get(key) or self._read_disk(key))
+            for field, value in fields.items():
+                entry[field] = (value, fetched_at)
+            self._remember(key, entry)
+            self._write_disk(key, fields, fetched_at)
+        self._evict_disk()
+
+    def seed(self, ticker, financials, fetched_at=None):
+        """
+        Populate the cache from a get_financials-style dict (e.g. for offline tests).
+        """
+        self.put(ticker, {f: financials[f] for f in FIELDS if f in financials}, fetched_at)
+
+    def invalidate(self, ticker):
+        key = self._key(ticker)
+        with self._lock:
+            self._memory.pop(key, None)
+            shutil.rmtree(self._ticker_dir(key), ignore_errors=True)
+            if self._sizes is not None:
+                self._sizes.pop(key, None)
+
+    def clear_memory(self):
+        with self._lock:
+            self._memory.clear()
+
+    def _remember(self, key, entry):
+        with self._lock:
+            self._memory[key] = entry
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_memory_entries:
+                self._memory.popitem(last=False)
+
+    def _read_meta(self, path):
+        try:
+            with open(os.path.join(path, _META_FILE)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _read_disk(self, key):
+        path = self._ticker_dir(key)
+        meta = self._read_meta(path)
+        entry = {}
+        for field, fetched_at in meta.items():
+            try:
+                entry[field] = (read_field(path, field), fetched_at)
+            except (OSError, ValueError, ImportError):
+                # Corrupt or unreadable file: treat as a miss for this field
+                continue
+        if entry:
+            # Touch meta so LRU eviction sees this ticker as recently used
+            try:
+                os.utime(os.path.join(path, _META_FILE))
+            except OSError:
+                pass
+        return entry
+
+    def _write_disk(self, key, fields, fetched_at):
+        path = self._ticker_dir(key)
+        try:
+            os.makedirs(path, exist_ok=True)
+            for field, value in fields.items():
+                self._write_field(path, field, value)
+            meta = self._read_meta(path)
+            meta.update({field: fetched_at for field in fields})
+            tmp = os.path.join(path, _META_FILE + ".tmp")
+            with open(tmp, "w") as f:
+                json.dump(meta, f)
+            os.replace(tmp, os.path.join(path, _META_FILE))
+            if self._sizes is not None:
+                self._sizes[key] = _dir_size(path)
+        except OSError:
+            # A read-only or full disk should degrade to memory-only caching
+            pass
+        except Exception:
+            # Never let a cache write fail a fetch that succeeded
+            logger.warning("Couldn't cache %s on disk", key, exc_info=True)
+
+    def _write_field(self, path, field, value):
+        stem = os.path.join(path, _file_stem(field))
+        if field == "Info":
+            tmp = stem + ".json.tmp"
+            with open(tmp, "w") as f:
+                json.dump(value, f, default=str)
+            os.replace(tmp, stem + ".json")
+            return
+        if self.use_parquet:
+            try:
+                value.to_parquet(stem + ".parquet")
+                if os.path.exists(stem + ".csv"):
+                    os.remove(stem + ".csv")
+                return
+            except OSError:
+                raise
+            except Exception:
+                # e.g. ArrowTypeError on a mixed-dtype column; CSV takes anything
+                logger.warning("Writing %s as CSV; parquet failed", stem, exc_info=True)
+                if os.path.exists(stem + ".parquet"):
+                    os.remove(stem + ".parquet")
+        value.to_csv(stem + ".csv")
+
+    def _disk_usage(self):
+        usage = []
+        try:
+            names = os.listdir(self.directory)
+        except OSError:
+            return usage
+        for name in names:
+            path = os.path.join(self.directory, name)
+            try:
+                mtime = os.path.getmtime(os.path.join(path, _META_FILE))
+            except OSError:
+                # Not a ticker directory, or invalidated while listing
+                continue
+            usage.append((mtime, _dir_size(path), name))
+        return usage
+
+    def _evict_disk(self):
+        if self.max_bytes is None:
+            return
+        with self._lock:
+            if self._sizes is None or time.time() - self._scanned_at > _RESCAN_INTERVAL:
+                self._sizes = None
+            elif sum(self._sizes.values()) <= self.max_bytes:
+                return
+        usage = self._disk_usage()
+        total = sum(size for _, size, _ in usage)
+        with self._lock:
+            self._sizes = {name: size for _, size, name in usage}
+            self._scanned_at = time.time()
+        if total <= self.max_bytes:
+            return
+        # Oldest access first
+        for _, size, name in sorted(usage):
+            if total <= self.max_bytes:
+                break
+            self.invalidate(name)
+            total -= size
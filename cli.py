@@ -0,0 +1,320 @@
+"""
+Headless batch valuation.
+
+    python cli.py tickers.txt -o results.csv
+    cat tickers.txt | python cli.py - -o results.jsonl --scenarios my_scenarios.yaml
+    python cli.py tickers.txt -o results.parquet --workers 8 --provider synthetic
+
+Each ticker is fetched, its key metrics computed and every scenario valued
+in a worker process. Results are streamed to the output as tickers finish.
+Finished tickers are appended to a checkpoint file (<output>.done by
+default); rerunning the same command skips them, so an interrupted run
+resumes where it stopped. Tickers that failed to download (e.g. rate
+limited by Yahoo) are left out of the checkpoint and tried again, their
+new row following the old one.
+"""
+import argparse
+import csv
+import json
+import math
+import numbers
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+from dcf import ValuationContext, DEFAULT_SCENARIOS
+from equity_core.ratios import RATIOS
+from metrics import compute_key_metrics
+from scenarios import evaluate_scenarios, load_scenario_set, validate_scenarios
+from statements import Statements
+
+_worker = {}
+
+
+def load_scenarios(path=None):
+    """
+    Scenario sets keyed by name, each a dict of run_dcf_model assumptions
+    (revenue_growth may be a per-year list). Reads YAML (needs PyYAML) or
+    JSON, or a set saved from the app by name; defaults to the app's
+    Bear/Base/Bull.
+    """
+    if path is None:
+        return DEFAULT_SCENARIOS
+    if not os.path.exists(path):
+        return load_scenario_set(path)
+    with open(path) as f:
+        if path.endswith((".yaml", ".yml")):
+            import yaml
+            scenarios = yaml.safe_load(f)
+        else:
+            scenarios = json.load(f)
+    if not isinstance(scenarios, dict) or not all(isinstance(v, dict) for v in scenarios.values()):
+        raise ValueError(f"{path}: expected a mapping of scenario name to assumptions")
+    return validate_scenarios(scenarios)
+
+
+def read_tickers(source):
+    """
+    Yield tickers one at a time from a file or stdin ("-"), one or more per
+    line, skipping blanks and # comments.
+    """
+    stream = sys.stdin if source == "-" else open(source)
+    try:
+        for line in stream:
+            line = line.split("#", 1)[0]
+            for ticker in line.replace(",", " ").split():
+                yield ticker.strip().upper()
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+
+
+def output_columns(scenarios):
+    columns = ["Ticker", "Error", "Current Price"] + RATIOS
+    for name in scenarios:
+        columns += [f"{name} Value per Share", f"{name} Upside/Downside"]
+    return columns
+
+
+def _init_worker(provider_spec, rate_limit, retries):
+    # Imported here so the parent process doesn't need the data layer loaded
+    from data import RateLimiter, get_default_provider, set_default_provider
+    from providers import provider_from_spec
+
+    if provider_spec:
+        set_default_provider(provider_from_spec(provider_spec))
+    # Only network providers are throttled; local and synthetic data run at disk speed
+    throttled = rate_limit and get_default_provider().cacheable
+    _worker["limiter"] = RateLimiter(rate_limit) if throttled else None
+    _worker["retries"] = retries
+
+
+def value_ticker(ticker, scenarios, projection_years):
+    """
+    Fetch, compute metrics and value every scenario for one ticker.
+    Returns a flat row; failures are reported in the "Error" column.
+    """
+    from data import get_financials
+
+    row = {"Ticker": ticker}
+    try:
+        financials = get_financials(
+            ticker, retries=_worker.get("retries", 0), limiter=_worker.get("limiter")
+        )
+        info = financials["Info"]
+        if "error" in info:
+            row["Error"] = info["error"]
+            return row
+        row["Current Price"] = info.get("currentPrice")
+
+        statements = Statements.from_financials(financials, ticker)
+        metrics = compute_key_metrics(statements)
+        if "Error" in metrics:
+            row["Error"] = metrics["Error"]
+        else:
+            row.update(metrics)
+
+        ctx = ValuationContext(statements)
+        if ctx.error is not None:
+            row.setdefault("Error", ctx.error)
+            return row
+        for name, result in evaluate_scenarios(ctx, scenarios, projection_years).items():
+            if not math.isfinite(result["Value per Share"]):
+                row.setdefault("Error", f"{name}: discount rate must differ from terminal growth")
+                continue
+            row[f"{name} Value per Share"] = result["Value per Share"]
+            row[f"{name} Upside/Downside"] = result["Upside/Downside"]
+    except Exception as e:
+        row["Error"] = str(e)
+    return row
+
+
+def _json_value(value):
+    # NumPy scalars become plain numbers; NaN/inf (missing ratios) become null
+    if isinstance(value, bool) or not isinstance(value, numbers.Real):
+        return value
+    if isinstance(value, numbers.Integral):
+        return int(value)
+    value = float(value)
+    return value if math.isfinite(value) else None
+
+
+class _JsonlWriter:
+    def __init__(self, path, columns):
+        self.file = open(path, "a")
+
+    def write(self, rows):
+        for row in rows:
+            row = {key: _json_value(value) for key, value in row.items()}
+            self.file.write(json.dumps(row, default=float, allow_nan=False) + "\n")
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+class _CsvWriter:
+    def __init__(self, path, columns):
+        new_file = not os.path.exists(path) or os.path.getsize(path) == 0
+        self.file = open(path, "a", newline="")
+        self.writer = csv.DictWriter(self.file, fieldnames=columns, extrasaction="ignore")
+        if new_file:
+            self.writer.writeheader()
+
+    def write(self, rows):
+        self.writer.writerows(rows)
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+class _ParquetWriter:
+    """
+    Writes each flushed batch as a new part file in the output directory,
+    so resumed runs add parts instead of rewriting earlier ones.
+    """
+
+    def __init__(self, path, columns):
+        import pyarrow  # noqa: F401  (fail early if Parquet isn't available)
+
+        self.path = path
+        self.columns = columns
+        os.makedirs(path, exist_ok=True)
+        self.part = len([f for f in os.listdir(path) if f.endswith(".parquet")])
+
+    def write(self, rows):
+        import pandas as pd
+
+        if not rows:
+            return
+        frame = pd.DataFrame(rows, columns=self.columns)
+        frame.to_parquet(os.path.join(self.path, f"part-{self.part:05d}.parquet"), index=False)
+        self.part += 1
+
+    def close(self):
+        pass
+
+
+def _fetch_failed(row):
+    # value_ticker sets Current Price as soon as the download succeeds, so a
+    # row with an Error but no price failed to fetch (possibly transiently);
+    # errors after that come from the data itself and would only recur
+    return bool(row.get("Error")) and "Current Price" not in row
+
+
+def open_writer(path, columns):
+    if path.endswith(".jsonl"):
+        return _JsonlWriter(path, columns)
+    if path.endswith(".csv"):
+        return _CsvWriter(path, columns)
+    if path.endswith(".parquet"):
+        return _ParquetWriter(path, columns)
+    raise ValueError(f"Unsupported output format: {path} (use .csv, .jsonl or .parquet)")
+
+
+def load_checkpoint(path):
+    if not os.path.exists(path):
+        return set()
+    with open(path) as f:
+        return {line.strip() for line in f if line.strip()}
+
+
+def run(tickers, scenarios, output, checkpoint=None, workers=4, projection_years=5,
+        provider_spec=None, rate_limit=None, retries=2, batch_size=50, log=sys.stderr):
+    """
+    Value `tickers` (any iterable) and stream rows to `output`.
+
+    At most 4 * workers tickers are in flight and rows are flushed every
+    `batch_size` tickers, so memory does not grow with the universe size.
+    Returns (completed, skipped) counts.
+    """
+    checkpoint = checkpoint or output + ".done"
+    done = load_checkpoint(checkpoint)
+    writer = open_writer(output, output_columns(scenarios))
+    # Each worker gets an equal share of the global request rate
+    worker_rate = rate_limit / workers if rate_limit else None
+
+    completed = skipped = 0
+    buffer = []
+
+    with open(checkpoint, "a") as checkpoint_file, ProcessPoolExecutor(
+        max_workers=workers, initializer=_init_worker, initargs=(provider_spec, worker_rate, retries)
+    ) as pool:
+        def flush():
+            # Output first, then checkpoint: a crash in between re-values a few tickers, never skips one.
+            # Tickers whose download failed stay out of it so the next run retries them.
+            writer.write(buffer)
+            checkpoint_file.write("".join(row["Ticker"] + "\n" for row in buffer if not _fetch_failed(row)))
+            checkpoint_file.flush()
+            buffer.clear()
+
+        pending = set()
+        ticker_iter = iter(tickers)
+        exhausted = False
+        while pending or not exhausted:
+            while not exhausted and len(pending) < 4 * workers:
+                ticker = next(ticker_iter, None)
+                if ticker is None:
+                    exhausted = True
+                elif ticker in done:
+                    skipped += 1
+                else:
+                    done.add(ticker)
+                    pending.add(pool.submit(value_ticker, ticker, scenarios, projection_years))
+
+            if not pending:
+                break
+            finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in finished:
+                buffer.append(future.result())
+                completed += 1
+            if len(buffer) >= batch_size:
+                flush()
+                if log:
+                    print(f"{completed} valued, {skipped} skipped", file=log)
+
+        flush()
+    writer.close()
+    return completed, skipped
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("tickers", help="File with tickers, or - for stdin")
+    parser.add_argument("-o", "--output", required=True, help="Output path (.csv, .jsonl or .parquet)")
+    parser.add_argument("--scenarios", help="YAML or JSON scenario file, or the name of a set saved in the app (default: Bear/Base/Bull)")
+    parser.add_argument("--checkpoint", help="Checkpoint file (default: <output>.done)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 4)
+    parser.add_argument("--projection-years", type=int, default=5)
+    parser.add_argument("--provider", help='Data provider spec, e.g. "synthetic" or "local:<dir>"')
+    parser.add_argument("--rate-limit", type=float, default=5.0, help="Requests per second across all workers for network providers (0 = unlimited)")
+    parser.add_argument("--retries", type=int, default=2)
+    parser.add_argument("--batch-size", type=int, default=50, help="Rows per output flush")
+    args = parser.parse_args(argv)
+
+    try:
+        scenarios = load_scenarios(args.scenarios)
+    except KeyError:
+        parser.error(f"--scenarios {args.scenarios}: no such file, and no saved scenario set by that name")
+    except ValueError as e:
+        parser.error(f"--scenarios: {e}")
+
+    completed, skipped = run(
+        read_tickers(args.tickers),
+        scenarios,
+        args.output,
+        checkpoint=args.checkpoint,
+        workers=args.workers,
+        projection_years=args.projection_years,
+        provider_spec=args.provider,
+        rate_limit=args.rate_limit or None,
+        retries=args.retries,
+        batch_size=args.batch_size,
+    )
+    print(f"Done: {completed} valued, {skipped} already in checkpoint", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
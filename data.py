@@ -1,51 +1,323 @@
-import yfinance as yf
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
 import pandas as pd
+from cache import FinancialsCache, FIELDS, STATEMENT_FIELDS
+from providers import YahooProvider, provider_from_spec
+from instrumentation import instrument, timed, count, is_enabled
+
+_default_cache = None
+_default_provider = None
+
 
-def get_financials(ticker):
+def get_default_cache():
     """
-    Pulls income statement, balance sheet, and cash flow statements.
-    Returns a dictionary of DataFrames and stock info.
+    Process-wide cache used by get_financials when no cache is passed.
     """
-    try:
-        stock = yf.Ticker(ticker)
-        
-        # Pull financials with error handling
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = FinancialsCache()
+    return _default_cache
+
+
+def get_default_provider():
+    """
+    Provider used when none is passed, chosen by the EQUITY_DATA_PROVIDER
+    environment variable ("yahoo", "synthetic[:n]" or "local:<dir>").
+    """
+    global _default_provider
+    if _default_provider is None:
+        _default_provider = provider_from_spec(os.environ.get("EQUITY_DATA_PROVIDER", "yahoo"))
+    return _default_provider
+
+
+def set_default_provider(provider):
+    global _default_provider
+    _default_provider = provider
+
+
+def _resolve(cache, provider):
+    if provider is None:
+        provider = get_default_provider()
+    if cache is None:
+        cache = get_default_cache() if provider.cacheable else False
+    return cache, provider
+
+
+class RateLimiter:
+    """
+    Thread-safe token bucket: `rate` requests per second with bursts of up to `burst`.
+    """
+
+    def __init__(self, rate, burst=None):
+        self.rate = float(rate)
+        self.capacity = float(burst if burst is not None else max(1.0, rate))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait_for = (1 - self.tokens) / self.rate
+            time.sleep(wait_for)
+
+
+class PriorityRateLimiter(RateLimiter):
+    """
+    RateLimiter with a priority lane. While a request on `urgent` waits,
+    no other request gets a token, and other requests always leave one
+    token in the bucket, so an urgent request rarely waits at all.
+    """
+
+    def __init__(self, rate, burst=None):
+        super().__init__(rate, burst)
+        self.reserve = min(1.0, self.capacity - 1)
+        self._urgent_waiting = 0
+        self.urgent = _UrgentLane(self)
+
+    def acquire(self, urgent=False):
+        with self._lock:
+            self._urgent_waiting += urgent
         try:
-            income_stmt = stock.financials.T  # Transpose for readability
-        except:
-            income_stmt = pd.DataFrame()
-        
+            while True:
+                with self._lock:
+                    now = time.monotonic()
+                    self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                    self.updated = now
+                    needed = 1 if urgent else 1 + self.reserve
+                    if self.tokens >= needed and (urgent or not self._urgent_waiting):
+                        self.tokens -= 1
+                        return
+                    wait_for = max(needed - self.tokens, 0) / self.rate
+                # Short naps so a waiting urgent request is noticed quickly
+                time.sleep(min(max(wait_for, 0.005), 0.05))
+        finally:
+            with self._lock:
+                self._urgent_waiting -= urgent
+
+
+class _UrgentLane:
+    def __init__(self, limiter):
+        self.limiter = limiter
+
+    def acquire(self):
+        self.limiter.acquire(urgent=True)
+
+
+def _call_with_retry(fn, retries=0, backoff=0.5, limiter=None):
+    """
+    Call `fn`, retrying with exponential backoff and jitter on any exception.
+    """
+    attempt = 0
+    while True:
+        if limiter is not None:
+            limiter.acquire()
         try:
-            balance_sheet = stock.balance_sheet.T
-        except:
-            balance_sheet = pd.DataFrame()
-        
+            return fn()
+        except Exception:
+            if attempt >= retries:
+                raise
+            time.sleep(backoff * (2 ** attempt) * (0.5 + random.random()))
+            attempt += 1
+
+
+def _fetch_fields(ticker, fields, provider, executor=None, limiter=None, retries=0):
+    """
+    Download the requested fields. Statement failures become empty
+    DataFrames (not cached); an Info failure is raised to the caller.
+    With an `executor`, the statements are downloaded in parallel.
+    """
+    def fetch(field):
+        with timed("provider.fetch"):
+            value = _call_with_retry(lambda: provider.fetch(ticker, field), retries, limiter=limiter)
+        if is_enabled():
+            count("fields_fetched")
+            count("bytes_fetched", _approx_bytes(value))
+        return value
+
+    def fetch_statement(field):
         try:
-            cash_flow = stock.cashflow.T
-        except:
-            cash_flow = pd.DataFrame()
-        
-        # Convert index to string for Streamlit display
-        if not income_stmt.empty:
-            income_stmt.index = income_stmt.index.astype(str)
-        if not balance_sheet.empty:
-            balance_sheet.index = balance_sheet.index.astype(str)
-        if not cash_flow.empty:
-            cash_flow.index = cash_flow.index.astype(str)
-        
-        # Get stock info
-        info = stock.info
-        
-        return {
-            "Income Statement": income_stmt,
-            "Balance Sheet": balance_sheet,
-            "Cash Flow": cash_flow,
-            "Info": info
-        }
-    except Exception as e:
+            return fetch(field)
+        except Exception:
+            return pd.DataFrame()
+
+    fetched = {}
+    # Info first: if it fails there is no point downloading the statements
+    if "Info" in fields:
+        fetched["Info"] = fetch("Info")
+
+    statements = [field for field in fields if field in STATEMENT_FIELDS]
+    if executor is not None and len(statements) > 1:
+        for field, df in zip(statements, executor.map(fetch_statement, statements)):
+            fetched[field] = df
+    else:
+        for field in statements:
+            fetched[field] = fetch_statement(field)
+    return fetched
+
+
+def _stale_fields(cache, entry):
+    fresh = cache.fresh_fields(entry) if cache else set()
+    stale = [field for field in FIELDS if field not in fresh]
+    if cache:
+        cache.record(hit=not stale)
+    return stale
+
+
+def _merge_fetched(ticker, cache, entry, fetched, error):
+    """
+    Write freshly fetched fields to the cache and combine them with the
+    cached entry into a get_financials result.
+    """
+    if cache:
+        # Empty frames are usually transient Yahoo failures, so don't pin them
+        cache.put(ticker, {
+            field: value for field, value in fetched.items()
+            if field == "Info" or not value.empty
+        })
+
+    result = {}
+    for field in FIELDS:
+        if field in fetched and (field == "Info" or not fetched[field].empty):
+            value = fetched[field]
+        elif field in entry:
+            value = entry[field][0]
+        elif field in fetched:
+            value = fetched[field]
+        else:
+            value = None
+        result[field] = value
+
+    if result["Info"] is None:
         return {
             "Income Statement": pd.DataFrame(),
             "Balance Sheet": pd.DataFrame(),
             "Cash Flow": pd.DataFrame(),
-            "Info": {"error": str(e)}
+            "Info": {"error": str(error)}
         }
+
+    # Hand out copies so callers can't mutate the cached objects
+    return {
+        "Income Statement": _copy_frame(result["Income Statement"]),
+        "Balance Sheet": _copy_frame(result["Balance Sheet"]),
+        "Cash Flow": _copy_frame(result["Cash Flow"]),
+        "Info": dict(result["Info"])
+    }
+
+
+@instrument("data.load_financials")
+def _load_financials(ticker, cache, provider, executor=None, limiter=None, retries=0):
+    entry = cache.get(ticker) if cache else {}
+    stale = _stale_fields(cache, entry)
+
+    fetched = {}
+    error = None
+    if stale:
+        try:
+            fetched = _fetch_fields(ticker, stale, provider, executor, limiter, retries)
+        except Exception as e:
+            error = e
+
+    return _merge_fetched(ticker, cache, entry, fetched, error)
+
+
+@instrument("data.get_financials")
+def get_financials(ticker, cache=None, provider=None, retries=0, limiter=None):
+    """
+    Pulls income statement, balance sheet, and cash flow statements.
+    Returns a dictionary of DataFrames and stock info.
+
+    Data comes from `provider` (see providers.py; Yahoo Finance by default).
+    Results are served from `cache` (the process-wide FinancialsCache by
+    default for Yahoo, pass cache=False to bypass) and only fields whose
+    TTL has expired are re-downloaded. If a refresh fails, stale cached
+    data is returned rather than an error. `retries` and a shared
+    RateLimiter can be passed for bulk jobs.
+    """
+    cache, provider = _resolve(cache, provider)
+    return _load_financials(ticker, cache, provider, limiter=limiter, retries=retries)
+
+
+def get_financials_batch(tickers, max_workers=8, rate_limit=5.0, provider=None, cache=None,
+                         retries=3, session=None):
+    """
+    Fetch financials for many tickers concurrently.
+
+    Yields (ticker, financials) pairs as each ticker completes, so callers
+    can start computing metrics before the whole batch is done. All
+    requests share one token-bucket limiter (`rate_limit` requests per
+    second, None to disable) and are retried with exponential backoff.
+    At most 2 * max_workers tickers are in flight, so memory stays flat
+    for large universes.
+    """
+    if provider is None and session is not None:
+        provider = YahooProvider(session=session)
+    cache, provider = _resolve(cache, provider)
+    limiter = RateLimiter(rate_limit) if rate_limit else None
+
+    tickers = iter(tickers)
+    window = 2 * max_workers
+
+    # Statements get their own pool so ticker tasks never wait on their own pool
+    with ThreadPoolExecutor(max_workers=max_workers) as ticker_pool, \
+            ThreadPoolExecutor(max_workers=max_workers * len(STATEMENT_FIELDS)) as field_pool:
+        pending = {}
+
+        def submit_next():
+            for ticker in tickers:
+                future = ticker_pool.submit(
+                    _load_financials, ticker, cache, provider, field_pool, limiter, retries
+                )
+                pending[future] = ticker
+                return True
+            return False
+
+        while len(pending) < window and submit_next():
+            pass
+
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                ticker = pending.pop(future)
+                yield ticker, future.result()
+                submit_next()
+
+
+def snapshot_key(financials):
+    """
+    Content hash of a financials dict, for keying anything derived from it.
+    Changes whenever a statement value or an info field (e.g. price) changes.
+    """
+    digest = hashlib.sha1()
+    for field in STATEMENT_FIELDS:
+        df = financials[field]
+        digest.update(field.encode())
+        digest.update("|".join(map(str, df.columns)).encode())
+        digest.update(pd.util.hash_pandas_object(df, index=True).to_numpy().tobytes())
+    digest.update(json.dumps(financials["Info"], sort_keys=True, default=str).encode())
+    return digest.hexdigest()
+
+
+def _approx_bytes(value):
+    """
+    Rough payload size of a fetched field, for instrumentation.
+    """
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(index=True, deep=True).sum())
+    return len(json.dumps(value, default=str))
+
+
+def _copy_frame(df):
+    return pd.DataFrame() if df is None else df.copy()
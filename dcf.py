@@ -1,134 +1,341 @@
-import pandas as pd
+import threading
+from collections import OrderedDict
+
 import numpy as np
+from equity_core.dcf import DEFAULT_ASSUMPTIONS, MEGA_CAP, value_dcf
+# Still importable from here, where it lived before equity_core
+from equity_core.dcf import project_cash_flows  # noqa: F401
+from statements import (
+    Statements, ITEMS, INCOME, BALANCE, CASH_FLOW, TOTAL_REVENUE, OPERATING_INCOME, CASH,
+    SHORT_TERM_DEBT, LONG_TERM_DEBT, OPERATING_CASH_FLOW, CAPEX,
+)
+from instrumentation import instrument, count
+
+# Bear/Base/Bull assumption sets shown in the app and used by the CLI by default
+DEFAULT_SCENARIOS = {
+    "Bear": {
+        "discount_rate": 0.10,
+        "terminal_growth": 0.02,
+        "revenue_growth": 0.03,
+        "margin_improvement": 0.002
+    },
+    "Base": {
+        "discount_rate": 0.075,
+        "terminal_growth": 0.03,
+        "revenue_growth": 0.05,
+        "margin_improvement": 0.005
+    },
+    "Bull": {
+        "discount_rate": 0.065,
+        "terminal_growth": 0.035,
+        "revenue_growth": 0.07,
+        "margin_improvement": 0.008
+    }
+}
+
+# Column names yfinance has used for capital expenditure, in order of preference
+CAPEX_COLUMNS = ITEMS["Capital Expenditure"][1]
 
+
+@instrument("dcf.run_dcf_model")
 def run_dcf_model(financials, assumptions):
     """
     Discounted Cash Flow valuation model (updated for realistic results for large companies)
+
+    `financials` may also be a ValuationContext, which skips re-extracting
+    the statement inputs, or a single-ticker statements.Statements.
     """
-    try:
-        income_stmt = financials["Income Statement"]
-        balance_sheet = financials["Balance Sheet"]
-        cash_flow = financials["Cash Flow"]
-        info = financials["Info"]
-        market_cap = info.get("marketCap", 0)
-
-        # Assumptions (define first!)
-        discount_rate = assumptions.get("discount_rate", 0.10)
-        terminal_growth = assumptions.get("terminal_growth", 0.025)
-        projection_years = assumptions.get("projection_years", 5)
-        revenue_growth = assumptions.get("revenue_growth", 0.05)
-        margin_improvement = assumptions.get("margin_improvement", 0.005)
-
-        # Adjust for mega-cap companies
-        if market_cap > 1_000_000_000_000:
-            discount_rate = max(discount_rate, 0.075)  # slightly lower WACC
-            terminal_growth = max(terminal_growth, 0.03)  # more realistic long-term growth
-
-        # Historical FCF
-        historical_fcf = calculate_historical_fcf(cash_flow)
-        if historical_fcf.empty:
-            return {"Error": "Unable to calculate historical free cash flow"}
-
-        # Latest financials
-        latest_income = income_stmt.iloc[0]
-        latest_balance = balance_sheet.iloc[0]
-
-        revenue = latest_income.get("Total Revenue", 0)
-        operating_income = latest_income.get("Operating Income", 0)
-        operating_margin = operating_income / revenue if revenue else 0
-
-        # Project FCF
-        projected_cf = project_cash_flows(
-            last_fcf=historical_fcf.iloc[-1],
-            revenue=revenue,
-            margin=operating_margin,
-            revenue_growth=revenue_growth,
-            margin_improvement=margin_improvement,
-            years=projection_years,
-            company_size=market_cap
-        )
+    return valuation_context(financials).value(assumptions)
 
-        terminal_value = projected_cf[-1] * (1 + terminal_growth) / (discount_rate - terminal_growth)
 
-        discounted_cf = [
-            cf / ((1 + discount_rate) ** (i + 1))
-            for i, cf in enumerate(projected_cf)
-        ]
+class ValuationContext:
+    """
+    DCF inputs for one financials snapshot, extracted once.
 
-        pv_terminal = terminal_value / ((1 + discount_rate) ** projection_years)
-        enterprise_value = sum(discounted_cf) + pv_terminal
+    Holds the scalars run_dcf_model needs (latest revenue, margin, cash,
+    debt, shares, price) and the historical FCF array, so revaluing under
+    new assumptions only costs the projection arithmetic. value() results
+    are memoized per assumption tuple; one context can be shared between
+    threads (the app shares it across sessions).
+    """
 
-        cash = latest_balance.get("Cash And Cash Equivalents", 0)
-        debt = (
-            latest_balance.get("Short Long Term Debt", 0) +
-            latest_balance.get("Long Term Debt", 0)
-        )
+    @instrument("dcf.ValuationContext.build")
+    def __init__(self, financials, max_memo=256):
+        self.error = None
+        self.inputs = None
+        self.historical_fcf = None
+        try:
+            if not isinstance(financials, Statements):
+                financials = Statements.from_financials(financials)
+            self.historical_fcf = _historical_fcf(financials)
+            self.inputs = _extract_dcf_inputs(financials, self.historical_fcf)
+        except Exception as e:
+            self.error = str(e)
+        self.max_memo = max_memo
+        self._memo = OrderedDict()
+        self._lock = threading.Lock()
 
-        equity_value = enterprise_value - debt + cash
+    def value(self, assumptions):
+        """
+        Value the company under `assumptions` (same keys and defaults as run_dcf_model).
+        """
+        if self.error is not None:
+            return {"Error": self.error}
 
-        shares_outstanding = info.get("sharesOutstanding", 0)
-        value_per_share = equity_value / shares_outstanding if shares_outstanding else 0
-        current_price = info.get("currentPrice", 0)
+        try:
+            key = tuple(assumptions.get(name, default) for name, default in DEFAULT_ASSUMPTIONS.items())
+            hash(key)
+        except Exception as e:
+            # e.g. a per-year revenue_growth list, which only scenarios.evaluate_scenarios accepts
+            return {"Error": str(e)}
+        with self._lock:
+            result = self._memo.get(key)
+            if result is not None:
+                self._memo.move_to_end(key)
+        count("dcf_memo_hits" if result is not None else "dcf_memo_misses")
+        if result is None:
+            result = self._value(*key)
+            with self._lock:
+                self._memo[key] = result
+                while len(self._memo) > self.max_memo:
+                    self._memo.popitem(last=False)
 
-        return {
-            "Enterprise Value": enterprise_value,
-            "Equity Value": equity_value,
-            "Value per Share": value_per_share,
-            "Current Price": current_price,
-            "Upside/Downside": ((value_per_share - current_price) / current_price) if current_price else 0,
-            "Projected FCF": projected_cf,
-            "Terminal Value": terminal_value,
-            "Assumptions": {
-                "Discount Rate": f"{discount_rate:.1%}",
-                "Terminal Growth": f"{terminal_growth:.1%}",
-                "Revenue Growth": f"{revenue_growth:.1%}",
-                "Margin Improvement": f"{margin_improvement:.1%}",
-                "Projection Years": projection_years
-            }
-        }
+        # Callers get their own copy of the mutable parts
+        result = dict(result)
+        if "Projected FCF" in result:
+            result["Projected FCF"] = list(result["Projected FCF"])
+            result["Assumptions"] = dict(result["Assumptions"])
+        return result
 
-    except Exception as e:
-        return {"Error": str(e)}
+    def _value(self, discount_rate, terminal_growth, projection_years, revenue_growth, margin_improvement):
+        return value_dcf(self.inputs, discount_rate, terminal_growth, projection_years, revenue_growth,
+                         margin_improvement)
+
+
+def valuation_context(financials):
+    """
+    Return `financials` unchanged if it is already a ValuationContext, else build one.
+    """
+    if isinstance(financials, ValuationContext):
+        return financials
+    return ValuationContext(financials)
 
+
+@instrument("dcf.calculate_historical_fcf")
 def calculate_historical_fcf(cash_flow):
     """
     FCF = Operating Cash Flow - CapEx
+
+    CapEx is taken from the first of CAPEX_COLUMNS with a non-zero value
+    in each period.
     """
-    fcf = []
-    for _, row in cash_flow.iterrows():
-        ocf = row.get("Operating Cash Flow", 0)
-        capex = (
-            row.get("Capital Expenditure", 0) or
-            row.get("Capital Expenditures", 0) or
-            row.get("Purchase Of PPE", 0) or
-            row.get("Capital expenditures", 0)
-        )
-        fcf.append(ocf - abs(capex))
-    return pd.Series(fcf)
+    import pandas as pd
+
+    if cash_flow.empty:
+        return pd.Series(dtype=float)
+    return pd.Series(_historical_fcf(Statements.from_financials({"Cash Flow": cash_flow})))
+
+
+def _historical_fcf(statements):
+    """
+    calculate_historical_fcf on a single-ticker Statements, as an array.
+    """
+    n = statements.rows[CASH_FLOW, 0].sum()
+    ocf = statements.values[0, :n, OPERATING_CASH_FLOW]
+    capex = statements.values[0, :n, CAPEX]
+    return ocf - np.abs(capex)
+
+
+def _extract_dcf_inputs(financials, historical_fcf=None):
+    """
+    Pull the scalars the DCF needs out of a financials dict (or a
+    single-ticker Statements), with the same fallbacks run_dcf_model uses.
+    """
+    if isinstance(financials, ValuationContext):
+        if financials.error is not None:
+            raise ValueError(financials.error)
+        return financials.inputs
+
+    if not isinstance(financials, Statements):
+        financials = Statements.from_financials(financials)
+    info = financials.info[0]
 
-def project_cash_flows(last_fcf, revenue, margin, revenue_growth, margin_improvement, years, company_size):
+    if historical_fcf is None:
+        historical_fcf = _historical_fcf(financials)
+    if len(historical_fcf) == 0:
+        raise ValueError("Unable to calculate historical free cash flow")
+    if not financials.rows[INCOME, 0, 0] or not financials.rows[BALANCE, 0, 0]:
+        raise ValueError("Income statement or balance sheet is empty")
+
+    latest = financials.values[0, 0]
+    revenue = latest[TOTAL_REVENUE]
+    operating_income = latest[OPERATING_INCOME]
+
+    return {
+        "market_cap": info.get("marketCap", 0),
+        "last_fcf": historical_fcf[-1],
+        "revenue": revenue,
+        "operating_margin": operating_income / revenue if revenue else 0,
+        "cash": latest[CASH],
+        "debt": latest[SHORT_TERM_DEBT] + latest[LONG_TERM_DEBT],
+        "shares_outstanding": info.get("sharesOutstanding", 0),
+        "current_price": info.get("currentPrice", 0),
+    }
+
+
+def dcf_inputs_batch(statements):
+    """
+    _extract_dcf_inputs for every ticker in a Statements at once.
+
+    Returns (inputs, usable): a dict of arrays with the same keys, and a
+    mask of tickers that have cash flow, income and balance data. Missing
+    info fields count as 0, as in the single-ticker path; revenue and FCF
+    are NaN for unusable tickers.
+    """
+    values = statements.values
+    n_tickers = len(statements)
+    if values.shape[1] == 0:
+        usable = np.zeros(n_tickers, dtype=bool)
+        latest = np.full((n_tickers, values.shape[2]), np.nan)
+        last_fcf = np.full(n_tickers, np.nan)
+    else:
+        n_cash_flow = statements.rows[CASH_FLOW].sum(axis=1)
+        usable = (n_cash_flow > 0) & statements.rows[INCOME][:, 0] & statements.rows[BALANCE][:, 0]
+        latest = values[:, 0]
+        # Oldest cash flow period, like historical_fcf[-1] in the single-ticker path
+        oldest = np.maximum(n_cash_flow - 1, 0)
+        rows = np.arange(n_tickers)
+        last_fcf = values[rows, oldest, OPERATING_CASH_FLOW] - np.abs(values[rows, oldest, CAPEX])
+
+    revenue = np.where(usable, latest[:, TOTAL_REVENUE], np.nan)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        operating_margin = np.where(revenue != 0, latest[:, OPERATING_INCOME] / revenue, 0.0)
+
+    def info(field):
+        return np.nan_to_num(statements.info_array(field), nan=0.0)
+
+    inputs = {
+        "market_cap": info("marketCap"),
+        "last_fcf": np.where(usable, last_fcf, np.nan),
+        "revenue": revenue,
+        "operating_margin": operating_margin,
+        "cash": latest[:, CASH],
+        "debt": latest[:, SHORT_TERM_DEBT] + latest[:, LONG_TERM_DEBT],
+        "shares_outstanding": info("sharesOutstanding"),
+        "current_price": info("currentPrice"),
+    }
+    return inputs, usable
+
+
+def dcf_value_per_share(inputs, discount_rate, terminal_growth, revenue_growth, margin_improvement, years,
+                        growth_by_year=False):
+    """
+    Vectorized run_dcf_model: every argument (including the values in
+    `inputs`) may be a NumPy array, and they are broadcast against each
+    other. Returns (value_per_share, enterprise_value) arrays.
+
+    With growth_by_year=True the last axis of `revenue_growth` holds one
+    growth rate per projection year instead of a flat rate; the year-0 FCF
+    floor then uses the first year's growth.
+
+    Mirrors project_cash_flows and run_dcf_model exactly: mega-cap WACC and
+    terminal growth floors, the 35% margin cap and the year-0 FCF floor.
+    Points where discount rate equals terminal growth come back as NaN.
+    """
+    market_cap = np.asarray(inputs["market_cap"], dtype=float)
+    last_fcf = np.asarray(inputs["last_fcf"], dtype=float)
+    revenue = np.asarray(inputs["revenue"], dtype=float)
+    margin = np.asarray(inputs["operating_margin"], dtype=float)
+    discount_rate = np.asarray(discount_rate, dtype=float)
+    terminal_growth = np.asarray(terminal_growth, dtype=float)
+    revenue_growth = np.asarray(revenue_growth, dtype=float)
+    margin_improvement = np.asarray(margin_improvement, dtype=float)
+
+    # Adjust for mega-cap companies
+    mega_cap = market_cap > MEGA_CAP
+    discount_rate = np.where(mega_cap, np.maximum(discount_rate, 0.075), discount_rate)
+    terminal_growth = np.where(mega_cap, np.maximum(terminal_growth, 0.03), terminal_growth)
+    fcf_conversion = np.where(mega_cap, 0.85, 0.80)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        discount_factor = 1 + discount_rate
+        pv_fcf = 0.0
+        fcf = None
+        for year in range(years):
+            growth = revenue_growth[..., year] if growth_by_year else revenue_growth
+            revenue = revenue * (1 + growth)
+            margin = np.minimum(margin + margin_improvement, 0.35)
+            fcf = revenue * margin * fcf_conversion
+            if year == 0:
+                floor = last_fcf * (1 + growth * 0.5)
+                fcf = np.where(floor > fcf, floor, fcf)
+            pv_fcf = pv_fcf + fcf / discount_factor ** (year + 1)
+
+        spread = discount_rate - terminal_growth
+        terminal_value = np.where(spread != 0, fcf * (1 + terminal_growth) / spread, np.nan)
+        enterprise_value = pv_fcf + terminal_value / discount_factor ** years
+
+        equity_value = enterprise_value - inputs["debt"] + inputs["cash"]
+        shares = np.asarray(inputs["shares_outstanding"], dtype=float)
+        value_per_share = np.where(shares != 0, equity_value / shares, 0.0)
+
+    return value_per_share, enterprise_value
+
+
+@instrument("dcf.run_dcf_grid")
+def run_dcf_grid(financials, discount_rates, terminal_growths, revenue_growths=None,
+                 margin_improvements=None, projection_years=5, assumptions=None):
     """
-    Project future free cash flows realistically
+    Sensitivity surface of value per share over a grid of assumptions.
+
+    Returns arrays shaped (discount rate, terminal growth) or, when
+    revenue_growths and margin_improvements are given, (discount rate,
+    terminal growth, revenue growth, margin improvement). Axes left as None
+    use the value in `assumptions` (or run_dcf_model's default).
+    `financials` may be a ValuationContext.
     """
-    projected = []
-    current_margin = margin
+    try:
+        assumptions = assumptions or {}
+        inputs = _extract_dcf_inputs(financials)
+
+        axes = [
+            ("Discount Rate", discount_rates),
+            ("Terminal Growth", terminal_growths),
+        ]
+        if revenue_growths is not None:
+            axes.append(("Revenue Growth", revenue_growths))
+        if margin_improvements is not None:
+            axes.append(("Margin Improvement", margin_improvements))
 
-    # Adjust FCF conversion ratio for mega-cap companies
-    fcf_conversion = 0.85 if company_size > 1_000_000_000_000 else 0.80
+        # Give each axis its own dimension so the arrays broadcast to the full grid
+        grid = {}
+        for i, (name, values) in enumerate(axes):
+            shape = [1] * len(axes)
+            shape[i] = -1
+            grid[name] = np.asarray(values, dtype=float).reshape(shape)
 
-    for year in range(years):
-        revenue *= (1 + revenue_growth)
-        current_margin = min(current_margin + margin_improvement, 0.35)  # allow margin improvement up to 35%
-        operating_income = revenue * current_margin
-        fcf = operating_income * fcf_conversion
+        value_per_share, enterprise_value = dcf_value_per_share(
+            inputs,
+            discount_rate=grid["Discount Rate"],
+            terminal_growth=grid["Terminal Growth"],
+            revenue_growth=grid.get("Revenue Growth", assumptions.get("revenue_growth", 0.05)),
+            margin_improvement=grid.get("Margin Improvement", assumptions.get("margin_improvement", 0.005)),
+            years=projection_years,
+        )
 
-        # Ensure FCF is not too low compared to historical
-        if year == 0:
-            fcf = max(fcf, last_fcf * (1 + revenue_growth * 0.5))
+        current_price = inputs["current_price"]
+        upside = (value_per_share - current_price) / current_price if current_price else np.zeros_like(value_per_share)
 
-        projected.append(fcf)
+        return {
+            "Value per Share": value_per_share,
+            "Enterprise Value": enterprise_value,
+            "Upside/Downside": upside,
+            "Current Price": current_price,
+            "Axes": {name: np.asarray(values, dtype=float) for name, values in axes},
+        }
 
-    return projected
+    except Exception as e:
+        return {"Error": str(e)}
 
 
 def calculate_dcf(financials, assumptions):
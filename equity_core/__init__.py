@@ -0,0 +1,15 @@
+"""
+Valuation and ratio arithmetic with no third-party dependencies.
+
+    from equity_core import value_dcf
+    value_dcf({"market_cap": 3e9, "last_fcf": 1.2e8, "revenue": 2e9, "operating_margin": 0.12,
+               "cash": 3e8, "debt": 5e8, "shares_outstanding": 1e8, "current_price": 30.0})
+
+Importing this package loads neither NumPy nor pandas, so worker
+processes and scripts that only need scalar math start in milliseconds.
+dcf.py and metrics.py build on it for statements and DataFrames.
+"""
+from equity_core.dcf import DEFAULT_ASSUMPTIONS, MEGA_CAP, project_cash_flows, value_dcf
+from equity_core.ratios import RATIOS, key_ratios, format_ratio
+
+__all__ = ["DEFAULT_ASSUMPTIONS", "MEGA_CAP", "project_cash_flows", "value_dcf", "RATIOS", "key_ratios", "format_ratio"]
@@ -0,0 +1,102 @@
+"""
+Scalar DCF in plain Python, so it imports without NumPy or pandas.
+"""
+
+# run_dcf_model defaults, used for any assumption not given
+DEFAULT_ASSUMPTIONS = {
+    "discount_rate": 0.10,
+    "terminal_growth": 0.025,
+    "projection_years": 5,
+    "revenue_growth": 0.05,
+    "margin_improvement": 0.005,
+}
+
+MEGA_CAP = 1_000_000_000_000
+
+
+def project_cash_flows(last_fcf, revenue, margin, revenue_growth, margin_improvement, years, company_size):
+    """
+    Project future free cash flows realistically
+    """
+    projected = []
+    current_margin = margin
+
+    # Adjust FCF conversion ratio for mega-cap companies
+    fcf_conversion = 0.85 if company_size > MEGA_CAP else 0.80
+
+    for year in range(years):
+        revenue *= (1 + revenue_growth)
+        current_margin = min(current_margin + margin_improvement, 0.35)  # allow margin improvement up to 35%
+        operating_income = revenue * current_margin
+        fcf = operating_income * fcf_conversion
+
+        # Ensure FCF is not too low compared to historical
+        if year == 0:
+            fcf = max(fcf, last_fcf * (1 + revenue_growth * 0.5))
+
+        projected.append(fcf)
+
+    return projected
+
+
+def value_dcf(inputs, discount_rate=0.10, terminal_growth=0.025, projection_years=5, revenue_growth=0.05,
+              margin_improvement=0.005):
+    """
+    run_dcf_model on already extracted inputs: a dict with market_cap,
+    last_fcf, revenue, operating_margin, cash, debt, shares_outstanding
+    and current_price (see dcf._extract_dcf_inputs).
+    """
+    try:
+        market_cap = inputs["market_cap"]
+
+        # Adjust for mega-cap companies
+        if market_cap > MEGA_CAP:
+            discount_rate = max(discount_rate, 0.075)  # slightly lower WACC
+            terminal_growth = max(terminal_growth, 0.03)  # more realistic long-term growth
+
+        # Project FCF
+        projected_cf = project_cash_flows(
+            last_fcf=inputs["last_fcf"],
+            revenue=inputs["revenue"],
+            margin=inputs["operating_margin"],
+            revenue_growth=revenue_growth,
+            margin_improvement=margin_improvement,
+            years=projection_years,
+            company_size=market_cap
+        )
+
+        terminal_value = projected_cf[-1] * (1 + terminal_growth) / (discount_rate - terminal_growth)
+
+        discounted_cf = [
+            cf / ((1 + discount_rate) ** (i + 1))
+            for i, cf in enumerate(projected_cf)
+        ]
+
+        pv_terminal = terminal_value / ((1 + discount_rate) ** projection_years)
+        enterprise_value = sum(discounted_cf) + pv_terminal
+
+        equity_value = enterprise_value - inputs["debt"] + inputs["cash"]
+
+        shares_outstanding = inputs["shares_outstanding"]
+        value_per_share = equity_value / shares_outstanding if shares_outstanding else 0
+        current_price = inputs["current_price"]
+
+        return {
+            "Enterprise Value": enterprise_value,
+            "Equity Value": equity_value,
+            "Value per Share": value_per_share,
+            "Current Price": current_price,
+            "Upside/Downside": ((value_per_share - current_price) / current_price) if current_price else 0,
+            "Projected FCF": projected_cf,
+            "Terminal Value": terminal_value,
+            "Assumptions": {
+                "Discount Rate": f"{discount_rate:.1%}",
+                "Terminal Growth": f"{terminal_growth:.1%}",
+                "Revenue Growth": f"{revenue_growth:.1%}",
+                "Margin Improvement": f"{margin_improvement:.1%}",
+                "Projection Years": projection_years
+            }
+        }
+
+    except Exception as e:
+        return {"Error": str(e)}
@@ -0,0 +1,94 @@
+"""
+Key ratio formulas in plain Python, on canonical line items by name.
+"""
+
+# Ratio names in display order
+RATIOS = [
+    "Gross Margin", "Operating Margin", "Net Margin",
+    "Current Ratio", "Quick Ratio",
+    "Return on Assets (ROA)",
+    "P/E Ratio", "P/B Ratio",
+    "YoY Revenue Growth", "YoY Net Income Growth", "YoY Assets Growth",
+    "YoY Equity Growth", "YoY EPS Growth",
+]
+
+
+def key_ratios(latest, previous=None, current_price=0, shares_outstanding=0):
+    """
+    Ratios from the latest period's line items (a mapping of canonical
+    item name to value, see statements.ITEMS) and optionally the prior
+    period's. Ratios with a zero denominator are left out.
+    """
+    total_revenue = latest["Total Revenue"]
+    gross_profit = latest["Gross Profit"]
+    operating_income = latest["Operating Income"]
+    net_income = latest["Net Income"]
+
+    total_assets = latest["Total Assets"]
+    current_assets = latest["Current Assets"]
+    current_liabilities = latest["Current Liabilities"]
+    inventory = latest["Inventory"]
+
+    total_equity = latest["Total Equity Gross Minority Interest"]
+
+    # Compute ratios
+    ratios = {}
+
+    # Profitability Ratios
+    if total_revenue != 0:
+        ratios['Gross Margin'] = gross_profit / total_revenue
+        ratios['Operating Margin'] = operating_income / total_revenue
+        ratios['Net Margin'] = net_income / total_revenue
+
+    # Liquidity Ratios
+    if current_liabilities != 0:
+        ratios['Current Ratio'] = current_assets / current_liabilities
+        ratios['Quick Ratio'] = (current_assets - inventory) / current_liabilities
+
+    # Efficiency Ratios
+    if total_assets != 0:
+        ratios['Return on Assets (ROA)'] = net_income / total_assets
+
+    # Valuation Ratios
+    if shares_outstanding != 0:
+        eps = net_income / shares_outstanding
+        book_value_per_share = total_equity / shares_outstanding
+        if eps != 0:
+            ratios['P/E Ratio'] = current_price / eps
+        if book_value_per_share != 0:
+            ratios['P/B Ratio'] = current_price / book_value_per_share
+
+    # YoY Growth Metrics
+    if previous is not None:
+        prev_revenue = previous["Total Revenue"]
+        prev_net_income = previous["Net Income"]
+        prev_total_assets = previous["Total Assets"]
+        prev_total_equity = previous["Total Equity Gross Minority Interest"]
+
+        if prev_revenue != 0:
+            ratios['YoY Revenue Growth'] = (total_revenue - prev_revenue) / prev_revenue
+        if prev_net_income != 0:
+            ratios['YoY Net Income Growth'] = (net_income - prev_net_income) / prev_net_income
+        if prev_total_assets != 0:
+            ratios['YoY Assets Growth'] = (total_assets - prev_total_assets) / prev_total_assets
+        if prev_total_equity != 0:
+            ratios['YoY Equity Growth'] = (total_equity - prev_total_equity) / prev_total_equity
+
+        # EPS Growth
+        prev_eps = prev_net_income / shares_outstanding if shares_outstanding != 0 else 0
+        if prev_eps != 0:
+            ratios['YoY EPS Growth'] = (eps - prev_eps) / prev_eps
+
+    return ratios
+
+
+def format_ratio(key, value):
+    """
+    Format a ratio for display: percentages for margins, returns and growth.
+    """
+    if 'Margin' in key or 'Return' in key or 'Growth' in key:
+        return f"{value:.2%}"
+    elif 'Ratio' in key:
+        return f"{value:.2f}"
+    else:
+        return f"{value:.2f}"
@@ -0,0 +1,145 @@
+import functools
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# Off unless EQUITY_PERF=1 or enable() is called. When off, instrumented
+# functions pay one global lookup per call.
+_enabled = os.environ.get("EQUITY_PERF", "") == "1"
+_lock = threading.Lock()
+_stages = {}    # stage -> [calls, total seconds, max seconds]
+_counters = {}  # name -> value
+
+logger = logging.getLogger("equity.perf")
+
+
+def enable(flag=True):
+    global _enabled
+    _enabled = bool(flag)
+
+
+def is_enabled():
+    return _enabled
+
+
+def reset():
+    with _lock:
+        _stages.clear()
+        _counters.clear()
+
+
+def record(stage, seconds):
+    with _lock:
+        stats = _stages.get(stage)
+        if stats is None:
+            _stages[stage] = [1, seconds, seconds]
+        else:
+            stats[0] += 1
+            stats[1] += seconds
+            if seconds > stats[2]:
+                stats[2] = seconds
+
+
+def count(name, value=1):
+    """
+    Add to a named counter (cache hits, bytes fetched, ...). No-op when disabled.
+    """
+    if not _enabled:
+        return
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + value
+
+
+def instrument(stage=None):
+    """
+    Decorator recording wall time and call count of a function under
+    `stage` (defaults to module.qualname).
+    """
+    def decorate(fn):
+        name = stage or f"{fn.__module__}.{fn.__qualname__}"
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return fn(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                record(name, time.perf_counter() - start)
+        return wrapper
+    return decorate
+
+
+@contextmanager
+def timed(stage):
+    """
+    Context manager version of instrument() for a block of code.
+    """
+    if not _enabled:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(stage, time.perf_counter() - start)
+
+
+def snapshot():
+    """
+    Current stats as plain data: {"stages": {stage: {...}}, "counters": {...}}.
+    """
+    with _lock:
+        stages = {
+            stage: {
+                "calls": calls,
+                "total_ms": total * 1000,
+                "mean_ms": total * 1000 / calls,
+                "max_ms": peak * 1000,
+            }
+            for stage, (calls, total, peak) in _stages.items()
+        }
+        counters = dict(_counters)
+
+    hits = counters.get("cache_hits", 0)
+    misses = counters.get("cache_misses", 0)
+    if hits + misses:
+        counters["cache_hit_rate"] = hits / (hits + misses)
+    return {"stages": stages, "counters": counters}
+
+
+def log_stats(log=None, level=logging.INFO):
+    """
+    Emit one structured (JSON) log record per stage plus one for the counters.
+    """
+    log = log or logger
+    stats = snapshot()
+    for stage, values in stats["stages"].items():
+        log.log(level, json.dumps({"event": "stage", "stage": stage, **values}))
+    log.log(level, json.dumps({"event": "counters", **stats["counters"]}))
+
+
+def _label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"')
+
+
+def to_prometheus(prefix="equity"):
+    """
+    Stats in the Prometheus text exposition format.
+    """
+    stats = snapshot()
+    lines = [
+        f"# TYPE {prefix}_stage_calls_total counter",
+        *(f'{prefix}_stage_calls_total{{stage="{_label(s)}"}} {v["calls"]}' for s, v in stats["stages"].items()),
+        f"# TYPE {prefix}_stage_seconds_total counter",
+        *(f'{prefix}_stage_seconds_total{{stage="{_label(s)}"}} {v["total_ms"] / 1000:.6f}' for s, v in stats["stages"].items()),
+        f"# TYPE {prefix}_stage_seconds_max gauge",
+        *(f'{prefix}_stage_seconds_max{{stage="{_label(s)}"}} {v["max_ms"] / 1000:.6f}' for s, v in stats["stages"].items()),
+        f"# TYPE {prefix}_counter gauge",
+        *(f'{prefix}_counter{{name="{_label(n)}"}} {v}' for n, v in stats["counters"].items()),
+    ]
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,143 @@
+import numpy as np
+from dcf import _extract_dcf_inputs, dcf_value_per_share
+from equity_core.dcf import DEFAULT_ASSUMPTIONS
+from instrumentation import instrument
+
+# Order of the correlated variables (rows/columns of a correlation matrix).
+# Variables without a distribution stay at DEFAULT_ASSUMPTIONS.
+VARIABLES = ["discount_rate", "terminal_growth", "revenue_growth", "margin_improvement"]
+
+DEFAULT_PERCENTILES = (5, 10, 25, 50, 75, 90, 95)
+
+
+def _norm_cdf(z):
+    """
+    Standard normal CDF (Abramowitz & Stegun 7.1.26, |error| < 1.5e-7).
+    """
+    x = np.abs(z) / np.sqrt(2.0)
+    t = 1.0 / (1.0 + 0.3275911 * x)
+    poly = t * (0.254829592 + t * (-0.284496736 + t * (1.421413741 + t * (-1.453152027 + t * 1.061405429))))
+    erf = 1.0 - poly * np.exp(-x * x)
+    return 0.5 * (1.0 + np.sign(z) * erf)
+
+
+def _from_standard_normal(spec, z):
+    """
+    Map correlated standard normal draws onto a marginal distribution.
+
+    `spec` is a number (held constant) or a dict:
+        {"dist": "normal", "mean": m, "std": s}
+        {"dist": "uniform", "low": a, "high": b}
+        {"dist": "triangular", "low": a, "mode": c, "high": b}
+    """
+    if not isinstance(spec, dict):
+        return np.full_like(z, float(spec))
+
+    dist = spec.get("dist", "normal")
+    if dist == "normal":
+        return spec["mean"] + spec["std"] * z
+
+    u = _norm_cdf(z)
+    if dist == "uniform":
+        return spec["low"] + (spec["high"] - spec["low"]) * u
+    if dist == "triangular":
+        a, c, b = spec["low"], spec["mode"], spec["high"]
+        split = (c - a) / (b - a)
+        left = a + np.sqrt(u * (b - a) * (c - a))
+        right = b - np.sqrt((1 - u) * (b - a) * (b - c))
+        return np.where(u < split, left, right)
+    raise ValueError(f"Unknown distribution: {dist}")
+
+
+def _correlation_matrix(correlation):
+    """
+    Accept a 4x4 matrix in VARIABLES order or a dict of pairs, e.g.
+    {("discount_rate", "terminal_growth"): 0.5}.
+    """
+    if correlation is None:
+        return np.eye(len(VARIABLES))
+    if isinstance(correlation, dict):
+        matrix = np.eye(len(VARIABLES))
+        for (a, b), rho in correlation.items():
+            i, j = VARIABLES.index(a), VARIABLES.index(b)
+            matrix[i, j] = matrix[j, i] = rho
+        return matrix
+    return np.asarray(correlation, dtype=float)
+
+
+def sample_assumptions(distributions, n, rng, cholesky, projection_years, growth_volatility):
+    """
+    Draw `n` correlated assumption sets. Revenue growth comes back as an
+    (n, projection_years) array: the path's drawn growth plus independent
+    annual shocks with standard deviation `growth_volatility`.
+    """
+    z = rng.standard_normal((n, len(VARIABLES))) @ cholesky.T
+    draws = {
+        name: _from_standard_normal(distributions.get(name, DEFAULT_ASSUMPTIONS[name]), z[:, i])
+        for i, name in enumerate(VARIABLES)
+    }
+    shocks = rng.standard_normal((n, projection_years)) * growth_volatility
+    draws["revenue_growth"] = draws["revenue_growth"][:, None] + shocks
+    return draws
+
+
+@instrument("montecarlo.run_monte_carlo")
+def run_monte_carlo(financials, distributions, correlation=None, n_paths=100_000, projection_years=5,
+                    growth_volatility=0.02, seed=None, chunk_size=100_000, bins=50,
+                    percentiles=DEFAULT_PERCENTILES):
+    """
+    Monte Carlo DCF valuation.
+
+    Draws `n_paths` assumption sets from `distributions` (keyed by the
+    names in VARIABLES, see _from_standard_normal for the spec format),
+    correlated through a Gaussian copula, and values them in vectorized
+    chunks of `chunk_size` paths so peak memory stays bounded. Paths where
+    the discount rate does not exceed terminal growth are discarded.
+    Results are reproducible for a given seed and chunk_size.
+    `financials` may be a dcf.ValuationContext.
+    """
+    try:
+        inputs = _extract_dcf_inputs(financials)
+        cholesky = np.linalg.cholesky(_correlation_matrix(correlation))
+        rng = np.random.default_rng(seed)
+
+        values = np.empty(n_paths)
+        done = 0
+        while done < n_paths:
+            n = min(chunk_size, n_paths - done)
+            draws = sample_assumptions(distributions, n, rng, cholesky, projection_years, growth_volatility)
+            value_per_share, _ = dcf_value_per_share(
+                inputs,
+                discount_rate=draws["discount_rate"],
+                terminal_growth=draws["terminal_growth"],
+                revenue_growth=draws["revenue_growth"],
+                margin_improvement=draws["margin_improvement"],
+                years=projection_years,
+                growth_by_year=True,
+            )
+            valid = draws["discount_rate"] > draws["terminal_growth"]
+            values[done:done + n] = np.where(valid, value_per_share, np.nan)
+            done += n
+
+        valid_values = values[np.isfinite(values)]
+        if valid_values.size == 0:
+            return {"Error": "No valid simulation paths"}
+
+        current_price = inputs["current_price"]
+        # Clip the histogram to the central 99% so a few explosive paths don't flatten it
+        low, high = np.percentile(valid_values, [0.5, 99.5])
+        counts, edges = np.histogram(valid_values, bins=bins, range=(low, high))
+
+        return {
+            "Paths": n_paths,
+            "Invalid Paths": int(n_paths - valid_values.size),
+            "Mean Value per Share": float(valid_values.mean()),
+            "Std Value per Share": float(valid_values.std()),
+            "Percentiles": dict(zip(percentiles, np.percentile(valid_values, percentiles).tolist())),
+            "Current Price": current_price,
+            "Probability of Upside": float((valid_values > current_price).mean()) if current_price else 0,
+            "Histogram": {"Counts": counts, "Edges": edges},
+        }
+
+    except Exception as e:
+        return {"Error": str(e)}
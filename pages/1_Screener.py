@@ -0,0 +1,94 @@
+import streamlit as st
+from data import get_financials_batch
+from screener import Screener
+
+st.set_page_config(
+    page_title="Stock Screener",
+    layout="wide"
+)
+
+
+@st.cache_resource(max_entries=16)
+def load_screener(discount_rate, terminal_growth):
+    """
+    One screener per set of DCF assumptions, shared by every session using
+    them, so refreshes only recompute changed tickers and no session sees
+    upside computed under another session's assumptions.
+    """
+    return Screener({"discount_rate": discount_rate, "terminal_growth": terminal_growth})
+
+
+st.title("🔎 Stock Screener")
+st.caption("Filter and rank a universe of tickers on key metrics and DCF upside")
+
+# Universe
+st.header("Universe")
+universe_text = st.text_area(
+    "Tickers (comma, space or newline separated)",
+    value="AAPL MSFT GOOGL AMZN META NVDA JPM JNJ PG KO XOM WMT"
+)
+universe = sorted({t.strip().upper() for t in universe_text.replace(",", " ").split() if t.strip()})
+
+col1, col2 = st.columns(2)
+with col1:
+    discount_rate = st.slider("Discount Rate (WACC)", 0.05, 0.20, 0.10, 0.01)
+with col2:
+    terminal_growth = st.slider("Terminal Growth Rate", 0.00, 0.05, 0.025, 0.005)
+screener = load_screener(discount_rate, terminal_growth)
+
+if st.button("Refresh Universe"):
+    progress = st.progress(0.0)
+    loaded = []
+    for i, pair in enumerate(get_financials_batch(universe)):
+        loaded.append(pair)
+        progress.progress((i + 1) / len(universe))
+    changed = screener.refresh(loaded)
+    removed = [t for t in screener.tickers() if t not in universe]
+    screener.remove(removed)
+    failed = [ticker for ticker, financials in loaded if "error" in financials["Info"]]
+    st.success(f"{len(changed)} tickers recomputed, {len(loaded) - len(changed) - len(failed)} unchanged")
+    if failed:
+        st.warning(f"{len(failed)} tickers failed to load: {', '.join(failed)}")
+
+st.caption(f"{len(screener)} tickers in the screener")
+
+# Filters
+st.header("Filters")
+metrics = screener.metrics
+conditions = []
+if metrics:
+    selected = st.multiselect(
+        "Metrics to filter on",
+        metrics,
+        default=[m for m in ["P/E Ratio", "Current Ratio", "Upside/Downside"] if m in metrics]
+    )
+    for metric in selected:
+        col1, col2 = st.columns([1, 2])
+        with col1:
+            op = st.selectbox(metric, ["<", "<=", ">", ">="], key=f"op_{metric}")
+        with col2:
+            value = st.number_input("Value", value=0.0, key=f"value_{metric}", format="%.4f")
+        conditions.append((metric, op, value))
+
+    # Ranking
+    st.header("Ranking")
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        rank_by = st.selectbox("Rank by", ["(none)"] + metrics)
+    with col2:
+        k = st.number_input("Top K", 1, 1000, 25)
+    with col3:
+        ascending = st.checkbox("Ascending", value=False)
+
+    results = screener.screen(
+        conditions,
+        rank_by=None if rank_by == "(none)" else rank_by,
+        k=int(k),
+        ascending=ascending
+    )
+
+    st.header("Results")
+    st.caption(f"{len(results)} matches")
+    st.dataframe(results.style.format("{:,.2f}", na_rep="—"))
+else:
+    st.info("Refresh the universe to populate the screener.")
@@ -0,0 +1,177 @@
+import numpy as np
+import pandas as pd
+from equity_core.ratios import RATIOS, format_ratio
+from statements import (
+    Statements, INFO_FIELDS, INCOME, TOTAL_REVENUE, GROSS_PROFIT, OPERATING_INCOME, NET_INCOME,
+    TOTAL_ASSETS, CURRENT_ASSETS, CURRENT_LIABILITIES, INVENTORY, TOTAL_EQUITY,
+)
+from instrumentation import instrument
+
+# Line items stacked into the panel, per statement
+PANEL_ITEMS = {
+    "Income Statement": ["Total Revenue", "Revenue", "Gross Profit", "Operating Income", "Net Income"],
+    "Balance Sheet": [
+        "Total Assets", "Current Assets", "Current Liabilities", "Inventory",
+        "Cash And Cash Equivalents", "Short Long Term Debt", "Long Term Debt",
+        "Total Equity Gross Minority Interest",
+    ],
+    "Cash Flow": ["Operating Cash Flow", "Capital Expenditure"],
+}
+
+
+@instrument("panel.build_panel")
+def build_panel(financials_by_ticker, items=PANEL_ITEMS):
+    """
+    Stack many tickers' statements into one long frame.
+
+    Accepts a dict {ticker: financials} or an iterable of (ticker,
+    financials) pairs such as get_financials_batch yields. Returns a dict
+    with "Statements" (columns ticker, statement, period, date, item,
+    value; period 0 is the latest) and "Info" (one row per ticker).
+    """
+    if isinstance(financials_by_ticker, dict):
+        financials_by_ticker = financials_by_ticker.items()
+
+    columns = {"ticker": [], "statement": [], "period": [], "date": [], "item": [], "value": []}
+    info_rows = {}
+
+    for ticker, financials in financials_by_ticker:
+        info = financials["Info"]
+        info_rows[ticker] = {field: info.get(field) for field in INFO_FIELDS}
+
+        for statement, wanted in items.items():
+            df = financials[statement]
+            if df.empty:
+                continue
+            # Positional lookups on the raw array; column selection through pandas dominates otherwise
+            positions = {column: i for i, column in enumerate(df.columns)}
+            present = [item for item in wanted if item in positions]
+            if not present:
+                continue
+            block = df.to_numpy(dtype=float)[:, [positions[item] for item in present]]
+            n_periods, n_items = block.shape
+            size = n_periods * n_items
+            columns["ticker"].append(np.full(size, ticker, dtype=object))
+            columns["statement"].append(np.full(size, statement, dtype=object))
+            columns["period"].append(np.repeat(np.arange(n_periods), n_items))
+            columns["date"].append(np.repeat(df.index.to_numpy(dtype=object), n_items))
+            columns["item"].append(np.tile(np.array(present, dtype=object), n_periods))
+            columns["value"].append(block.ravel())
+
+    if columns["value"]:
+        data = {name: np.concatenate(parts) for name, parts in columns.items()}
+    else:
+        data = {name: np.array([], dtype=float if name == "value" else object) for name in columns}
+
+    statements = pd.DataFrame({
+        "ticker": pd.Categorical(data["ticker"]),
+        "statement": pd.Categorical(data["statement"], categories=list(items)),
+        "period": data["period"].astype(np.int16),
+        "date": data["date"],
+        "item": pd.Categorical(data["item"]),
+        "value": data["value"].astype(float),
+    })
+
+    info = pd.DataFrame.from_dict(info_rows, orient="index", columns=INFO_FIELDS)
+    info.index.name = "ticker"
+    return {"Statements": statements, "Info": info}
+
+
+def _safe_divide(numerator, denominator):
+    return np.where(denominator != 0, numerator / denominator, np.nan)
+
+
+def _previous(values):
+    """
+    Shift the period axis so each cell holds the prior period's value.
+    """
+    shifted = np.full(values.shape, np.nan)
+    shifted[:, :-1] = values[:, 1:]
+    return shifted
+
+
+def _growth(values):
+    previous = _previous(values)
+    return _safe_divide(values - previous, previous)
+
+
+@instrument("panel.compute_panel_metrics")
+def compute_panel_metrics(panel):
+    """
+    Compute every ratio from metrics.compute_key_metrics for all tickers
+    and periods at once. `panel` is a build_panel result or a
+    statements.Statements.
+
+    Returns a float DataFrame indexed by (ticker, period), period 0 being
+    the latest, with a "Date" column and one column per ratio. Ratios that
+    are undefined (zero denominator, no prior period) are NaN. As in
+    calculate_key_metrics, P/E and P/B use the current price for every
+    period. Format with format_panel_metrics.
+    """
+    statements = panel if isinstance(panel, Statements) else Statements.from_panel(panel)
+    values = statements.values
+
+    revenue = values[:, :, TOTAL_REVENUE]
+    gross_profit = values[:, :, GROSS_PROFIT]
+    operating_income = values[:, :, OPERATING_INCOME]
+    net_income = values[:, :, NET_INCOME]
+
+    total_assets = values[:, :, TOTAL_ASSETS]
+    current_assets = values[:, :, CURRENT_ASSETS]
+    current_liabilities = values[:, :, CURRENT_LIABILITIES]
+    inventory = values[:, :, INVENTORY]
+    total_equity = values[:, :, TOTAL_EQUITY]
+
+    current_price = np.nan_to_num(statements.info_array("currentPrice"), nan=0.0)[:, None]
+    shares = np.nan_to_num(statements.info_array("sharesOutstanding"), nan=0.0)[:, None]
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        eps = _safe_divide(net_income, shares)
+        book_value_per_share = _safe_divide(total_equity, shares)
+        prev_eps = _previous(eps)
+
+        ratios = {
+            "Gross Margin": _safe_divide(gross_profit, revenue),
+            "Operating Margin": _safe_divide(operating_income, revenue),
+            "Net Margin": _safe_divide(net_income, revenue),
+            "Current Ratio": _safe_divide(current_assets, current_liabilities),
+            "Quick Ratio": _safe_divide(current_assets - inventory, current_liabilities),
+            "Return on Assets (ROA)": _safe_divide(net_income, total_assets),
+            "P/E Ratio": _safe_divide(current_price, eps),
+            "P/B Ratio": _safe_divide(current_price, book_value_per_share),
+            "YoY Revenue Growth": _growth(revenue),
+            "YoY Net Income Growth": _growth(net_income),
+            "YoY Assets Growth": _growth(total_assets),
+            "YoY Equity Growth": _growth(total_equity),
+            "YoY EPS Growth": _safe_divide(eps - prev_eps, prev_eps),
+        }
+
+    t, p = np.nonzero(statements.rows[INCOME])
+    index = pd.MultiIndex.from_arrays(
+        [np.asarray(statements.tickers, dtype=object)[t], p], names=["ticker", "period"]
+    )
+    result = pd.DataFrame({"Date": statements.dates[t, p]}, index=index)
+    for name in RATIOS:
+        result[name] = ratios[name][t, p]
+    return result
+
+
+def latest_metrics(panel_metrics):
+    """
+    Latest-period row per ticker, indexed by ticker.
+    """
+    latest = panel_metrics.index.get_level_values("period") == 0
+    return panel_metrics[latest].droplevel("period")
+
+
+def format_panel_metrics(panel_metrics):
+    """
+    Display strings for a compute_panel_metrics frame (NaN becomes "").
+    """
+    formatted = panel_metrics.copy()
+    for name in RATIOS:
+        formatted[name] = [
+            "" if np.isnan(value) else format_ratio(name, value)
+            for value in panel_metrics[name].to_numpy()
+        ]
+    return formatted
@@ -0,0 +1,276 @@
+"""
+Peer comparison and relative valuation.
+
+    python peers.py                       # rebuild aggregates from the local cache
+    python peers.py tickers.txt           # fetch a peer universe in batches first
+    python peers.py --provider synthetic  # offline universe
+
+Peer groups are the `industry` and `sector` fields of info. Aggregates are
+built once over a whole universe and saved, so looking up any ticker's
+comps never fetches its peers.
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+from cache import DEFAULT_CACHE_DIR, _has_parquet
+from metrics import compute_key_metrics
+from panel import RATIOS, compute_panel_metrics, latest_metrics
+from statements import Statements, NET_INCOME, TOTAL_EQUITY
+from instrumentation import instrument
+
+GROUPS = ("industry", "sector")
+DEFAULT_QUANTILES = (0.25, 0.5, 0.75)
+DEFAULT_PEERS_PATH = os.path.join(DEFAULT_CACHE_DIR, "peers")
+
+# Saved aggregates are rebuilt early once the disk cache holds this much
+# more of the universe than they were built from
+REBUILD_GROWTH = 0.10
+
+# Multiples used for relative valuation and the per-share figure each applies to
+MULTIPLES = {"P/E Ratio": "EPS", "P/B Ratio": "Book Value per Share"}
+
+
+@instrument("peers.latest_by_ticker")
+def latest_by_ticker(universe):
+    """
+    Latest-period ratios plus sector and industry, one row per ticker.
+    `universe` is a Statements or anything Statements.from_universe accepts.
+
+    Non-positive multiples (loss makers, negative book value) are NaN so
+    they don't drag down peer medians.
+    """
+    statements = universe if isinstance(universe, Statements) else Statements.from_universe(universe)
+    latest = latest_metrics(compute_panel_metrics(statements)).drop(columns="Date")
+    latest = latest.reindex(statements.tickers)
+    for multiple in MULTIPLES:
+        latest[multiple] = latest[multiple].where(latest[multiple] > 0)
+    for group in GROUPS:
+        latest[group] = [info.get(group) for info in statements.info]
+    latest.index.name = "Ticker"
+    return latest
+
+
+class PeerAggregates:
+    """
+    Quantiles of every ratio per industry and per sector over a universe.
+
+    Each table is built in one grouped pass when the object is created and
+    indexed by (group, quantile); lookups afterwards are plain .loc reads.
+    """
+
+    def __init__(self, latest, quantiles=DEFAULT_QUANTILES, built_at=None):
+        self.latest = latest
+        self.quantiles = tuple(quantiles)
+        self.built_at = built_at or time.time()
+        self.tables = {}
+        self.counts = {}
+        for by in GROUPS:
+            grouped = latest.dropna(subset=[by]).groupby(by)
+            self.tables[by] = grouped[RATIOS].quantile(list(self.quantiles))
+            self.counts[by] = grouped.size()
+
+    @classmethod
+    def from_universe(cls, universe, quantiles=DEFAULT_QUANTILES):
+        return cls(latest_by_ticker(universe), quantiles)
+
+    def peer_group(self, info, by="industry", min_peers=5):
+        """
+        (group field, group name) for a company's info dict, falling back
+        from industry to sector when the industry has fewer than
+        `min_peers` companies. None when no group is large enough.
+        """
+        order = GROUPS[GROUPS.index(by):] if by in GROUPS else (by,)
+        for field in order:
+            name = info.get(field)
+            if name is not None and self.counts[field].get(name, 0) >= min_peers:
+                return field, name
+        return None
+
+    def table(self, by, name):
+        """
+        Ratios x quantiles for one group.
+        """
+        return self.tables[by].loc[name].T[list(self.quantiles)]
+
+    def save(self, path=DEFAULT_PEERS_PATH):
+        """
+        Write the per-ticker frame; the group tables are rebuilt on load.
+        """
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        if _has_parquet():
+            self.latest.to_parquet(path + ".parquet")
+        else:
+            self.latest.to_csv(path + ".csv")
+
+    @classmethod
+    def load(cls, path=DEFAULT_PEERS_PATH, quantiles=DEFAULT_QUANTILES):
+        """
+        Load saved aggregates, or None when nothing has been saved.
+        """
+        if os.path.exists(path + ".parquet"):
+            latest, saved = pd.read_parquet(path + ".parquet"), path + ".parquet"
+        elif os.path.exists(path + ".csv"):
+            latest, saved = pd.read_csv(path + ".csv", index_col="Ticker"), path + ".csv"
+        else:
+            return None
+        return cls(latest, quantiles, built_at=os.path.getmtime(saved))
+
+
+def _local_universe(provider=None):
+    """
+    Tickers available without the network: the provider's own list when it
+    has one (local and synthetic), otherwise whatever the disk cache holds.
+    """
+    from data import get_default_cache, get_default_provider
+    from providers import LocalFileProvider
+
+    provider = provider or get_default_provider()
+    if not hasattr(provider, "tickers"):
+        directory = get_default_cache().directory
+        if not os.path.isdir(directory):
+            return []
+        provider = LocalFileProvider(directory)
+
+    for ticker in provider.tickers():
+        try:
+            financials = provider.fetch_all(ticker)
+        except Exception:
+            continue
+        if "error" not in financials["Info"]:
+            yield ticker, financials
+
+
+def cached_universe_size(provider=None):
+    """
+    Number of tickers in the disk cache, the universe load_peer_aggregates
+    builds from for Yahoo (0 for local and synthetic providers).
+    """
+    from data import get_default_cache, get_default_provider
+
+    provider = provider or get_default_provider()
+    if not provider.cacheable:
+        return 0
+    directory = get_default_cache().directory
+    try:
+        names = os.listdir(directory)
+    except OSError:
+        return 0
+    return sum(1 for name in names if os.path.isfile(os.path.join(directory, name, "meta.json")))
+
+
+def load_peer_aggregates(path=DEFAULT_PEERS_PATH, max_age=24 * 3600, provider=None):
+    """
+    Saved aggregates if younger than `max_age` seconds and built from
+    about as many tickers as the disk cache now holds, otherwise rebuilt
+    from the local universe (never the network) and saved. Local and
+    synthetic providers are always rebuilt in memory.
+    """
+    from data import get_default_provider
+
+    provider = provider or get_default_provider()
+    if not provider.cacheable:
+        # Local and synthetic universes are cheap to rebuild, and saving them would mix with Yahoo data
+        return PeerAggregates.from_universe(_local_universe(provider))
+
+    aggregates = PeerAggregates.load(path)
+    if aggregates is not None and time.time() - aggregates.built_at <= max_age:
+        # A fresh install starts from a near-empty cache; don't sit on that for a day
+        built_from = len(aggregates.latest)
+        if cached_universe_size(provider) <= built_from * (1 + REBUILD_GROWTH):
+            return aggregates
+    aggregates = PeerAggregates.from_universe(_local_universe(provider))
+    aggregates.save(path)
+    return aggregates
+
+
+@instrument("peers.relative_valuation")
+def relative_valuation(financials, aggregates, by="industry", min_peers=5):
+    """
+    Compare one company with its peer group and value it at peer multiples.
+
+    Returns a dict with the group, peer count, "Comparison" (ratios x
+    peer quantiles plus the company's own value) and "Implied Price"
+    (multiples x quantiles: the peer multiple times the company's EPS or
+    book value per share), or {"Error": ...}.
+    """
+    try:
+        statements = financials if isinstance(financials, Statements) else Statements.from_financials(financials)
+        info = statements.info[0]
+        group = aggregates.peer_group(info, by, min_peers)
+        if group is None:
+            return {"Error": f"Fewer than {min_peers} peers in the cached universe "
+                             f"for {info.get('industry', 'this industry')}"}
+        field, name = group
+
+        ratios = compute_key_metrics(statements)
+        if "Error" in ratios:
+            return ratios
+
+        comparison = aggregates.table(field, name).copy()
+        comparison["Company"] = [ratios.get(ratio, np.nan) for ratio in comparison.index]
+
+        shares = info.get("sharesOutstanding") or 0
+        latest = statements.values[0, 0]
+        per_share = {
+            "EPS": latest[NET_INCOME] / shares if shares else np.nan,
+            "Book Value per Share": latest[TOTAL_EQUITY] / shares if shares else np.nan,
+        }
+        implied = pd.DataFrame(
+            {q: [comparison.loc[m, q] * per_share[basis] for m, basis in MULTIPLES.items()]
+             for q in aggregates.quantiles},
+            index=list(MULTIPLES),
+        )
+        # A negative EPS or book value times a positive multiple is not a price
+        implied = implied.where(implied > 0)
+
+        return {
+            "Group By": field,
+            "Group": name,
+            "Peers": int(aggregates.counts[field][name]),
+            "Comparison": comparison,
+            "Implied Price": implied,
+            "Current Price": info.get("currentPrice", 0),
+        }
+    except Exception as e:
+        return {"Error": str(e)}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("tickers", nargs="?", help="File of tickers to fetch first (one per line)")
+    parser.add_argument("--provider", help='Data provider spec, e.g. "synthetic" or "local:<dir>"')
+    parser.add_argument("--output", default=DEFAULT_PEERS_PATH, help="Aggregates path (without extension)")
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--rate-limit", type=float, default=5.0)
+    args = parser.parse_args(argv)
+
+    from data import get_financials_batch
+    from providers import provider_from_spec
+
+    provider = provider_from_spec(args.provider) if args.provider else None
+    if args.tickers:
+        with open(args.tickers) as f:
+            tickers = [t.strip().upper() for line in f for t in line.split("#", 1)[0].replace(",", " ").split()]
+        universe = (
+            (ticker, financials)
+            for ticker, financials in get_financials_batch(
+                tickers, max_workers=args.workers, rate_limit=args.rate_limit or None, provider=provider
+            )
+            if "error" not in financials["Info"]
+        )
+    else:
+        universe = _local_universe(provider)
+
+    aggregates = PeerAggregates.from_universe(universe)
+    aggregates.save(args.output)
+    print(f"{len(aggregates.latest)} tickers, {len(aggregates.counts['industry'])} industries, "
+          f"{len(aggregates.counts['sector'])} sectors", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
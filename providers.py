@@ -0,0 +1,292 @@
+import os
+import zlib
+
+from cache import read_field, FIELDS
+
+
+class DataProvider:
+    """
+    Source of raw financial data for data.get_financials.
+
+    Subclasses implement fetch(ticker, field) where field is one of
+    cache.FIELDS and return a statement DataFrame (periods as a string
+    index, newest first, line items as columns) or the info dict.
+    """
+
+    # Whether results should go through the on-disk FinancialsCache.
+    # Local and synthetic sources are already fast, and caching them would
+    # mix their data with real Yahoo data under the same ticker.
+    cacheable = False
+
+    def fetch(self, ticker, field):
+        raise NotImplementedError
+
+    def fetch_all(self, ticker):
+        return {field: self.fetch(ticker, field) for field in FIELDS}
+
+    def prices(self, ticker):
+        """
+        Daily closing prices as a Series with a DatetimeIndex, oldest first.
+        """
+        raise NotImplementedError(f"{type(self).__name__} has no price history")
+
+
+class YahooProvider(DataProvider):
+    """
+    Fetches fields from Yahoo Finance. Pass a `session` to share one
+    connection pool across every request made through this provider.
+    """
+
+    cacheable = True
+
+    def __init__(self, session=None):
+        self.session = session
+
+    def fetch(self, ticker, field):
+        """
+        Download a single field. Statements are transposed with a string
+        index for Streamlit display.
+        """
+        # Imported here so offline providers never pay for yfinance
+        import yfinance as yf
+
+        if self.session is not None:
+            stock = yf.Ticker(ticker, session=self.session)
+        else:
+            stock = yf.Ticker(ticker)
+
+        if field == "Info":
+            return stock.info
+
+        if field == "Income Statement":
+            df = stock.financials.T  # Transpose for readability
+        elif field == "Balance Sheet":
+            df = stock.balance_sheet.T
+        else:
+            df = stock.cashflow.T
+
+        # Convert index to string for Streamlit display
+        if not df.empty:
+            df.index = df.index.astype(str)
+        return df
+
+    def prices(self, ticker):
+        import yfinance as yf
+
+        stock = yf.Ticker(ticker, session=self.session) if self.session is not None else yf.Ticker(ticker)
+        closes = stock.history(period="max", auto_adjust=True)["Close"]
+        closes.index = closes.index.tz_localize(None).normalize()
+        return closes
+
+
+class LocalFileProvider(DataProvider):
+    """
+    Reads statement snapshots from a directory with one folder per ticker:
+
+        <directory>/<TICKER>/income_statement.parquet (or .csv)
+        <directory>/<TICKER>/balance_sheet.parquet
+        <directory>/<TICKER>/cash_flow.parquet
+        <directory>/<TICKER>/info.json
+        <directory>/<TICKER>/prices.parquet (or .csv; optional, for backtests)
+
+    This is the same layout FinancialsCache writes, so a warm cache
+    directory can be used directly as an offline data source. Price files
+    are indexed by date with a Close column (or a single column).
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    def tickers(self):
+        return sorted(
+            name for name in os.listdir(self.directory)
+            if os.path.isdir(os.path.join(self.directory, name))
+        )
+
+    def fetch(self, ticker, field):
+        path = os.path.join(self.directory, ticker.strip().upper())
+        if not os.path.isdir(path):
+            raise KeyError(f"No local data for {ticker}")
+        try:
+            return read_field(path, field)
+        except FileNotFoundError:
+            if field == "Info":
+                raise
+            import pandas as pd
+
+            return pd.DataFrame()
+
+    def prices(self, ticker):
+        import pandas as pd
+
+        path = os.path.join(self.directory, ticker.strip().upper())
+        try:
+            df = read_field(path, "Prices")
+        except FileNotFoundError:
+            raise KeyError(f"No local prices for {ticker}")
+        closes = df["Close"] if "Close" in df.columns else df.iloc[:, 0]
+        closes.index = pd.to_datetime(closes.index)
+        return closes.sort_index().astype(float)
+
+
+# (sector, industry, gross margin, operating margin) used to shape synthetic companies
+_SYNTHETIC_INDUSTRIES = [
+    ("Technology", "Software - Infrastructure", 0.70, 0.30),
+    ("Technology", "Consumer Electronics", 0.42, 0.28),
+    ("Technology", "Semiconductors", 0.55, 0.25),
+    ("Healthcare", "Drug Manufacturers - General", 0.68, 0.22),
+    ("Healthcare", "Medical Devices", 0.60, 0.18),
+    ("Financial Services", "Insurance - Diversified", 0.35, 0.12),
+    ("Consumer Cyclical", "Specialty Retail", 0.32, 0.08),
+    ("Consumer Defensive", "Beverages - Non-Alcoholic", 0.58, 0.24),
+    ("Energy", "Oil & Gas Integrated", 0.30, 0.14),
+    ("Industrials", "Aerospace & Defense", 0.22, 0.10),
+    ("Utilities", "Utilities - Regulated Electric", 0.40, 0.20),
+    ("Communication Services", "Internet Content & Information", 0.57, 0.27),
+]
+
+
+class SyntheticProvider(DataProvider):
+    """
+    Generates realistic-looking statements for load tests and benchmarks.
+
+    Every ticker is deterministic: its data is derived from `seed` and the
+    ticker symbol, so repeated runs see identical numbers. Any symbol can
+    be requested; tickers() lists `n_tickers` generated names.
+    """
+
+    def __init__(self, n_tickers=100, years=4, seed=0, last_fiscal_year=2024):
+        self.n_tickers = n_tickers
+        self.years = years
+        self.seed = seed
+        self.last_fiscal_year = last_fiscal_year
+        self._generated = {}
+        self._price_dates = None
+
+    def tickers(self):
+        return [f"SYN{i:05d}" for i in range(self.n_tickers)]
+
+    def fetch(self, ticker, field):
+        key = ticker.strip().upper()
+        data = self._generated.get(key)
+        if data is None:
+            data = self._generate(key)
+            # Generation is cheap; keep only a bounded number around
+            if len(self._generated) > 1024:
+                self._generated.clear()
+            self._generated[key] = data
+        value = data[field]
+        return dict(value) if field == "Info" else value.copy()
+
+    def prices(self, ticker):
+        """
+        Business-day random walk from the oldest fiscal year to 15 months
+        after the latest, ending at the ticker's current price.
+        """
+        import numpy as np
+        import pandas as pd
+
+        key = ticker.strip().upper()
+        price = self.fetch(key, "Info")["currentPrice"]
+        rng = np.random.default_rng([self.seed, zlib.crc32(key.encode()), 1])
+        if self._price_dates is None:
+            self._price_dates = pd.bdate_range(f"{self.last_fiscal_year - self.years + 1}-01-01",
+                                               f"{self.last_fiscal_year + 2}-03-31")
+        dates = self._price_dates
+        path = np.exp(np.cumsum(rng.normal(0.07 / 252, 0.30 / np.sqrt(252), len(dates))))
+        return pd.Series(price * path / path[-1], index=dates, name="Close")
+
+    def _generate(self, ticker):
+        # Imported here so importing providers (e.g. for the Yahoo path) doesn't load NumPy and pandas
+        import numpy as np
+        import pandas as pd
+
+        rng = np.random.default_rng([self.seed, zlib.crc32(ticker.encode())])
+        sector, industry, gross_margin, op_margin = _SYNTHETIC_INDUSTRIES[
+            rng.integers(len(_SYNTHETIC_INDUSTRIES))
+        ]
+        n = self.years
+
+        # Periods are newest first like yfinance; each year is grown from the one before
+        revenue_now = float(np.exp(rng.uniform(np.log(2e8), np.log(4e11))))
+        growth = rng.normal(0.06, 0.08, n)
+        revenue = revenue_now / np.cumprod(np.r_[1, 1 + growth[:-1]])
+
+        gm = np.clip(gross_margin + rng.normal(0, 0.03, n), 0.05, 0.9)
+        om = np.clip(op_margin + rng.normal(0, 0.03, n), -0.1, gm - 0.02)
+        gross_profit = revenue * gm
+        operating_income = revenue * om
+        net_income = operating_income * rng.uniform(0.70, 0.85, n)
+
+        total_assets = revenue * rng.uniform(0.8, 2.5)
+        total_assets = total_assets * np.cumprod(np.r_[1, 1 - np.abs(rng.normal(0.03, 0.02, n - 1))])
+        current_assets = total_assets * rng.uniform(0.25, 0.5)
+        current_liabilities = current_assets / rng.uniform(1.0, 2.5)
+        inventory = current_assets * rng.uniform(0.0, 0.35)
+        cash = current_assets * rng.uniform(0.2, 0.5)
+        long_term_debt = total_assets * rng.uniform(0.05, 0.35)
+        short_debt = long_term_debt * rng.uniform(0.0, 0.15)
+        equity = total_assets - current_liabilities - long_term_debt - short_debt
+
+        ocf = net_income * rng.uniform(1.05, 1.4, n)
+        capex = -revenue * rng.uniform(0.02, 0.08)
+
+        periods = [f"{self.last_fiscal_year - i}-12-31" for i in range(n)]
+        income = pd.DataFrame({
+            "Total Revenue": revenue,
+            "Gross Profit": gross_profit,
+            "Operating Income": operating_income,
+            "Net Income": net_income,
+        }, index=periods)
+        balance = pd.DataFrame({
+            "Total Assets": total_assets,
+            "Current Assets": current_assets,
+            "Current Liabilities": current_liabilities,
+            "Inventory": inventory,
+            "Cash And Cash Equivalents": cash,
+            "Short Long Term Debt": short_debt,
+            "Long Term Debt": long_term_debt,
+            "Total Equity Gross Minority Interest": equity,
+        }, index=periods)
+        cash_flow = pd.DataFrame({
+            "Operating Cash Flow": ocf,
+            "Capital Expenditure": capex,
+            "Free Cash Flow": ocf + capex,
+        }, index=periods)
+
+        pe = rng.uniform(8, 40)
+        market_cap = max(net_income[0], revenue[0] * 0.02) * pe
+        shares = float(np.round(market_cap / rng.uniform(20, 400)))
+        info = {
+            "shortName": f"{ticker} Synthetic Corp",
+            "sector": sector,
+            "industry": industry,
+            "currentPrice": market_cap / shares,
+            "sharesOutstanding": shares,
+            "marketCap": market_cap,
+            "totalRevenue": revenue[0],
+            "netIncomeToCommon": net_income[0],
+            "longBusinessSummary": f"{ticker} is a synthetic {industry.lower()} company used for offline testing.",
+        }
+        return {
+            "Income Statement": income,
+            "Balance Sheet": balance,
+            "Cash Flow": cash_flow,
+            "Info": info,
+        }
+
+
+def provider_from_spec(spec):
+    """
+    Build a provider from a short spec string: "yahoo", "synthetic",
+    "synthetic:<n_tickers>" or "local:<directory>".
+    """
+    name, _, arg = (spec or "yahoo").partition(":")
+    name = name.strip().lower()
+    if name == "yahoo":
+        return YahooProvider()
+    if name == "synthetic":
+        return SyntheticProvider(n_tickers=int(arg)) if arg else SyntheticProvider()
+    if name == "local":
+        return LocalFileProvider(arg)
+    raise ValueError(f"Unknown data provider: {spec}")
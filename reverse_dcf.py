@@ -0,0 +1,127 @@
+import numpy as np
+import pandas as pd
+from dcf import _extract_dcf_inputs, dcf_inputs_batch, dcf_value_per_share
+from equity_core.dcf import DEFAULT_ASSUMPTIONS, MEGA_CAP
+from statements import Statements
+from instrumentation import instrument
+
+# Assumptions that can be solved for, with their default search brackets.
+# The discount rate bracket starts just above (effective) terminal growth.
+BRACKETS = {
+    "revenue_growth": (-0.50, 1.00),
+    "margin_improvement": (-0.10, 0.10),
+    "discount_rate": (None, 1.00),
+}
+
+LABELS = {
+    "revenue_growth": "Implied Revenue Growth",
+    "margin_improvement": "Implied Margin Improvement",
+    "discount_rate": "Implied Discount Rate",
+}
+
+
+def bisect(fn, low, high, target, tol=1e-7, max_iter=100):
+    """
+    Vectorized bisection: elementwise x in [low, high] with fn(x) == target.
+
+    `fn` maps an array of x to an array of values; low, high and target
+    broadcast against each other. Every element is narrowed in the same
+    loop, so solving a whole universe costs about as many fn calls as
+    solving one ticker. Returns (x, solved): x is NaN where the bracket
+    holds no sign change (the target is out of reach).
+    """
+    low, high, target = np.broadcast_arrays(
+        np.asarray(low, dtype=float), np.asarray(high, dtype=float), np.asarray(target, dtype=float)
+    )
+    low, high = low.copy(), high.copy()
+    f_low = fn(low) - target
+    f_high = fn(high) - target
+    solved = np.isfinite(f_low) & np.isfinite(f_high) & (np.sign(f_low) != np.sign(f_high))
+
+    for _ in range(max_iter):
+        if not np.any(solved & (high - low > tol)):
+            break
+        mid = (low + high) / 2
+        f_mid = fn(mid) - target
+        # Keep the half whose endpoints still straddle the target
+        right = np.sign(f_mid) == np.sign(f_low)
+        low = np.where(right, mid, low)
+        f_low = np.where(right, f_mid, f_low)
+        high = np.where(right, high, mid)
+
+    return np.where(solved, (low + high) / 2, np.nan), solved
+
+
+def _solve(inputs, solve_for, assumptions, bracket, target_price, tol):
+    if solve_for not in BRACKETS:
+        raise ValueError(f"Can't solve for {solve_for}; choose one of {', '.join(BRACKETS)}")
+    params = dict(DEFAULT_ASSUMPTIONS)
+    params.update(assumptions or {})
+    years = int(params.pop("projection_years"))
+
+    low, high = bracket or BRACKETS[solve_for]
+    if low is None:
+        # Mirror dcf_value_per_share's mega-cap floor so the bracket starts above the real terminal growth
+        mega_cap = np.asarray(inputs["market_cap"], dtype=float) > MEGA_CAP
+        terminal_growth = np.where(mega_cap, np.maximum(params["terminal_growth"], 0.03), params["terminal_growth"])
+        low = terminal_growth + 1e-6
+
+    def value(x):
+        params[solve_for] = x
+        value_per_share, _ = dcf_value_per_share(inputs, years=years, **params)
+        return value_per_share
+
+    if target_price is None:
+        target_price = inputs["current_price"]
+    target_price = np.where(np.asarray(target_price, dtype=float) > 0, target_price, np.nan)
+    return bisect(value, low, high, target_price, tol=tol) + (low, high)
+
+
+@instrument("reverse_dcf.solve_implied")
+def solve_implied(financials, solve_for="revenue_growth", assumptions=None, bracket=None,
+                  target_price=None, tol=1e-7):
+    """
+    Reverse DCF: the value of one assumption (revenue_growth,
+    margin_improvement or discount_rate) at which run_dcf_model's value
+    per share equals the current price (or `target_price`), holding the
+    other `assumptions` fixed.
+
+    Solved by bisection on the vectorized DCF kernel within `bracket`
+    (defaults in BRACKETS). `financials` may be a dcf.ValuationContext or
+    a single-ticker Statements.
+    """
+    try:
+        inputs = _extract_dcf_inputs(financials)
+        implied, solved, low, high = _solve(inputs, solve_for, assumptions, bracket, target_price, tol)
+        price = inputs["current_price"] if target_price is None else target_price
+        if not solved:
+            return {"Error": f"No {solve_for.replace('_', ' ')} between {float(low):.1%} and {float(high):.1%} "
+                             f"reproduces a price of {price:.2f}"}
+        return {
+            "Solved For": solve_for,
+            "Implied Value": float(implied),
+            "Target Price": float(price),
+        }
+    except Exception as e:
+        return {"Error": str(e)}
+
+
+@instrument("reverse_dcf.solve_implied_batch")
+def solve_implied_batch(universe, solve_for="revenue_growth", assumptions=None, bracket=None, tol=1e-7):
+    """
+    solve_implied for every ticker at once. `universe` is a Statements or
+    anything Statements.from_universe accepts.
+
+    Returns a DataFrame indexed by ticker with the implied value (column
+    named as in LABELS, NaN where no value in the bracket reaches the
+    price) and the current price.
+    """
+    statements = universe if isinstance(universe, Statements) else Statements.from_universe(universe)
+    inputs, usable = dcf_inputs_batch(statements)
+    implied, solved, _, _ = _solve(inputs, solve_for, assumptions, bracket, None, tol)
+
+    result = pd.DataFrame(
+        {LABELS[solve_for]: np.where(usable & solved, implied, np.nan), "Current Price": inputs["current_price"]},
+        index=pd.Index(statements.tickers, name="Ticker"),
+    )
+    return result
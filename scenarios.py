@@ -0,0 +1,294 @@
+"""
+User-defined scenario sets, evaluated in one batch and memoized.
+
+A scenario is a dict of run_dcf_model assumptions, except that
+revenue_growth may be a list with one rate per projection year (the last
+rate repeats if the list is shorter than the projection). Named sets of
+scenarios are saved as JSON under the cache directory.
+"""
+import hashlib
+import json
+import os
+import re
+import threading
+from collections import OrderedDict
+from decimal import Decimal, InvalidOperation
+
+import numpy as np
+from cache import DEFAULT_CACHE_DIR
+from dcf import valuation_context, dcf_value_per_share, DEFAULT_SCENARIOS
+from equity_core.dcf import DEFAULT_ASSUMPTIONS
+from instrumentation import instrument, count
+
+DEFAULT_SCENARIO_DIR = os.path.join(DEFAULT_CACHE_DIR, "scenarios")
+
+# Name of the built-in Bear/Base/Bull set; it can't be overwritten
+DEFAULT_SET = "Default"
+
+RESULT_COLUMNS = ["Value per Share", "Upside/Downside", "Enterprise Value", "Equity Value"]
+
+
+def resolve_scenario(assumptions, projection_years=5):
+    """
+    Fill in defaults and expand revenue growth to one rate per year.
+    Returns (years, params) with params ready for dcf_value_per_share.
+    """
+    unknown = set(assumptions) - set(DEFAULT_ASSUMPTIONS)
+    if unknown:
+        raise ValueError(f"Unknown assumption(s): {', '.join(sorted(unknown))}")
+    params = dict(DEFAULT_ASSUMPTIONS, projection_years=projection_years)
+    params.update(assumptions)
+
+    years = int(params.pop("projection_years"))
+    if years < 1:
+        raise ValueError("projection_years must be at least 1")
+    growth = params["revenue_growth"]
+    if isinstance(growth, (list, tuple)):
+        if not growth:
+            raise ValueError("revenue_growth path is empty")
+        path = [float(g) for g in growth][:years]
+        path += [path[-1]] * (years - len(path))
+    else:
+        path = [float(growth)] * years
+    params = {name: float(value) for name, value in params.items() if name != "revenue_growth"}
+    params["revenue_growth"] = path
+    return years, params
+
+
+def scenario_hash(assumptions, projection_years=5):
+    """
+    Content hash of a scenario after resolving defaults, so equivalent
+    spellings (a flat rate or the same rate repeated) hash the same.
+    """
+    years, params = resolve_scenario(assumptions, projection_years)
+    payload = json.dumps([years, params], sort_keys=True)
+    return hashlib.sha1(payload.encode()).hexdigest()
+
+
+@instrument("scenarios.evaluate_scenarios")
+def evaluate_scenarios(financials, scenarios, projection_years=5):
+    """
+    Value every scenario in `scenarios` ({name: assumptions}) with one
+    vectorized DCF call per projection horizon. `financials` may be a
+    ValuationContext.
+
+    Returns {name: result} with RESULT_COLUMNS per scenario, matching
+    run_dcf_model; undefined valuations (discount rate at terminal
+    growth) are NaN. Raises ValueError for unusable financials.
+    """
+    ctx = valuation_context(financials)
+    if ctx.error is not None:
+        raise ValueError(ctx.error)
+    inputs = ctx.inputs
+
+    by_years = {}
+    for name, assumptions in scenarios.items():
+        years, params = resolve_scenario(assumptions, projection_years)
+        by_years.setdefault(years, []).append((name, params))
+
+    results = {}
+    for years, batch in by_years.items():
+        names = [name for name, _ in batch]
+
+        def column(key):
+            return np.array([params[key] for _, params in batch])
+
+        value_per_share, enterprise_value = dcf_value_per_share(
+            inputs,
+            discount_rate=column("discount_rate"),
+            terminal_growth=column("terminal_growth"),
+            revenue_growth=column("revenue_growth"),
+            margin_improvement=column("margin_improvement"),
+            years=years,
+            growth_by_year=True,
+        )
+        equity_value = enterprise_value - inputs["debt"] + inputs["cash"]
+        price = inputs["current_price"]
+        upside = (value_per_share - price) / price if price else np.zeros(len(names))
+        for i, name in enumerate(names):
+            results[name] = {
+                "Value per Share": float(value_per_share[i]),
+                "Upside/Downside": float(upside[i]),
+                "Enterprise Value": float(enterprise_value[i]),
+                "Equity Value": float(equity_value[i]),
+            }
+    return {name: results[name] for name in scenarios}
+
+
+class ScenarioEngine:
+    """
+    evaluate_scenarios memoized per (financials snapshot, scenario hash).
+
+    Only scenarios not seen before for a snapshot are computed, together
+    in one batch; editing one scenario of fifty recomputes just that one.
+    At most `max_entries` results are kept, least recently used first out.
+    """
+
+    def __init__(self, max_entries=4096):
+        self.max_entries = max_entries
+        self._memo = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._memo)
+
+    def evaluate(self, financials, scenarios, projection_years=5, snapshot=None):
+        """
+        Results as evaluate_scenarios. `snapshot` is the financials'
+        data.snapshot_key; it is computed when not given, which needs a
+        financials dict rather than a ValuationContext.
+        """
+        if snapshot is None:
+            from data import snapshot_key
+            snapshot = snapshot_key(financials)
+
+        keys = {name: (snapshot, scenario_hash(assumptions, projection_years))
+                for name, assumptions in scenarios.items()}
+        results = {}
+        with self._lock:
+            for name, key in keys.items():
+                if key in self._memo:
+                    self._memo.move_to_end(key)
+                    results[name] = self._memo[key]
+        count("scenario_memo_hits", len(results))
+
+        missing = {name: scenarios[name] for name in scenarios if name not in results}
+        if missing:
+            count("scenario_memo_misses", len(missing))
+            computed = evaluate_scenarios(financials, missing, projection_years)
+            with self._lock:
+                for name, result in computed.items():
+                    self._memo[keys[name]] = result
+                while len(self._memo) > self.max_entries:
+                    self._memo.popitem(last=False)
+            results.update(computed)
+
+        # Callers get their own copies
+        return {name: dict(results[name]) for name in scenarios}
+
+
+def validate_scenarios(scenarios):
+    """
+    Check a scenario set and return it; raises ValueError with the first problem.
+    """
+    if not isinstance(scenarios, dict) or not scenarios:
+        raise ValueError("A scenario set must be a non-empty mapping of name to assumptions")
+    for name, assumptions in scenarios.items():
+        if not isinstance(name, str) or not name.strip():
+            raise ValueError("Scenario names must be non-empty strings")
+        if not isinstance(assumptions, dict):
+            raise ValueError(f"{name}: assumptions must be a mapping")
+        try:
+            resolve_scenario(assumptions)
+        except (TypeError, ValueError) as e:
+            raise ValueError(f"{name}: {e}")
+    return scenarios
+
+
+def _set_path(name, directory):
+    # Distinct names can share a slug; the file's stored name says which one it holds
+    slug = re.sub(r"[^A-Za-z0-9_-]+", "_", name.strip()).strip("_") or "set"
+    return os.path.join(directory, slug + ".json")
+
+
+def _read_set(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def list_scenario_sets(directory=DEFAULT_SCENARIO_DIR):
+    """
+    Names of the saved sets, with the built-in default first.
+    """
+    names = []
+    if os.path.isdir(directory):
+        for filename in os.listdir(directory):
+            if not filename.endswith(".json"):
+                continue
+            try:
+                names.append(_read_set(os.path.join(directory, filename))["name"])
+            except (OSError, ValueError, KeyError):
+                continue
+    return [DEFAULT_SET] + sorted(names)
+
+
+def load_scenario_set(name, directory=DEFAULT_SCENARIO_DIR):
+    """
+    A saved set by name (the built-in Bear/Base/Bull for DEFAULT_SET).
+    """
+    if name == DEFAULT_SET:
+        return {key: dict(value) for key, value in DEFAULT_SCENARIOS.items()}
+    path = _set_path(name, directory)
+    stored = _read_set(path) if os.path.exists(path) else None
+    if stored is None or stored.get("name") != name:
+        raise KeyError(f"No saved scenario set named {name!r}")
+    return validate_scenarios(stored["scenarios"])
+
+
+def save_scenario_set(name, scenarios, directory=DEFAULT_SCENARIO_DIR):
+    """
+    Save (or replace) the set called `name`. Raises ValueError rather than
+    overwrite a different set whose name maps to the same file.
+    """
+    if name == DEFAULT_SET:
+        raise ValueError(f"{DEFAULT_SET!r} is built in; save under another name")
+    validate_scenarios(scenarios)
+    os.makedirs(directory, exist_ok=True)
+    path = _set_path(name, directory)
+    if os.path.exists(path):
+        try:
+            existing = _read_set(path).get("name")
+        except (OSError, ValueError, AttributeError):
+            existing = None
+        if existing is not None and existing != name:
+            raise ValueError(f"{name!r} would overwrite the saved set {existing!r}; choose another name")
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump({"name": name, "scenarios": scenarios}, f, indent=2)
+    os.replace(tmp, path)
+
+
+def delete_scenario_set(name, directory=DEFAULT_SCENARIO_DIR):
+    path = _set_path(name, directory)
+    try:
+        if _read_set(path).get("name") == name:
+            os.remove(path)
+    except (OSError, ValueError, AttributeError):
+        pass
+
+
+def parse_growth(text):
+    """
+    A flat rate or a per-year path from text such as "0.05", "5%" or
+    "12%, 10%, 8%".
+    """
+    rates = []
+    for part in re.split(r"[,\s;]+", str(text).strip()):
+        if not part:
+            continue
+        if not part.endswith("%"):
+            rates.append(float(part))
+            continue
+        # Decimal so "8.75%" parses to exactly the float 0.0875, as format_growth wrote it
+        try:
+            rates.append(float(Decimal(part[:-1]) / 100))
+        except InvalidOperation:
+            raise ValueError(f"Not a rate: {part!r}")
+    if not rates:
+        raise ValueError("Revenue growth is empty")
+    return rates[0] if len(rates) == 1 else rates
+
+
+def _format_rate(rate):
+    # Every digit of the rate, so parse_growth reads back the same value
+    percent = (Decimal(repr(float(rate))) * 100).normalize()
+    return f"{percent:f}%"
+
+
+def format_growth(growth):
+    """
+    Text for parse_growth, at full precision: 0.0125 -> "1.25%".
+    """
+    if isinstance(growth, (list, tuple)):
+        return ", ".join(_format_rate(g) for g in growth)
+    return _format_rate(growth)
@@ -0,0 +1,316 @@
+"""
+Background prefetch for a watchlist.
+
+    python scheduler.py AAPL MSFT NVDA      # keep these warm until Ctrl-C
+    python scheduler.py --file watchlist.txt
+
+Refreshes each watched ticker's info (prices) every few minutes and its
+statements once a day through a small worker pool, writing into the same
+FinancialsCache get_financials reads, so opening a watched ticker is a
+cache hit. The watchlist comes from EQUITY_WATCHLIST (comma-separated)
+unless given explicitly; tickers users open are added as they are viewed.
+"""
+import argparse
+import heapq
+import itertools
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from cache import STATEMENT_FIELDS
+from data import PriorityRateLimiter, _fetch_fields, _load_financials, _resolve
+from instrumentation import instrument, count
+
+# Refresh info well inside its 15 minute cache TTL so it never goes stale
+DEFAULT_INFO_INTERVAL = 5 * 60
+DEFAULT_STATEMENT_INTERVAL = 24 * 3600
+
+# Jobs: which fields each refresh downloads
+JOBS = {"info": ["Info"], "statements": STATEMENT_FIELDS}
+
+
+def default_watchlist():
+    """
+    Tickers from the EQUITY_WATCHLIST environment variable.
+    """
+    return [t.strip().upper() for t in os.environ.get("EQUITY_WATCHLIST", "").split(",") if t.strip()]
+
+
+class PrefetchScheduler:
+    """
+    Keeps a watchlist warm in the cache behind get_financials.
+
+    Due refreshes wait on a heap ordered by due time; once due, the most
+    recently viewed tickers are dispatched first. Background jobs use at
+    most max_workers - 1 workers so an on-demand fetch always has one
+    free, and wait behind it for rate-limit tokens. Every request for a
+    ticker already being fetched (by a user or in the background) waits
+    on that same fetch.
+    """
+
+    def __init__(self, watchlist=None, cache=None, provider=None, info_interval=DEFAULT_INFO_INTERVAL,
+                 statement_interval=DEFAULT_STATEMENT_INTERVAL, max_workers=4, rate_limit=2.0, retries=2,
+                 max_watchlist=200):
+        self.cache, self.provider = _resolve(cache, provider)
+        self.intervals = {"info": info_interval, "statements": statement_interval}
+        self.max_workers = max(2, max_workers)
+        # Prefetch jobs yield to on-demand fetches for the same request budget
+        self.limiter = PriorityRateLimiter(rate_limit) if rate_limit else None
+        self.retries = retries
+        self.max_watchlist = max_watchlist
+
+        self._pinned = set()
+        self._viewed = {}
+        self._due = []
+        self._seq = itertools.count()
+        # Bumped each time a ticker starts being watched; heap entries from
+        # an earlier watch are stale and dropped rather than run
+        self._generation = {}
+        self._inflight = {}
+        self._background = 0
+        # Reentrant: a done-callback runs inline when a future finishes before it is attached
+        self._lock = threading.RLock()
+        self._wake = threading.Condition(self._lock)
+        self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="prefetch")
+        self._thread = None
+        self._stopped = False
+
+        self.add(default_watchlist() if watchlist is None else watchlist, pinned=True)
+
+    @property
+    def watchlist(self):
+        with self._lock:
+            return sorted(self._pinned | set(self._viewed))
+
+    def _watched(self, ticker):
+        return ticker in self._pinned or ticker in self._viewed
+
+    def add(self, tickers, pinned=False):
+        """
+        Watch more tickers; both their jobs are due immediately.
+        `pinned` tickers are never dropped to make room for viewed ones.
+        """
+        with self._wake:
+            for ticker in tickers:
+                ticker = ticker.strip().upper()
+                watched = self._watched(ticker)
+                if pinned:
+                    self._pinned.add(ticker)
+                elif not watched:
+                    self._viewed[ticker] = time.time()
+                if not watched:
+                    self._generation[ticker] = self._generation.get(ticker, 0) + 1
+                    for job in JOBS:
+                        self._push(0, ticker, job)
+            self._wake.notify()
+
+    def remove(self, tickers):
+        with self._lock:
+            for ticker in tickers:
+                ticker = ticker.strip().upper()
+                self._pinned.discard(ticker)
+                self._viewed.pop(ticker, None)
+            self._prune()
+
+    def touch(self, ticker):
+        """
+        Record that a user viewed `ticker`, watching it if it isn't already.
+        Beyond max_watchlist, the least recently viewed unpinned ticker is dropped.
+        """
+        ticker = ticker.strip().upper()
+        with self._lock:
+            watched = self._watched(ticker)
+            self._viewed[ticker] = time.time()
+            if not watched:
+                self._generation[ticker] = self._generation.get(ticker, 0) + 1
+            unpinned = [t for t in self._viewed if t not in self._pinned]
+            overflow = len(self._pinned) + len(unpinned) - self.max_watchlist
+            if overflow > 0:
+                for old in sorted(unpinned, key=self._viewed.get)[:overflow]:
+                    del self._viewed[old]
+                self._prune()
+        if not watched:
+            # Seen through fetch() moments ago, so only schedule the next refreshes
+            now = time.time()
+            with self._wake:
+                for job, interval in self.intervals.items():
+                    self._push(now + interval, ticker, job)
+
+    def fetch(self, ticker):
+        """
+        get_financials for `ticker`, sharing any fetch already in flight.
+        Usually a cache hit for watched tickers.
+        """
+        ticker = ticker.strip().upper()
+        self.touch(ticker)
+        with self._lock:
+            future = self._inflight.get(ticker)
+            if future is None:
+                future = self._submit(ticker, None)
+            else:
+                count("prefetch_shared")
+        return future.result()
+
+    def status(self):
+        with self._lock:
+            return {
+                "watched": len(self._pinned | set(self._viewed)),
+                "in_flight": len(self._inflight),
+                "queued": sum(1 for entry in self._due if entry[0] <= time.time() and self._current(entry[2], entry[4])),
+            }
+
+    def start(self):
+        """
+        Run the scheduler on a daemon thread. Does nothing without a cache
+        (local and synthetic providers), since there is nothing to warm.
+        """
+        if self._thread is not None or not self.cache:
+            return self
+        self._thread = threading.Thread(target=self._run, name="prefetch-scheduler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self, wait=True):
+        with self._wake:
+            self._stopped = True
+            self._wake.notify()
+        if self._thread is not None and wait:
+            self._thread.join()
+        self._pool.shutdown(wait=wait)
+
+    def _push(self, due, ticker, job, generation=None):
+        if generation is None:
+            generation = self._generation[ticker]
+        heapq.heappush(self._due, (due, next(self._seq), ticker, job, generation))
+
+    def _current(self, ticker, generation):
+        """
+        Whether a job scheduled in `generation` belongs to the ticker's current watch.
+        """
+        return self._watched(ticker) and self._generation.get(ticker) == generation
+
+    def _prune(self):
+        # Caller holds the lock; drop the jobs of tickers no longer watched
+        self._due = [entry for entry in self._due if self._current(entry[2], entry[4])]
+        heapq.heapify(self._due)
+
+    def _submit(self, ticker, job, generation=None):
+        # Caller holds the lock
+        future = self._pool.submit(self._refresh, ticker, job)
+        self._inflight[ticker] = future
+        future.add_done_callback(
+            lambda _, ticker=ticker, job=job, generation=generation: self._finished(ticker, job, generation)
+        )
+        return future
+
+    def _finished(self, ticker, job, generation):
+        with self._wake:
+            self._inflight.pop(ticker, None)
+            if job is not None:
+                self._background -= 1
+                if self._current(ticker, generation):
+                    self._push(time.time() + self.intervals[job], ticker, job, generation)
+            self._wake.notify()
+
+    @instrument("scheduler.refresh")
+    def _refresh(self, ticker, job):
+        """
+        Re-download a job's fields even if still fresh, then load the rest
+        through the cache as get_financials would. On-demand loads (no job)
+        take the limiter's urgent lane.
+        """
+        limiter = self.limiter
+        if job is None and limiter is not None:
+            limiter = limiter.urgent
+        if job is not None:
+            count("prefetch_jobs")
+            try:
+                fetched = _fetch_fields(ticker, JOBS[job], self.provider,
+                                        limiter=limiter, retries=self.retries)
+                # Empty frames are usually transient Yahoo failures, so don't pin them
+                self.cache.put(ticker, {
+                    field: value for field, value in fetched.items()
+                    if field == "Info" or not value.empty
+                })
+            except Exception:
+                # Keep serving what is cached; the job is retried next interval
+                count("prefetch_errors")
+        return _load_financials(ticker, self.cache, self.provider, limiter=limiter, retries=self.retries)
+
+    def _ready(self, now):
+        """
+        Pop due jobs for watched tickers, most recently viewed first.
+        Entries left over from an earlier watch of a ticker are dropped.
+        """
+        ready = []
+        while self._due and self._due[0][0] <= now:
+            entry = heapq.heappop(self._due)
+            if self._current(entry[2], entry[4]):
+                ready.append(entry)
+        ready.sort(key=lambda entry: (-self._viewed.get(entry[2], 0), entry[0]))
+        return ready
+
+    def _run(self):
+        with self._wake:
+            while not self._stopped:
+                now = time.time()
+                ready = self._ready(now)
+                for entry in ready:
+                    _, _, ticker, job, generation = entry
+                    if self._background >= self.max_workers - 1:
+                        heapq.heappush(self._due, entry)
+                    elif ticker in self._inflight:
+                        # Already being fetched; try again once that finishes
+                        self._push(now + 5, ticker, job, generation)
+                    else:
+                        self._background += 1
+                        self._submit(ticker, job, generation)
+
+                if self._background >= self.max_workers - 1:
+                    timeout = None
+                elif self._due:
+                    timeout = max(0.0, self._due[0][0] - now)
+                else:
+                    timeout = None
+                self._wake.wait(timeout)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("tickers", nargs="*", help="Tickers to watch (default: EQUITY_WATCHLIST)")
+    parser.add_argument("--file", help="File of tickers to watch (one per line)")
+    parser.add_argument("--provider", help='Data provider spec, e.g. "synthetic" or "local:<dir>"')
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--rate-limit", type=float, default=2.0)
+    parser.add_argument("--info-interval", type=float, default=DEFAULT_INFO_INTERVAL, help="Seconds between price refreshes")
+    args = parser.parse_args(argv)
+
+    from providers import provider_from_spec
+
+    tickers = list(args.tickers)
+    if args.file:
+        with open(args.file) as f:
+            tickers += [t for line in f for t in line.split("#", 1)[0].replace(",", " ").split()]
+    provider = provider_from_spec(args.provider) if args.provider else None
+
+    scheduler = PrefetchScheduler(tickers or None, provider=provider, info_interval=args.info_interval,
+                                  max_workers=args.workers, rate_limit=args.rate_limit or None)
+    if not scheduler.cache:
+        print("This provider is not cached; nothing to prefetch", file=sys.stderr)
+        return 1
+    scheduler.start()
+    try:
+        while True:
+            time.sleep(60)
+            status = scheduler.status()
+            print(f"{status['watched']} watched, {status['in_flight']} in flight, {status['queued']} queued",
+                  file=sys.stderr)
+    except KeyboardInterrupt:
+        scheduler.stop(wait=False)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
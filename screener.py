@@ -0,0 +1,329 @@
+import threading
+
+import numpy as np
+import pandas as pd
+from data import snapshot_key
+from metrics import compute_key_metrics
+from dcf import run_dcf_model
+from statements import Statements
+from instrumentation import instrument
+
+# Non-ratio columns the screener stores next to the metrics.compute_key_metrics output
+DCF_COLUMNS = ["Value per Share", "Upside/Downside"]
+INFO_COLUMNS = {"Market Cap": "marketCap", "Current Price": "currentPrice"}
+
+_OPERATORS = {"<", "<=", ">", ">=", "=="}
+
+
+class MetricStore:
+    """
+    Columnar store of per-ticker numeric metrics with a sorted index per metric.
+
+    Each metric is a float64 array (NaN where unknown) aligned with the
+    ticker array. An index is (values sorted ascending, row order) and is
+    rebuilt lazily after updates, so range filters are two binary searches
+    and top-K is a slice.
+    """
+
+    def __init__(self, metrics=()):
+        self.tickers = np.empty(0, dtype=object)
+        self.alive = np.empty(0, dtype=bool)
+        self.columns = {metric: np.empty(0) for metric in metrics}
+        self._rows = {}
+        self._size = 0
+        self._indexes = {}
+
+    def __len__(self):
+        return int(self.alive[:self._size].sum())
+
+    def __contains__(self, ticker):
+        row = self._rows.get(ticker)
+        return row is not None and self.alive[row]
+
+    @property
+    def metrics(self):
+        return list(self.columns)
+
+    def _grow(self, needed):
+        capacity = len(self.tickers)
+        if needed <= capacity:
+            return
+        capacity = max(needed, 2 * capacity, 64)
+        self.tickers = np.resize(self.tickers, capacity)
+        self.alive = np.concatenate([self.alive, np.zeros(capacity - len(self.alive), dtype=bool)])
+        for metric, values in self.columns.items():
+            self.columns[metric] = np.concatenate([values, np.full(capacity - len(values), np.nan)])
+
+    def upsert(self, rows):
+        """
+        Insert or replace tickers: `rows` is {ticker: {metric: value}}.
+        Metrics not seen before become new columns.
+        """
+        if not rows:
+            return
+        new = [ticker for ticker in rows if ticker not in self._rows]
+        self._grow(self._size + len(new))
+        for ticker in new:
+            self._rows[ticker] = self._size
+            self.tickers[self._size] = ticker
+            self._size += 1
+
+        for ticker, values in rows.items():
+            row = self._rows[ticker]
+            self.alive[row] = True
+            for metric in self.columns:
+                self.columns[metric][row] = np.nan
+            for metric, value in values.items():
+                if metric not in self.columns:
+                    self.columns[metric] = np.full(len(self.tickers), np.nan)
+                self.columns[metric][row] = np.nan if value is None else float(value)
+        self._indexes.clear()
+
+    def remove(self, tickers):
+        for ticker in tickers:
+            row = self._rows.get(ticker)
+            if row is not None:
+                self.alive[row] = False
+        self._indexes.clear()
+
+    def _index(self, metric):
+        index = self._indexes.get(metric)
+        if index is None:
+            values = self.columns[metric][:self._size]
+            valid = np.nonzero(self.alive[:self._size] & ~np.isnan(values))[0]
+            order = valid[np.argsort(values[valid], kind="stable")]
+            index = (values[order], order)
+            self._indexes[metric] = index
+        return index
+
+    def range_rows(self, metric, op, value):
+        """
+        Row ids where `metric <op> value`, found with a binary search on the index.
+        """
+        if op not in _OPERATORS:
+            raise ValueError(f"Unknown operator: {op}")
+        if metric not in self.columns:
+            return np.empty(0, dtype=np.int64)
+        sorted_values, order = self._index(metric)
+        if op == "<":
+            return order[:np.searchsorted(sorted_values, value, side="left")]
+        if op == "<=":
+            return order[:np.searchsorted(sorted_values, value, side="right")]
+        if op == ">":
+            return order[np.searchsorted(sorted_values, value, side="right"):]
+        if op == ">=":
+            return order[np.searchsorted(sorted_values, value, side="left"):]
+        return order[np.searchsorted(sorted_values, value, side="left"):
+                     np.searchsorted(sorted_values, value, side="right")]
+
+    def filter(self, conditions):
+        """
+        Row ids matching every (metric, op, value) condition.
+
+        The most selective condition is answered from its index and the
+        rest are checked against the columns for just those rows.
+        """
+        if not conditions:
+            return np.nonzero(self.alive[:self._size])[0]
+        candidates = [self.range_rows(*condition) for condition in conditions]
+        best = int(np.argmin([len(rows) for rows in candidates]))
+        rows = np.sort(candidates[best])
+        for i, (metric, op, value) in enumerate(conditions):
+            if i == best or len(rows) == 0:
+                continue
+            column = self.columns[metric][rows]
+            with np.errstate(invalid="ignore"):
+                if op == "<":
+                    keep = column < value
+                elif op == "<=":
+                    keep = column <= value
+                elif op == ">":
+                    keep = column > value
+                elif op == ">=":
+                    keep = column >= value
+                else:
+                    keep = column == value
+            rows = rows[keep]
+        return rows
+
+    def top_k(self, metric, k, ascending=False, rows=None):
+        """
+        Row ids of the k best tickers by `metric`, optionally restricted to `rows`.
+        NaNs never rank.
+        """
+        if metric not in self.columns:
+            return np.empty(0, dtype=np.int64)
+        if rows is None:
+            _, order = self._index(metric)
+            return order[:k] if ascending else order[::-1][:k]
+
+        values = self.columns[metric][rows]
+        rows = rows[~np.isnan(values)]
+        values = values[~np.isnan(values)]
+        if ascending:
+            keys = values
+        else:
+            keys = -values
+        if len(rows) > k:
+            part = np.argpartition(keys, k)[:k]
+            rows, keys = rows[part], keys[part]
+        return rows[np.argsort(keys, kind="stable")]
+
+    def to_frame(self, rows=None, metrics=None):
+        if rows is None:
+            rows = np.nonzero(self.alive[:self._size])[0]
+        metrics = metrics or self.metrics
+        frame = pd.DataFrame({metric: self.columns[metric][rows] for metric in metrics})
+        frame.index = pd.Index(self.tickers[rows], name="Ticker")
+        return frame
+
+    def save(self, path):
+        """
+        Write the store to a compressed .npz file.
+        """
+        rows = np.nonzero(self.alive[:self._size])[0]
+        np.savez_compressed(
+            path,
+            tickers=self.tickers[rows].astype(str),
+            metrics=np.array(self.metrics, dtype=str),
+            **{f"col_{i}": self.columns[metric][rows] for i, metric in enumerate(self.metrics)}
+        )
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            metrics = list(data["metrics"])
+            store = cls(metrics)
+            tickers = list(data["tickers"])
+            columns = [data[f"col_{i}"] for i in range(len(metrics))]
+        store.upsert({
+            ticker: {metric: columns[j][i] for j, metric in enumerate(metrics)}
+            for i, ticker in enumerate(tickers)
+        })
+        return store
+
+
+def screen_row(financials, assumptions=None):
+    """
+    Numeric screener row for one ticker: key metrics, DCF value and upside,
+    and market data from info.
+    """
+    # Resolve the line items once for both the metrics and the DCF
+    statements = Statements.from_financials(financials)
+    row = compute_key_metrics(statements)
+    if "Error" in row:
+        row = {}
+
+    dcf_result = run_dcf_model(statements, assumptions or {})
+    if "Error" not in dcf_result:
+        for column in DCF_COLUMNS:
+            row[column] = dcf_result[column]
+
+    info = financials["Info"]
+    for column, field in INFO_COLUMNS.items():
+        value = info.get(field)
+        if isinstance(value, (int, float)):
+            row[column] = value
+    return row
+
+
+class Screener:
+    """
+    MetricStore plus the bookkeeping for incremental refresh: each ticker's
+    row is recomputed only when its financials snapshot (or the DCF
+    assumptions) changed since the last refresh.
+
+    Safe to share between threads: rows are computed outside the lock,
+    and the store is only read or updated under it.
+    """
+
+    def __init__(self, assumptions=None):
+        self.assumptions = dict(assumptions or {})
+        self.store = MetricStore()
+        self.snapshots = {}
+        # Last StatementStore version folded in by refresh_from_store
+        self.store_version = 0
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        with self._lock:
+            return len(self.store)
+
+    @property
+    def metrics(self):
+        with self._lock:
+            return list(self.store.metrics)
+
+    def tickers(self):
+        with self._lock:
+            return list(self.store.tickers[np.nonzero(self.store.alive[:self.store._size])[0]])
+
+    def set_assumptions(self, assumptions):
+        """
+        Change the DCF assumptions; every ticker is recomputed on the next refresh.
+        """
+        with self._lock:
+            if dict(assumptions) != self.assumptions:
+                self.assumptions = dict(assumptions)
+                self.snapshots.clear()
+                self.store_version = 0
+
+    @instrument("screener.refresh")
+    def refresh(self, financials_by_ticker):
+        """
+        Update the store from {ticker: financials} or (ticker, financials)
+        pairs. Returns the tickers whose rows were recomputed.
+        """
+        if isinstance(financials_by_ticker, dict):
+            financials_by_ticker = financials_by_ticker.items()
+
+        changed, keys = {}, {}
+        for ticker, financials in financials_by_ticker:
+            if "error" in financials["Info"]:
+                continue
+            key = snapshot_key(financials)
+            with self._lock:
+                if self.snapshots.get(ticker) == key and ticker in self.store:
+                    continue
+                assumptions = self.assumptions
+            changed[ticker] = screen_row(financials, assumptions)
+            keys[ticker] = key
+
+        with self._lock:
+            self.store.upsert(changed)
+            self.snapshots.update(keys)
+        return list(changed)
+
+    def refresh_from_store(self, statement_store, tickers=None):
+        """
+        Recompute only the tickers written to `statement_store` (a
+        store.StatementStore) since the last call, optionally limited to
+        `tickers`. Returns the tickers whose rows were recomputed.
+
+        Only a call for every ticker moves store_version forward; after a
+        call limited to `tickers`, the rest are still picked up later, and
+        the ones just refreshed are skipped by their snapshot key.
+        """
+        version = statement_store.version()
+        changed = statement_store.changed_since(self.store_version, tickers)
+        recomputed = self.refresh((ticker, statement_store.financials(ticker)) for ticker in changed)
+        if tickers is None:
+            self.store_version = version
+        return recomputed
+
+    def remove(self, tickers):
+        with self._lock:
+            self.store.remove(tickers)
+            for ticker in tickers:
+                self.snapshots.pop(ticker, None)
+
+    def screen(self, conditions=(), rank_by=None, k=50, ascending=False):
+        """
+        Tickers matching all (metric, op, value) conditions, optionally
+        ranked by `rank_by` and cut to the top k.
+        """
+        with self._lock:
+            rows = self.store.filter(list(conditions))
+            if rank_by is not None:
+                rows = self.store.top_k(rank_by, k, ascending=ascending, rows=rows)
+            return self.store.to_frame(rows)
@@ -0,0 +1,262 @@
+import numpy as np
+from cache import STATEMENT_FIELDS
+from instrumentation import instrument
+
+# Canonical line items: statement and the source labels that can hold the
+# item, in order of preference. Everything downstream reads these items by
+# integer position instead of searching frame columns by label.
+ITEMS = {
+    "Total Revenue": ("Income Statement", ["Total Revenue", "Revenue"]),
+    "Gross Profit": ("Income Statement", ["Gross Profit"]),
+    "Operating Income": ("Income Statement", ["Operating Income"]),
+    "Net Income": ("Income Statement", ["Net Income"]),
+    "Total Assets": ("Balance Sheet", ["Total Assets"]),
+    "Current Assets": ("Balance Sheet", ["Current Assets"]),
+    "Current Liabilities": ("Balance Sheet", ["Current Liabilities"]),
+    "Inventory": ("Balance Sheet", ["Inventory"]),
+    "Cash And Cash Equivalents": ("Balance Sheet", ["Cash And Cash Equivalents"]),
+    "Short Long Term Debt": ("Balance Sheet", ["Short Long Term Debt"]),
+    "Long Term Debt": ("Balance Sheet", ["Long Term Debt"]),
+    "Total Equity Gross Minority Interest": ("Balance Sheet", ["Total Equity Gross Minority Interest"]),
+    "Operating Cash Flow": ("Cash Flow", ["Operating Cash Flow"]),
+    # Labels yfinance has used for capital expenditure
+    "Capital Expenditure": ("Cash Flow", [
+        "Capital Expenditure", "Capital Expenditures", "Purchase Of PPE", "Capital expenditures",
+    ]),
+}
+
+# Items taken per period from the first label with a non-zero value, rather
+# than from the first label the statement has at all
+PER_PERIOD_ITEMS = {"Capital Expenditure"}
+
+# Info fields kept per ticker (the full Yahoo info dict has ~150 keys)
+INFO_FIELDS = ["currentPrice", "sharesOutstanding", "marketCap", "sector", "industry"]
+
+ITEM_INDEX = {item: i for i, item in enumerate(ITEMS)}
+STATEMENT_INDEX = {statement: i for i, statement in enumerate(STATEMENT_FIELDS)}
+
+INCOME = STATEMENT_INDEX["Income Statement"]
+BALANCE = STATEMENT_INDEX["Balance Sheet"]
+CASH_FLOW = STATEMENT_INDEX["Cash Flow"]
+
+TOTAL_REVENUE = ITEM_INDEX["Total Revenue"]
+GROSS_PROFIT = ITEM_INDEX["Gross Profit"]
+OPERATING_INCOME = ITEM_INDEX["Operating Income"]
+NET_INCOME = ITEM_INDEX["Net Income"]
+TOTAL_ASSETS = ITEM_INDEX["Total Assets"]
+CURRENT_ASSETS = ITEM_INDEX["Current Assets"]
+CURRENT_LIABILITIES = ITEM_INDEX["Current Liabilities"]
+INVENTORY = ITEM_INDEX["Inventory"]
+CASH = ITEM_INDEX["Cash And Cash Equivalents"]
+SHORT_TERM_DEBT = ITEM_INDEX["Short Long Term Debt"]
+LONG_TERM_DEBT = ITEM_INDEX["Long Term Debt"]
+TOTAL_EQUITY = ITEM_INDEX["Total Equity Gross Minority Interest"]
+OPERATING_CASH_FLOW = ITEM_INDEX["Operating Cash Flow"]
+CAPEX = ITEM_INDEX["Capital Expenditure"]
+
+# Statement each item belongs to, and the items of each statement
+_ITEM_STATEMENT = np.array([STATEMENT_INDEX[statement] for statement, _ in ITEMS.values()])
+_STATEMENT_ITEMS = [
+    [(ITEM_INDEX[item], labels, item in PER_PERIOD_ITEMS)
+     for item, (owner, labels) in ITEMS.items() if owner == statement]
+    for statement in STATEMENT_FIELDS
+]
+
+
+def _resolve(labels, per_period, lookup, shape):
+    """
+    Value of one canonical item from its source labels. `lookup(label)`
+    returns (values, recorded) arrays of `shape`, or None when the label
+    is absent. NaN counts as a value, like the label lookups it replaces.
+    """
+    values = np.zeros(shape)
+    reported = np.zeros(shape, dtype=bool)
+    for label in labels:
+        found = lookup(label)
+        if found is None:
+            continue
+        column, recorded = found
+        take = recorded & ~reported
+        if per_period:
+            take &= column != 0
+        values[take] = column[take]
+        reported |= take
+    return values, reported
+
+
+class Statements:
+    """
+    Canonical line items for one or more tickers as dense arrays.
+
+    values is float64 shaped (ticker, period, item), period 0 being each
+    statement's latest row and items ordered as ITEMS. A cell holds the
+    reported value, 0 when its statement has that period but not the item
+    (the fallback metrics and DCF have always used), and NaN when the
+    statement has no such period. mask marks the cells that were actually
+    reported and rows[statement] which (ticker, period) rows exist. info
+    keeps only INFO_FIELDS per ticker. Arrays are shared, not copied, by
+    get(); treat them as read-only.
+    """
+
+    __slots__ = ("tickers", "dates", "values", "mask", "rows", "info", "_ticker_index")
+
+    def __init__(self, tickers, dates, values, mask, rows, info):
+        self.tickers = list(tickers)
+        self.dates = dates
+        self.values = values
+        self.mask = mask
+        self.rows = rows
+        self.info = info
+        self._ticker_index = {ticker: i for i, ticker in enumerate(self.tickers)}
+
+    def __len__(self):
+        return len(self.tickers)
+
+    @property
+    def nbytes(self):
+        return self.values.nbytes + self.mask.nbytes + self.rows.nbytes
+
+    def index(self, ticker):
+        return self._ticker_index[ticker]
+
+    def get(self, item):
+        """
+        (ticker, period) array of one canonical item.
+        """
+        return self.values[:, :, ITEM_INDEX[item]]
+
+    def n_periods(self, statement):
+        """
+        Number of periods each ticker reports for `statement`.
+        """
+        return self.rows[STATEMENT_INDEX[statement]].sum(axis=1)
+
+    def info_array(self, field):
+        """
+        Numeric info field per ticker; missing or null becomes NaN.
+        """
+        return np.array([info.get(field) for info in self.info], dtype=float)
+
+    @classmethod
+    def _fill(cls, tickers, dates, values, mask, rows, info):
+        # Unreported items are 0 where their statement has the period, NaN elsewhere
+        exists = np.moveaxis(rows[_ITEM_STATEMENT], 0, -1)
+        values = np.where(mask, values, np.where(exists, 0.0, np.nan))
+        return cls(tickers, dates, values, mask, rows, info)
+
+    @classmethod
+    def from_financials(cls, financials, ticker=None):
+        """
+        Single-ticker Statements from a get_financials dict.
+        """
+        return cls.from_universe([(ticker, financials)])
+
+    @classmethod
+    @instrument("statements.from_universe")
+    def from_universe(cls, financials_by_ticker):
+        """
+        Statements for a dict {ticker: financials} or (ticker, financials)
+        pairs such as get_financials_batch yields.
+        """
+        if isinstance(financials_by_ticker, dict):
+            financials_by_ticker = financials_by_ticker.items()
+        entries = list(financials_by_ticker)
+
+        n_periods = max(
+            (len(financials[statement]) for _, financials in entries
+             for statement in STATEMENT_FIELDS if financials.get(statement) is not None),
+            default=0,
+        )
+        shape = (len(entries), n_periods, len(ITEMS))
+        values = np.full(shape, np.nan)
+        mask = np.zeros(shape, dtype=bool)
+        rows = np.zeros((len(STATEMENT_FIELDS),) + shape[:2], dtype=bool)
+        dates = np.full(shape[:2], None, dtype=object)
+        info = []
+
+        for t, (_, financials) in enumerate(entries):
+            raw_info = financials.get("Info") or {}
+            info.append({field: raw_info[field] for field in INFO_FIELDS if field in raw_info})
+
+            for s, statement in enumerate(STATEMENT_FIELDS):
+                df = financials.get(statement)
+                if df is None or len(df) == 0:
+                    continue
+                n = len(df)
+                rows[s, t, :n] = True
+                missing = dates[t, :n] == None  # noqa: E711  (elementwise on an object array)
+                dates[t, :n][missing] = df.index.to_numpy(dtype=object)[missing]
+
+                # Positional lookups on the raw array; column selection through pandas dominates otherwise
+                positions = {column: j for j, column in enumerate(df.columns)}
+                block = df.to_numpy(dtype=float)
+                gather_items, gather_columns = [], []
+                for i, labels, per_period in _STATEMENT_ITEMS[s]:
+                    if per_period:
+                        recorded = np.ones(n, dtype=bool)
+                        values[t, :n, i], mask[t, :n, i] = _resolve(
+                            labels, True,
+                            lambda label: None if label not in positions else (block[:, positions[label]], recorded),
+                            n,
+                        )
+                        continue
+                    # First label the statement has wins for every period
+                    for label in labels:
+                        if label in positions:
+                            gather_items.append(i)
+                            gather_columns.append(positions[label])
+                            break
+                if gather_items:
+                    values[t][:n, gather_items] = block[:, gather_columns]
+                    mask[t][:n, gather_items] = True
+
+        return cls._fill([ticker for ticker, _ in entries], dates, values, mask, rows, info)
+
+    @classmethod
+    @instrument("statements.from_panel")
+    def from_panel(cls, panel):
+        """
+        Statements from the long frame built by panel.build_panel.
+        """
+        statements = panel["Statements"]
+        tickers = list(panel["Info"].index)
+        ticker_pos = {ticker: i for i, ticker in enumerate(tickers)}
+        n_periods = int(statements["period"].max()) + 1 if len(statements) else 0
+        shape = (len(tickers), n_periods)
+
+        t = statements["ticker"].map(ticker_pos).to_numpy(dtype=np.int64)
+        p = statements["period"].to_numpy(dtype=np.int64)
+        s = statements["statement"].map(STATEMENT_INDEX).to_numpy(dtype=np.int64)
+        labels = statements["item"].to_numpy(dtype=object)
+        raw = statements["value"].to_numpy(dtype=float)
+
+        rows = np.zeros((len(STATEMENT_FIELDS),) + shape, dtype=bool)
+        rows[s, t, p] = True
+        dates = np.full(shape, None, dtype=object)
+        # Date of each (ticker, period) from the first statement that has it
+        order = np.argsort(s, kind="stable")
+        first = np.unique(t[order] * max(n_periods, 1) + p[order], return_index=True)[1]
+        dates[t[order][first], p[order][first]] = statements["date"].to_numpy(dtype=object)[order][first]
+
+        values = np.full(shape + (len(ITEMS),), np.nan)
+        mask = np.zeros(values.shape, dtype=bool)
+        for statement_index, items in enumerate(_STATEMENT_ITEMS):
+            in_statement = s == statement_index
+            for i, item_labels, per_period in items:
+                def lookup(label):
+                    selected = in_statement & (labels == label)
+                    if not selected.any():
+                        return None
+                    column = np.full(shape, np.nan)
+                    recorded = np.zeros(shape, dtype=bool)
+                    column[t[selected], p[selected]] = raw[selected]
+                    recorded[t[selected], p[selected]] = True
+                    return column, recorded
+
+                values[:, :, i], mask[:, :, i] = _resolve(item_labels, per_period, lookup, shape)
+
+        info = [
+            {field: value for field, value in row.items() if value is not None}
+            for row in panel["Info"].to_dict("records")
+        ]
+        return cls._fill(tickers, dates, values, mask, rows, info)
@@ -0,0 +1,302 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+import numpy as np
+import pandas as pd
+from cache import DEFAULT_CACHE_DIR, DEFAULT_TTLS, STATEMENT_FIELDS
+from data import RateLimiter, _fetch_fields, get_default_provider
+from instrumentation import instrument, count
+
+DEFAULT_STORE_PATH = os.path.join(DEFAULT_CACHE_DIR, "statements.sqlite")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS versions (
+    version INTEGER PRIMARY KEY AUTOINCREMENT,
+    ticker TEXT NOT NULL,
+    recorded_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS versions_ticker ON versions (ticker, version);
+CREATE TABLE IF NOT EXISTS facts (
+    ticker TEXT NOT NULL,
+    statement TEXT NOT NULL,
+    period TEXT NOT NULL,
+    item TEXT NOT NULL,
+    version INTEGER NOT NULL,
+    value REAL NOT NULL,
+    position INTEGER NOT NULL,
+    PRIMARY KEY (ticker, statement, period, item, version)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS info (
+    ticker TEXT NOT NULL,
+    version INTEGER NOT NULL,
+    payload TEXT NOT NULL,
+    PRIMARY KEY (ticker, version)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS checks (
+    ticker TEXT NOT NULL,
+    field TEXT NOT NULL,
+    checked_at REAL NOT NULL,
+    PRIMARY KEY (ticker, field)
+) WITHOUT ROWID;
+"""
+
+
+def _json_default(value):
+    # numpy scalars from providers; anything else is stored as text
+    if hasattr(value, "item"):
+        return value.item()
+    return str(value)
+
+
+def _timestamp(as_of):
+    if as_of is None or isinstance(as_of, (int, float)):
+        return as_of
+    return pd.Timestamp(as_of).timestamp()
+
+
+class StatementStore:
+    """
+    Versioned, append-only store of statement line items in SQLite.
+
+    Every cell is keyed by (ticker, statement, period, item). A refresh
+    writes only the cells that are new or whose value changed (a
+    restatement) under a new version number, plus the info dict when it
+    changed. Nothing is overwritten or deleted, so periods that drop out
+    of the provider's window are kept and any past state can be read back
+    with as_of. Reads return the same dict shape as data.get_financials.
+    """
+
+    def __init__(self, path=DEFAULT_STORE_PATH):
+        self.path = path
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_SCHEMA)
+        self._lock = threading.Lock()
+
+    def close(self):
+        self._conn.close()
+
+    def version(self):
+        """
+        Latest version number in the store (0 when empty).
+        """
+        with self._lock:
+            row = self._conn.execute("SELECT MAX(version) FROM versions").fetchone()
+        return row[0] or 0
+
+    def tickers(self):
+        with self._lock:
+            rows = self._conn.execute("SELECT DISTINCT ticker FROM versions ORDER BY ticker").fetchall()
+        return [ticker for (ticker,) in rows]
+
+    def changed_since(self, version, tickers=None):
+        """
+        Tickers with any write after `version`, optionally restricted to `tickers`.
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT DISTINCT ticker FROM versions WHERE version > ?", (version,)
+            ).fetchall()
+        changed = [ticker for (ticker,) in rows]
+        if tickers is not None:
+            wanted = set(tickers)
+            changed = [ticker for ticker in changed if ticker in wanted]
+        return changed
+
+    def _version_at(self, as_of, version):
+        """
+        Resolve as_of (timestamp, datetime or date string) to a version bound.
+        """
+        if version is not None:
+            return version
+        as_of = _timestamp(as_of)
+        if as_of is None:
+            return None
+        row = self._conn.execute(
+            "SELECT MAX(version) FROM versions WHERE recorded_at <= ?", (as_of,)
+        ).fetchone()
+        return row[0] or 0
+
+    def _cells(self, ticker, version):
+        # SQLite returns the bare columns from the row holding MAX(version)
+        query = (
+            "SELECT statement, period, item, value, position, MAX(version) FROM facts "
+            "WHERE ticker = ?{} GROUP BY statement, period, item"
+        )
+        if version is None:
+            return self._conn.execute(query.format(""), (ticker,)).fetchall()
+        return self._conn.execute(query.format(" AND version <= ?"), (ticker, version)).fetchall()
+
+    def _info(self, ticker, version):
+        query = "SELECT payload FROM info WHERE ticker = ?{} ORDER BY version DESC LIMIT 1"
+        if version is None:
+            row = self._conn.execute(query.format(""), (ticker,)).fetchone()
+        else:
+            row = self._conn.execute(query.format(" AND version <= ?"), (ticker, version)).fetchone()
+        return row[0] if row else None
+
+    def financials(self, ticker, as_of=None, version=None):
+        """
+        Financials for `ticker` as stored at `as_of` (a timestamp, datetime
+        or date string) or at `version`; latest when both are None.
+        Statements hold every period ever seen, newest first.
+        """
+        ticker = ticker.strip().upper()
+        with self._lock:
+            bound = self._version_at(as_of, version)
+            cells = self._cells(ticker, bound)
+            payload = self._info(ticker, bound)
+
+        if payload is None:
+            return {
+                "Income Statement": pd.DataFrame(),
+                "Balance Sheet": pd.DataFrame(),
+                "Cash Flow": pd.DataFrame(),
+                "Info": {"error": f"No stored data for {ticker}"}
+            }
+
+        frames = {field: pd.DataFrame() for field in STATEMENT_FIELDS}
+        if cells:
+            cells = pd.DataFrame(cells, columns=["statement", "period", "item", "value", "position", "version"])
+            for statement, group in cells.groupby("statement", sort=False):
+                items = group.groupby("item")["position"].min().sort_values().index
+                df = group.pivot(index="period", columns="item", values="value")
+                df = df.reindex(columns=items).sort_index(ascending=False)
+                df.index.name = None
+                df.columns.name = None
+                frames[statement] = df
+
+        return {
+            "Income Statement": frames["Income Statement"],
+            "Balance Sheet": frames["Balance Sheet"],
+            "Cash Flow": frames["Cash Flow"],
+            "Info": json.loads(payload)
+        }
+
+    def due_fields(self, ticker, statement_max_age=DEFAULT_TTLS["Income Statement"], now=None):
+        """
+        Fields worth fetching for `ticker`: Info always, statements only
+        when they were last checked more than `statement_max_age` seconds ago.
+        """
+        now = time.time() if now is None else now
+        with self._lock:
+            checked = dict(self._conn.execute(
+                "SELECT field, checked_at FROM checks WHERE ticker = ?", (ticker,)
+            ).fetchall())
+        return ["Info"] + [
+            field for field in STATEMENT_FIELDS
+            if now - checked.get(field, 0) > statement_max_age
+        ]
+
+    def _delta(self, fetched, current):
+        """
+        Cells in `fetched` that are new or differ from `current`.
+        NaN cells are missing data, not deletions, and are never written.
+        """
+        rows = []
+        for statement in STATEMENT_FIELDS:
+            df = fetched.get(statement)
+            if df is None or df.empty:
+                continue
+            values = df.apply(pd.to_numeric, errors="coerce").to_numpy(dtype=float)
+            periods = df.index.astype(str)
+            for j, item in enumerate(df.columns):
+                item = str(item)
+                for i in np.nonzero(~np.isnan(values[:, j]))[0]:
+                    value = float(values[i, j])
+                    if current.get((statement, periods[i], item)) != value:
+                        rows.append((statement, periods[i], item, value, j))
+        return rows
+
+    def write(self, ticker, fetched, now=None):
+        """
+        Append the parts of `fetched` ({field: frame or info dict}) that
+        differ from the latest stored state. Returns the new version, or
+        None when nothing changed.
+        """
+        ticker = ticker.strip().upper()
+        now = time.time() if now is None else now
+        with self._lock:
+            current = {
+                (statement, period, item): value
+                for statement, period, item, value, _, _ in self._cells(ticker, None)
+            }
+            rows = self._delta(fetched, current)
+
+            payload = None
+            if "Info" in fetched:
+                payload = json.dumps(fetched["Info"], sort_keys=True, default=_json_default)
+                if payload == self._info(ticker, None):
+                    payload = None
+
+            with self._conn:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO checks VALUES (?, ?, ?)",
+                    [(ticker, field, now) for field, value in fetched.items()
+                     if field == "Info" or not value.empty]
+                )
+                if not rows and payload is None:
+                    count("store_unchanged")
+                    return None
+                version = self._conn.execute(
+                    "INSERT INTO versions (ticker, recorded_at) VALUES (?, ?)", (ticker, now)
+                ).lastrowid
+                self._conn.executemany(
+                    "INSERT INTO facts VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    [(ticker, statement, period, item, version, value, position)
+                     for statement, period, item, value, position in rows]
+                )
+                if payload is not None:
+                    self._conn.execute("INSERT INTO info VALUES (?, ?, ?)", (ticker, version, payload))
+        count("store_cells_written", len(rows))
+        return version
+
+    @instrument("store.refresh")
+    def refresh(self, tickers, provider=None, max_workers=8, rate_limit=5.0, retries=3,
+                statement_max_age=DEFAULT_TTLS["Income Statement"]):
+        """
+        Fetch the due fields for every ticker and append what changed.
+
+        Returns (changed, errors): the tickers that got a new version and
+        {ticker: message} for tickers whose info could not be fetched.
+        Pass statement_max_age=0 to re-check every statement.
+        """
+        provider = provider or get_default_provider()
+        limiter = RateLimiter(rate_limit) if rate_limit else None
+        tickers = iter(ticker.strip().upper() for ticker in tickers)
+
+        changed, errors = [], {}
+        # Bounded window, as in data.get_financials_batch, so memory stays flat
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            pending = {}
+
+            def submit_next():
+                for ticker in tickers:
+                    fields = self.due_fields(ticker, statement_max_age)
+                    future = pool.submit(_fetch_fields, ticker, fields, provider, None, limiter, retries)
+                    pending[future] = ticker
+                    return True
+                return False
+
+            while len(pending) < 2 * max_workers and submit_next():
+                pass
+
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    ticker = pending.pop(future)
+                    try:
+                        fetched = future.result()
+                    except Exception as e:
+                        errors[ticker] = str(e)
+                    else:
+                        if self.write(ticker, fetched) is not None:
+                            changed.append(ticker)
+                    submit_next()
+        return changed, errors
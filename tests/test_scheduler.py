@@ -0,0 +1,25 @@
+import time
+
+from cache import FinancialsCache
+from providers import SyntheticProvider
+from scheduler import PrefetchScheduler
+
+
+def test_cold_fetch_is_not_throttled_behind_prefetch(tmp_path):
+    watchlist = [f"SYN{i:05d}" for i in range(50)]
+    scheduler = PrefetchScheduler(watchlist, cache=FinancialsCache(str(tmp_path)), provider=SyntheticProvider(),
+                                  rate_limit=10, max_workers=4).start()
+    try:
+        # Let the warm-up saturate the limiter and the background workers
+        time.sleep(0.5)
+        assert scheduler.status()["queued"] > 0
+
+        start = time.perf_counter()
+        financials = scheduler.fetch("SYN00099")
+        elapsed = time.perf_counter() - start
+    finally:
+        scheduler.stop(wait=False)
+
+    assert "error" not in financials["Info"]
+    # Four fields at 10 requests/s, ahead of the queued prefetch jobs
+    assert elapsed < 0.6
@@ -0,0 +1,18 @@
+from cache import FIELDS
+from providers import SyntheticProvider
+from screener import Screener
+from store import StatementStore
+
+
+def test_refresh_from_store_subset_then_rest():
+    provider = SyntheticProvider()
+    store = StatementStore(":memory:")
+    tickers = ["SYN00000", "SYN00001", "SYN00002"]
+    for ticker in tickers:
+        store.write(ticker, {field: provider.fetch(ticker, field) for field in FIELDS})
+
+    screener = Screener()
+    assert screener.refresh_from_store(store, tickers=["SYN00000"]) == ["SYN00000"]
+    assert sorted(screener.refresh_from_store(store, tickers=["SYN00001", "SYN00002"])) == ["SYN00001", "SYN00002"]
+    assert screener.refresh_from_store(store) == []
+    assert sorted(screener.store.to_frame().index) == tickers